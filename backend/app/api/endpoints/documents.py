@@ -0,0 +1,124 @@
+import gzip
+import json
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from app.core import config, services
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is used without it
+    brotli = None
+
+router = APIRouter()
+
+
+def _accepts(request: Request, coding: str) -> bool:
+    """Whether the Accept-Encoding header allows a content coding (with a non-zero q)."""
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, *params = [item.strip() for item in part.split(";")]
+        if name.lower() != coding:
+            continue
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def _encode(request: Request, payload: Dict[str, Any], etag: str) -> Response:
+    """Serialize a payload, brotli- or gzip-compressed when the client accepts it."""
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if len(body) >= config.DOCUMENT_TEXT_COMPRESS_MIN_BYTES:
+        if brotli is not None and _accepts(request, "br"):
+            body = brotli.compress(body, quality=5)
+            headers["Content-Encoding"] = "br"
+        elif _accepts(request, "gzip"):
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    candidates = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    return etag.removeprefix("W/") in candidates or "*" in candidates
+
+
+def _slice(document_id: str, page: Optional[int], start: Optional[int], end: Optional[int]) -> Dict[str, Any]:
+    store = services.get_document_text()
+    if page is not None:
+        document = store.get(document_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document text not found.")
+        pages = document.get("pages", [])
+        if page > len(pages):
+            raise HTTPException(status_code=404, detail=f"Page {page} is past the end of the document ({len(pages)} pages).")
+        text = pages[page - 1]
+        length = sum(len(p) for p in pages) + len(pages) - 1
+        return {"document": document, "page": page, "page_count": len(pages), "start": None, "end": None, "length": length, "text": text}
+
+    found = store.text(document_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Document text not found.")
+    document, joined = found
+    start = min(start or 0, len(joined))
+    end = len(joined) if end is None else min(end, len(joined))
+    end = min(max(end, start), start + config.DOCUMENT_TEXT_MAX_CHARS)
+    return {
+        "document": document, "page": None, "page_count": len(document.get("pages", [])),
+        "start": start, "end": end, "length": len(joined), "text": joined[start:end],
+    }
+
+
+@router.get(
+    "/documents/{document_id}/text",
+    summary="Extracted document text",
+    response_description="One page or character range of a document's extracted text"
+)
+async def get_document_text(
+    request: Request,
+    document_id: str,
+    page: Optional[int] = Query(None, ge=1, description="1-based page number"),
+    start: Optional[int] = Query(None, ge=0, description="Offset of the first character, in the pages joined by newlines"),
+    end: Optional[int] = Query(None, ge=0, description="Offset one past the last character"),
+):
+    """Serve part of the text extracted from an ingested document.
+
+    Upload results only carry the document_id; the viewer fetches the page
+    (PDFs) or character range (web pages, transcripts) it displays. Ranges
+    are capped at DOCUMENT_TEXT_MAX_CHARS characters.
+
+    Responses carry an ETag derived from the document's content hash, so a
+    revalidating client gets 304 Not Modified until the document is
+    re-ingested with different content, and are brotli- or gzip-compressed
+    when the client accepts it.
+
+    Args:
+        request: Incoming request, for the Accept-Encoding and If-None-Match headers
+        document_id: Id from the upload result
+        page: Page to return; takes precedence over start/end
+        start: First character to return (default 0)
+        end: Character to stop before (default the end of the text)
+
+    Returns:
+        Response: JSON with document_id, source, page, page_count, start, end,
+            the total length of the text and the requested text
+
+    Raises:
+        HTTPException: If the document or page doesn't exist
+    """
+    part = await run_in_threadpool(_slice, document_id, page, start, end)
+    document = part.pop("document")
+    selector = f"p{part['page']}" if part["page"] is not None else f"{part['start']}-{part['end']}"
+    # Weak, since the same text is sent with different content codings.
+    etag = f'W/"{document.get("version", "")[:32]}-{selector}"'
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"})
+
+    payload = {"document_id": document_id, "source": document.get("source"), **part}
+    return await run_in_threadpool(_encode, request, payload, etag)
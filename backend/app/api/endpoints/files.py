@@ -0,0 +1,45 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from app.core.services import file_store
+
+router = APIRouter()
+
+# A stored file's path is its content hash, so it never changes once served.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.api_route(
+    "/files/{content_hash}",
+    methods=["GET", "HEAD"],
+    summary="Uploaded file",
+    response_description="The uploaded file, or the requested byte ranges of it"
+)
+async def get_file(content_hash: str, request: Request):
+    """Serve an uploaded PDF by its SHA-256.
+
+    Responses carry a strong ETag (the content hash) and an immutable
+    Cache-Control, so browsers and proxies can cache them indefinitely.
+    Range requests (including If-Range) are answered with 206 Partial
+    Content, which lets PDF viewers load pages incrementally.
+
+    Args:
+        content_hash: SHA-256 hex digest from the upload's url
+        request: Incoming request, for the If-None-Match header
+
+    Returns:
+        FileResponse: The file, or 304 Not Modified if the client has it
+
+    Raises:
+        HTTPException: If no file with that hash is stored
+    """
+    path = file_store.find(content_hash)
+    if path is None:
+        raise HTTPException(status_code=404, detail="File not found.")
+
+    etag = f'"{content_hash}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    candidates = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in candidates or f"W/{etag}" in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(path, media_type="application/pdf", headers=headers)
@@ -1,11 +1,109 @@
+import time
+from typing import Dict, Optional, Tuple
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 from youtube_transcript_api import YouTubeTranscriptApi
 import wikipedia
 from app.services.content_scraper import process_url_content
-from app.core.services import collection, rag
+from app.core import config, services
+from app.core.metrics import render_metrics
+from app.core.services import rag, answer_cache, query_embedder
 
 router = APIRouter()
 
+# (checked at, result) of the last web scraper check
+_scraper_check: Optional[Tuple[float, Dict[str, str]]] = None
+
+
+def _check_web_scraper() -> Dict[str, str]:
+    """Scrape example.com, reusing the result for HEALTH_SCRAPER_TTL_SECONDS."""
+    global _scraper_check
+    if _scraper_check and time.time() - _scraper_check[0] < config.HEALTH_SCRAPER_TTL_SECONDS:
+        return _scraper_check[1]
+    try:
+        content = process_url_content("http://example.com")
+        if "Website Content" in content and "Example Domain" in content:
+            result = {"status": "healthy", "message": "Scraping successful"}
+        else:
+            result = {"status": "error", "message": "Failed to scrape simple content (Example Domain)"}
+    except Exception as e:
+        result = {"status": "error", "message": str(e)}
+    _scraper_check = (time.time(), result)
+    return result
+
+
+def _cache_stats() -> Dict[str, Dict]:
+    # Loads the lazy singletons (or asks the model server) on first use, so it runs off the event loop.
+    return {
+        "embedding_cache": services.get_embedding_cache().stats(),
+        "answer_cache": answer_cache.stats(),
+        "query_embedding_batches": query_embedder.stats(),
+        "lexical_index": services.get_lexical_index().stats(),
+        "reranker": services.get_reranker().stats(),
+        "question_bank": services.get_question_bank().stats(),
+        "document_text": services.get_document_text().stats(),
+        "http_cache": services.get_http_fetcher().stats()
+    }
+
+@router.get(
+    "/live",
+    summary="Liveness probe",
+    response_description="Always ok while the process is serving requests"
+)
+async def live():
+    """Report that the API process is up.
+
+    Does not touch the model or the vector store, so it answers immediately
+    even while they are still loading.
+
+    Returns:
+        dict: Static ok status
+    """
+    return {"status": "ok"}
+
+
+@router.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    response_class=PlainTextResponse,
+    response_description="Request and per-stage latency histograms and LLM token counts"
+)
+async def metrics():
+    """Expose this worker's metrics in the Prometheus text format.
+
+    - ``smartstudy_request_seconds``: request latency by method, route and status
+    - ``smartstudy_stage_seconds``: time per stage (query embedding, vector
+      and keyword search, context build, LLM calls, scraping, HTML
+      extraction, chunking, embedding, storing, ingestion job stages)
+    - ``smartstudy_llm_tokens_total``: prompt and completion tokens by purpose
+
+    Each API worker keeps its own metrics; scrape every worker.
+
+    Returns:
+        PlainTextResponse: Metrics in the text exposition format
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@router.get(
+    "/ready",
+    summary="Readiness probe",
+    response_description="Whether the embedding model and vector store are loaded"
+)
+async def ready():
+    """Report whether the heavy services are loaded and requests will be fast.
+
+    Returns 503 until the background warm-up (or the first request) has
+    loaded the embedding model, the vector store and the lexical index.
+
+    Returns:
+        JSONResponse: Readiness of each component, with status 200 or 503
+    """
+    state = await run_in_threadpool(services.readiness)
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
 @router.get(
     "/health_check",
     summary="System health check",
@@ -35,28 +133,21 @@ async def health_check():
     }
     
     try:
-        test_msg = rag.generate_answer("hi", "context")
+        test_msg = await rag.generate_answer("hi", "context")
         if "Error" in test_msg:
              status["services"]["llm_api"] = {"status": "error", "message": test_msg}
         else:
-             status["services"]["llm_api"] = {"status": "healthy", "message": "Groq API responding"}
+             status["services"]["llm_api"] = {"status": "healthy", "message": f"{rag.backend.name} backend responding"}
     except Exception as e:
         status["services"]["llm_api"] = {"status": "error", "message": str(e)}
 
     try:
-        count = collection.count()
+        count = await run_in_threadpool(lambda: services.get_vector_store().count())
         status["services"]["vector_db"] = {"status": "healthy", "message": f"ChromaDB operational. Documents indexed: {count}"}
     except Exception as e:
         status["services"]["vector_db"] = {"status": "error", "message": str(e)}
 
-    try:
-        content = process_url_content("http://example.com")
-        if "Website Content" in content and "Example Domain" in content:
-            status["services"]["web_scraper"] = {"status": "healthy", "message": "Scraping successful"}
-        else:
-            status["services"]["web_scraper"] = {"status": "error", "message": "Failed to scrape simple content (Example Domain)"}
-    except Exception as e:
-        status["services"]["web_scraper"] = {"status": "error", "message": str(e)}
+    status["services"]["web_scraper"] = await run_in_threadpool(_check_web_scraper)
         
     try:
         if YouTubeTranscriptApi:
@@ -71,3 +162,17 @@ async def health_check():
         status["services"]["wikipedia_scraper"] = {"status": "error", "message": str(e)}
 
     return status
+
+
+@router.get(
+    "/cache_stats",
+    summary="Cache statistics",
+    response_description="Hit/miss counters for backend caches"
+)
+async def cache_stats():
+    """Report hit/miss counters for the backend caches.
+
+    Returns:
+        dict: Statistics for each cache, keyed by cache name
+    """
+    return await run_in_threadpool(_cache_stats)
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from app.core.services import job_manager
+
+router = APIRouter()
+
+@router.get(
+    "/jobs/{job_id}",
+    summary="Ingestion job status",
+    response_description="Current stage, per-stage progress and result of an ingestion job"
+)
+async def get_job(job_id: str):
+    """Report the progress of a background ingestion job.
+
+    Stages run in order: extract, chunk, embed, store. Once the job status
+    is "done", the processing results are available under "result"; if it
+    is "error", the failure reason is under "error".
+
+    Args:
+        job_id: Identifier returned by /upload_pdf or /upload_url
+
+    Returns:
+        dict: Job status, current stage, per-stage progress, result and error
+
+    Raises:
+        HTTPException: If the job id is unknown or has expired
+    """
+    job = await run_in_threadpool(job_manager.status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
@@ -1,57 +1,233 @@
-from fastapi import APIRouter, Form
-from typing import Optional
+import json
+from fastapi import APIRouter, Form, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional
 from app.models.schemas import QuizRequest
-from app.core.services import embedder, collection, rag
+from app.core.services import rag, answer_cache, question_bank
+from app.rag_core import LLMUnavailableError
+from app.services.retrieval import retrieve, RETRIEVAL_MODES
+from app.services.context_builder import build_context, build_context_slices
+from app.core import config
+from app.core.metrics import span
 
 router = APIRouter()
 
+
+async def _retrieve(question: str, n_results: int, notebook_id: Optional[str], source: Optional[str], mode: str) -> Dict[str, Any]:
+    if mode not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(RETRIEVAL_MODES)}")
+    return await retrieve(question, n_results, notebook_id=notebook_id, source=source, mode=mode)
+
+
+def _source_metadata(results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Describe retrieved chunks for the client without their full text."""
+    sources = []
+    for chunk_id, meta in zip(results["ids"], results["metadatas"]):
+        sources.append({
+            "id": chunk_id,
+            "source": meta.get("source"),
+            "notebook_id": meta.get("notebook_id"),
+            "page": meta.get("page"),
+            "section": meta.get("section"),
+            "char_start": meta.get("char_start"),
+            "char_end": meta.get("char_end"),
+            "start_seconds": meta.get("start_seconds"),
+            "end_seconds": meta.get("end_seconds"),
+            "chunk_index": meta.get("chunk_index")
+        })
+    return sources
+
+
+def _llm_unavailable(e: LLMUnavailableError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="The AI service is busy, please retry shortly.",
+        headers={"Retry-After": str(max(1, round(e.retry_after)))}
+    )
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @router.post(
     "/ask",
     summary="Ask a question using RAG",
     response_description="AI-generated answer with context preview"
 )
-async def ask(question: str = Form(...), filename: Optional[str] = Form(None)): 
+async def ask(
+    question: str = Form(...),
+    filename: Optional[str] = Form(None),
+    notebook_id: Optional[str] = Form(None),
+    mode: str = Form("hybrid")
+):
     """Answer a question using Retrieval-Augmented Generation (RAG).
-    
+
     Retrieves relevant context from the vector database and generates
     an AI-powered answer using the Groq LLM.
-    
+
     Args:
         question: The question to answer
         filename: Optional filename to filter context by specific document
-        
+        notebook_id: Optional notebook to scope retrieval to
+        mode: Retrieval mode: "hybrid" (BM25 + vector), "vector" or "keyword"
+
     Returns:
-        dict: Question, AI-generated answer, and context preview
+        dict: Question, AI-generated answer, context preview and retrieved chunk metadata
+
+    Raises:
+        HTTPException: 503 with Retry-After if the LLM is rate limited or unreachable
     """
-    q_embed = embedder.encode([question]).tolist()
-    
-    query_params = {
-        "query_embeddings": q_embed,
-        "n_results": 5
-    }
-    
     if filename:
-        query_params["where"] = {"source": filename}
         print(f"Filtering RAG context for file: {filename}")
 
-    results = collection.query(**query_params)
+    results = await _retrieve(question, config.ASK_TOP_K, notebook_id, filename, mode)
 
-    if not results or not results["documents"] or not results["documents"][0]:
+    if not results["documents"]:
         context = "No specific documents found. Answering based on general knowledge."
         source_preview = "General Knowledge"
     else:
-        context = " ".join(results["documents"][0])
+        with span("context_build"):
+            context, _ = build_context(results["documents"], results["metadatas"], config.ASK_CONTEXT_TOKENS)
         source_preview = context[:200] + "..."
 
-    answer = rag.generate_answer(question, context)
+    try:
+        answer, cached = await rag.generate_answer_cached(
+            question, context, (notebook_id, filename), results["ids"], results["embedding"]
+        )
+    except LLMUnavailableError as e:
+        raise _llm_unavailable(e)
 
     return {
         "question": question,
         "answer": answer,
-        "context_used_preview": source_preview
+        "context_used_preview": source_preview,
+        "sources": _source_metadata(results),
+        "cached": cached
     }
 
 
+@router.post(
+    "/ask_stream",
+    summary="Ask a question using RAG, streaming the answer",
+    response_description="Server-Sent Events stream: sources, then answer tokens"
+)
+async def ask_stream(
+    question: str = Form(...),
+    filename: Optional[str] = Form(None),
+    notebook_id: Optional[str] = Form(None),
+    mode: str = Form("hybrid")
+):
+    """Answer a question with RAG, streaming the answer as Server-Sent Events.
+
+    The stream emits, in order:
+    - one ``sources`` event with the retrieved chunk metadata and context preview
+    - ``token`` events carrying answer text as the LLM generates it
+    - a final ``done`` event, or an ``error`` event if generation fails
+
+    Cached answers are sent as a single ``token`` event.
+
+    Args:
+        question: The question to answer
+        filename: Optional filename to filter context by specific document
+        notebook_id: Optional notebook to scope retrieval to
+        mode: Retrieval mode: "hybrid" (BM25 + vector), "vector" or "keyword"
+
+    Returns:
+        StreamingResponse: text/event-stream response
+    """
+    results = await _retrieve(question, config.ASK_TOP_K, notebook_id, filename, mode)
+
+    if not results["documents"]:
+        context = "No specific documents found. Answering based on general knowledge."
+        source_preview = "General Knowledge"
+    else:
+        with span("context_build"):
+            context, _ = build_context(results["documents"], results["metadatas"], config.ASK_CONTEXT_TOKENS)
+        source_preview = context[:200] + "..."
+    sources = _source_metadata(results)
+    chunk_ids = results["ids"]
+    q_embed = results["embedding"]
+
+    scope = (notebook_id, filename)
+    cached_answer = answer_cache.get(scope, chunk_ids, question, q_embed)
+
+    async def events():
+        yield _sse("sources", {"question": question, "sources": sources, "context_used_preview": source_preview})
+        if cached_answer is not None:
+            yield _sse("token", {"text": cached_answer})
+            yield _sse("done", {"cached": True})
+            return
+
+        tokens = []
+        try:
+            async for token in rag.stream_answer(question, context, notebook_id=notebook_id):
+                tokens.append(token)
+                yield _sse("token", {"text": token})
+        except Exception as e:
+            yield _sse("error", {"message": f"Error generating answer: {str(e)}"})
+            return
+        answer_cache.put(scope, chunk_ids, question, "".join(tokens), q_embed)
+        yield _sse("done", {"cached": False})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _quiz_contexts(req: QuizRequest, results: Dict[str, Any], num_questions: int) -> List[str]:
+    """Split retrieved quiz material into one context slice per question batch."""
+    if not results["documents"]:
+        return [f"Topic: {req.topic}. No specific uploaded documents found, please generate a quiz based on general academic knowledge of this topic."]
+
+    n_batches = max(1, -(-num_questions // max(1, config.QUIZ_BATCH_SIZE)))
+    slice_tokens = max(config.QUIZ_CONTEXT_TOKENS // n_batches, config.QUIZ_MIN_SLICE_TOKENS)
+    with span("context_build"):
+        return build_context_slices(results["documents"], results["metadatas"], n_batches, slice_tokens)
+
+
+async def _quiz_questions(req: QuizRequest) -> AsyncIterator[Dict[str, Any]]:
+    """Yield banked questions for the retrieved material, then freshly generated ones.
+
+    Up to num_questions - QUESTION_BANK_FRESH_QUESTIONS questions come from
+    the question bank; the rest are generated, regenerating any already
+    served for the same notebook, document filter and difficulty. If banked
+    questions were served, a failing LLM only shortens the quiz.
+    """
+    notebook_id = req.scoped_notebook_id()
+    results = await retrieve(req.topic, config.QUIZ_TOP_K, notebook_id=notebook_id, source=req.context_filter)
+    scope = (notebook_id, req.context_filter, req.difficulty)
+
+    fresh = min(config.QUESTION_BANK_FRESH_QUESTIONS, req.num_questions)
+    banked = question_bank.sample(scope, results["metadatas"], req.difficulty, req.num_questions - fresh)
+    for question in banked:
+        yield question
+
+    missing = req.num_questions - len(banked)
+    if missing <= 0 or (banked and not rag.backend):
+        return
+
+    generated = []
+    try:
+        # Already served questions are regenerated like duplicates, so repeats don't shorten the quiz.
+        async for question in rag.iter_quiz_questions(
+            req.topic, _quiz_contexts(req, results, missing), req.difficulty, missing, notebook_id,
+            exclude=question_bank.served(scope),
+        ):
+            generated.append(question)
+            yield question
+            if len(generated) == missing:
+                break
+    except (LLMUnavailableError, RuntimeError) as e:
+        if not banked:
+            raise
+        print(f"Serving {len(banked)} banked quiz questions without fresh ones: {e}")
+    finally:
+        question_bank.mark_served(scope, generated)
+
+
 @router.post(
     "/generate_quiz",
     summary="Generate a quiz from documents",
@@ -59,30 +235,69 @@ async def ask(question: str = Form(...), filename: Optional[str] = Form(None)):
 )
 async def generate_quiz_endpoint(req: QuizRequest):
     """Generate a quiz based on uploaded documents and specified topic.
-    
+
     Retrieves relevant context from the vector database and uses AI
     to generate quiz questions with multiple choice or true/false format.
-    
+    Retrieval is scoped to the request's notebook and, if context_filter is
+    set, to that document. Questions pre-generated for the retrieved
+    sections are served from the question bank; the rest are generated in
+    parallel batches, each from a different slice of the retrieved
+    context, and validated one by one.
+
     Args:
         req: Quiz request with topic, difficulty, and number of questions
-        
+
     Returns:
         dict: Generated quiz in JSON format with questions, options, and answers
+
+    Raises:
+        HTTPException: 503 with Retry-After if the LLM is rate limited or unreachable
     """
-    q_embed = embedder.encode([req.topic]).tolist()
-    
-    results = collection.query(query_embeddings=q_embed, n_results=15)
-    
-    if not results or not results["documents"] or not results["documents"][0]:
-        context = f"Topic: {req.topic}. No specific uploaded documents found, please generate a quiz based on general academic knowledge of this topic."
-    else:
-        context = " ".join(results["documents"][0])
+    try:
+        questions = [question async for question in _quiz_questions(req)]
+    except LLMUnavailableError as e:
+        raise _llm_unavailable(e)
+    except RuntimeError as e:
+        return {"error": str(e)}
 
-    quiz_json = rag.generate_quiz(
-        topic=req.topic,
-        context=context,
-        difficulty=req.difficulty,
-        num_questions=req.num_questions
-    )
+    if not questions:
+        return {"error": "Failed to generate any valid quiz questions"}
+    return {"questions": questions}
+
+
+@router.post(
+    "/generate_quiz_stream",
+    summary="Generate a quiz, streaming questions as they are ready",
+    response_description="Server-Sent Events stream of quiz questions"
+)
+async def generate_quiz_stream(req: QuizRequest):
+    """Generate a quiz like /generate_quiz, streaming each question as soon as it is ready.
 
-    return quiz_json
+    Banked questions are sent first, then freshly generated ones as they
+    validate. The stream emits:
+    - ``question`` events with the question's position and content
+    - a final ``done`` event with the number of questions produced and requested,
+      or an ``error`` event if generation fails
+
+    Args:
+        req: Quiz request with topic, difficulty, and number of questions
+
+    Returns:
+        StreamingResponse: text/event-stream response
+    """
+    async def events():
+        count = 0
+        try:
+            async for question in _quiz_questions(req):
+                yield _sse("question", {"index": count, "question": question})
+                count += 1
+        except Exception as e:
+            yield _sse("error", {"message": f"Error generating quiz: {str(e)}"})
+            return
+        yield _sse("done", {"count": count, "requested": req.num_questions})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
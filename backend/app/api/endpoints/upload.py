@@ -1,137 +1,174 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from typing import Optional
-import os
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from fastapi.concurrency import run_in_threadpool
 
-from app.models.schemas import UrlRequest
-from app.services.pdf_processor import extract_pdf_text
-from app.services.content_scraper import process_url_content
-from app.core.services import embedder, collection, rag
+from app.models.schemas import UrlRequest, UrlBatchRequest
+from app.services.ingestion import ingest_pdf, ingest_url, schedule_question_bank
+from app.services.jobs import IngestJob, JobQueueFullError
+from app.core.services import job_manager, file_store
+from app.core import config
+from app.core.metrics import span
 
 router = APIRouter()
 
+def _then_build_question_bank(ingest):
+    """Wrap an ingestion coroutine so a successful run queues the document's question bank."""
+    async def work(job: IngestJob):
+        result = await ingest(job)
+        schedule_question_bank(result)
+        return result
+    return work
+
+
 @router.post(
     "/upload_pdf",
+    status_code=202,
     summary="Upload and process PDF document",
-    response_description="Processing results with chunk count and extracted text"
+    response_description="Ingestion job id to poll via /jobs/{job_id}"
 )
 async def upload_pdf(pdf: UploadFile = File(...), notebook_id: str = Form(None)):
-    """Upload a PDF file, extract text, and store in vector database.
-    
-    Processes the PDF by:
-    1. Extracting text from all pages
-    2. Chunking text into manageable pieces
-    3. Generating embeddings
-    4. Storing in ChromaDB for RAG queries
-    
+    """Upload a PDF file and queue it for background ingestion.
+
+    The file is stored under its content hash, served from /files/{hash},
+    and a job is queued that:
+    1. Extracts text from all pages
+    2. Chunks text into manageable pieces
+    3. Generates embeddings
+    4. Stores them in ChromaDB for RAG queries
+
+    Once it succeeds, quiz questions for the document are pre-generated
+    in the background.
+
     Args:
         pdf: PDF file upload
         notebook_id: Optional notebook identifier for organization
-        
-    Returns:
-        dict: Processing results including chunk count, filename, and extracted text
-    """
-    pdf_bytes = await pdf.read()
-
-    # Save file locally for static serving
-    upload_dir = "static/uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, pdf.filename)
-    
-    with open(file_path, "wb") as f:
-        f.write(pdf_bytes)
-
-    text = extract_pdf_text(pdf_bytes)
-    
-    if not text.strip():
-        return {
-            "message": "PDF uploaded but no text extraction was possible (it might be an image-only PDF).",
-            "chunks": 0,
-            "filename": pdf.filename
-        }
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-    chunks = splitter.split_text(text)
+    Returns:
+        dict: Job id and initial status; the processing results are reported by /jobs/{job_id}
 
-    embeddings = embedder.encode(chunks).tolist()
+    Raises:
+        HTTPException: If the ingestion queue is full
+    """
+    # Store the file by content hash for serving; the extractor memory-maps it from there
+    with span("upload_save"):
+        content_hash, file_path = await run_in_threadpool(file_store.save, pdf.file)
 
-    metadatas = [{"source": pdf.filename, "notebook_id": notebook_id or "general"} for _ in chunks]
+    url = f"http://127.0.0.1:8000/files/{content_hash}"
+    job = IngestJob("pdf", pdf.filename, notebook_id)
 
-    ids = [f"{pdf.filename}-{i}" for i in range(len(chunks))]
-    
-    if chunks:
-        collection.add(documents=chunks, embeddings=embeddings, ids=ids, metadatas=metadatas)
+    try:
+        job_manager.submit(job, _then_build_question_bank(
+            lambda j: ingest_pdf(j, file_path, content_hash, pdf.filename, notebook_id, url)
+        ))
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
 
     return {
-        "message": "PDF extracted and stored.",
-        "chunks": len(chunks),
+        "message": "PDF upload accepted for processing.",
+        "job_id": job.job_id,
+        "status": job.status,
         "filename": pdf.filename,
         "notebook_id": notebook_id,
-        "text": text,
-        "url": f"http://127.0.0.1:8000/static/uploads/{pdf.filename}"
+        "url": url
     }
 
 
 @router.post(
     "/upload_url",
+    status_code=202,
     summary="Process URL content",
-    response_description="Processing results with extracted content and AI summary"
+    response_description="Ingestion job id to poll via /jobs/{job_id}"
 )
 async def upload_url(req: UrlRequest):
-    """Process content from a URL (website, YouTube, or Wikipedia).
-    
+    """Queue content from a URL (website, YouTube, or Wikipedia) for ingestion.
+
     Supports multiple content types:
     - Regular websites (scraped and cleaned)
     - YouTube videos (transcript extraction)
     - Wikipedia articles (via 'wikipedia:' prefix)
-    
-    Processes content by:
-    1. Extracting text from the source
-    2. Chunking and embedding
-    3. Storing in vector database
-    4. Generating AI summary
-    
+
+    The background job:
+    1. Extracts text from the source
+    2. Chunks and embeds it
+    3. Stores it in the vector database
+    4. Generates an AI summary
+
+    Once it succeeds, quiz questions for the content are pre-generated
+    in the background.
+
     Args:
         req: URL request containing url, optional notebook_id, and optional name
-        
+
     Returns:
-        dict: Processing results with chunks, text, and AI-generated summary
-        
+        dict: Job id and initial status; the processing results are reported by /jobs/{job_id}
+
     Raises:
-        HTTPException: If text extraction fails
+        HTTPException: If the ingestion queue is full
     """
-    print(f"Scraping URL: {req.url}")
-    text = process_url_content(req.url)
-    
-    if not text.strip():
-        raise HTTPException(status_code=400, detail="Failed to extract text from URL.")
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-    chunks = splitter.split_text(text)
-    
-    embeddings = embedder.encode(chunks).tolist()
-    
     filename = req.name or req.url
-    ids = [f"{filename}-{i}" for i in range(len(chunks))]
-    metadatas = [{"source": filename, "notebook_id": req.notebook_id or "general"} for _ in chunks]
-    
-    if chunks:
-        collection.add(documents=chunks, embeddings=embeddings, ids=ids, metadatas=metadatas)
-    
-    is_youtube = "YouTube Video Transcript" in text[:50]
-    
-    if is_youtube:
-        summary_prompt = "The following is a transcript of a YouTube video. Summarize the key concepts, main arguments, and any educational takeaways."
-    else:
-        summary_prompt = "Summarize the key points of the following web page content."
-
-    summary = rag.generate_answer(summary_prompt, text[:4000])
+    job = IngestJob("url", filename, req.notebook_id)
+
+    try:
+        job_manager.submit(job, _then_build_question_bank(
+            lambda j: ingest_url(j, req.url, req.name, req.notebook_id)
+        ))
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
 
     return {
-        "message": "URL content processed.",
-        "chunks": len(chunks),
+        "message": "URL accepted for processing.",
+        "job_id": job.job_id,
+        "status": job.status,
         "filename": filename,
+        "notebook_id": req.notebook_id
+    }
+
+
+@router.post(
+    "/upload_urls",
+    status_code=202,
+    summary="Process several URLs",
+    response_description="One ingestion job id per URL, to poll via /jobs/{job_id}"
+)
+async def upload_urls(req: UrlBatchRequest):
+    """Queue a batch of URLs, YouTube videos and Wikipedia queries for ingestion.
+
+    Each entry becomes its own background job, processed like /upload_url.
+    The batch is queued as a whole: if the ingestion queue can't take every
+    entry, none is queued. Jobs run concurrently up to the ingestion job limit, and page fetches
+    are limited per host so a batch from one site doesn't hammer it.
+    Entries may be website URLs, YouTube URLs or bare video IDs, and
+    'wikipedia:' queries; duplicates are ingested once.
+
+    Args:
+        req: Batch request with the list of URLs and an optional notebook_id
+
+    Returns:
+        dict: One {url, job_id, status} entry per distinct URL
+
+    Raises:
+        HTTPException: If the batch is empty or too large, or the ingestion queue can't take it
+    """
+    urls = list(dict.fromkeys(url.strip() for url in req.urls if url.strip()))
+    if not urls:
+        raise HTTPException(status_code=400, detail="No URLs given.")
+    if len(urls) > config.URL_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {config.URL_BATCH_MAX} URLs per batch.")
+
+    entries = [
+        (IngestJob("url", url, req.notebook_id), _then_build_question_bank(
+            lambda j, url=url: ingest_url(j, url, None, req.notebook_id)
+        ))
+        for url in urls
+    ]
+    try:
+        # All or nothing, so a retried batch doesn't ingest its first URLs twice.
+        job_manager.submit_all(entries)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    jobs = [{"url": url, "job_id": job.job_id, "status": job.status} for url, (job, _) in zip(urls, entries)]
+
+    return {
+        "message": f"{len(jobs)} URLs accepted for processing.",
         "notebook_id": req.notebook_id,
-        "text": text,
-        "summary": summary
+        "jobs": jobs
     }
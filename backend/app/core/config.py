@@ -0,0 +1,177 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment, falling back to a default."""
+    value = os.getenv(name)
+    try:
+        return int(value) if value else default
+    except ValueError:
+        print(f"Warning: invalid integer for {name}={value!r}, using {default}.")
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment, falling back to a default."""
+    value = os.getenv(name)
+    try:
+        return float(value) if value else default
+    except ValueError:
+        print(f"Warning: invalid number for {name}={value!r}, using {default}.")
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a boolean setting (1/true/yes/on) from the environment."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Ingestion worker pools
+INGEST_THREAD_WORKERS = _env_int("INGEST_THREAD_WORKERS", 4)
+INGEST_PROCESS_WORKERS = _env_int("INGEST_PROCESS_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1)))
+MAX_CONCURRENT_JOBS = _env_int("MAX_CONCURRENT_JOBS", 2)
+MAX_PENDING_JOBS = _env_int("MAX_PENDING_JOBS", 32)
+JOB_RETENTION_SECONDS = _env_int("JOB_RETENTION_SECONDS", 3600)
+
+# Embeddings and storage
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# "torch" (default) or "onnx"; EMBEDDER_ONNX_FILE selects a pre-exported or
+# quantized graph from the model repo, e.g. "onnx/model_qint8_avx512_vnni.onnx".
+EMBEDDER_BACKEND = os.getenv("EMBEDDER_BACKEND", "torch").lower()
+EMBEDDER_ONNX_FILE = os.getenv("EMBEDDER_ONNX_FILE")
+WARMUP_ON_STARTUP = _env_bool("WARMUP_ON_STARTUP", True)
+
+# Multi-worker mode: when set, API workers use the model, vector store and
+# indexes hosted by `python model_server.py` at this Unix socket path (or
+# loopback host:port) instead of loading their own copies. The server unpickles
+# what clients send, so it requires a shared secret EMBEDDING_SERVER_AUTHKEY.
+EMBEDDING_SERVER_ADDRESS = os.getenv("EMBEDDING_SERVER_ADDRESS")
+EMBEDDING_SERVER_AUTHKEY = os.getenv("EMBEDDING_SERVER_AUTHKEY", "").encode("utf-8")
+if EMBEDDING_SERVER_ADDRESS and not EMBEDDING_SERVER_AUTHKEY:
+    raise RuntimeError("EMBEDDING_SERVER_ADDRESS is set but EMBEDDING_SERVER_AUTHKEY is not; set it to a random secret on the model server and every worker.")
+# How often workers pick up answer-cache invalidations published by other workers.
+ANSWER_CACHE_SYNC_SECONDS = _env_float("ANSWER_CACHE_SYNC_SECONDS", 1.0)
+VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "vector_db")
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(VECTOR_DB_PATH, "embedding_cache"))
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.join(VECTOR_DB_PATH, "http_cache"))
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", os.path.join(VECTOR_DB_PATH, "transcripts"))
+PER_NOTEBOOK_COLLECTIONS = _env_bool("PER_NOTEBOOK_COLLECTIONS", False)
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", os.path.join(VECTOR_DB_PATH, "lexical_index.pkl"))
+DOCUMENT_REGISTRY_PATH = os.getenv("DOCUMENT_REGISTRY_PATH", os.path.join(VECTOR_DB_PATH, "documents.json"))
+# Uploaded PDFs, stored once per content under their SHA-256 and served from
+# /files/{hash}. Files saved by earlier versions stay under static/uploads.
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+
+# Extracted document text, served to the viewer a page or range at a time by
+# /documents/{document_id}/text; ranges are capped at DOCUMENT_TEXT_MAX_CHARS.
+DOCUMENT_TEXT_DIR = os.getenv("DOCUMENT_TEXT_DIR", os.path.join(VECTOR_DB_PATH, "document_text"))
+DOCUMENT_TEXT_CACHE_SIZE = _env_int("DOCUMENT_TEXT_CACHE_SIZE", 16)
+DOCUMENT_TEXT_MAX_CHARS = _env_int("DOCUMENT_TEXT_MAX_CHARS", 100_000)
+# Responses smaller than this are sent uncompressed.
+DOCUMENT_TEXT_COMPRESS_MIN_BYTES = _env_int("DOCUMENT_TEXT_COMPRESS_MIN_BYTES", 1024)
+
+# Answer cache
+ANSWER_CACHE_MAX_ENTRIES = _env_int("ANSWER_CACHE_MAX_ENTRIES", 1024)
+ANSWER_CACHE_TTL_SECONDS = _env_int("ANSWER_CACHE_TTL_SECONDS", 3600)
+ANSWER_CACHE_SIMILARITY = _env_float("ANSWER_CACHE_SIMILARITY", 0.95)
+
+# Query embedding micro-batching
+EMBED_BATCH_MAX_SIZE = _env_int("EMBED_BATCH_MAX_SIZE", 32)
+EMBED_BATCH_MAX_WAIT_MS = _env_float("EMBED_BATCH_MAX_WAIT_MS", 5.0)
+
+# Retrieval and prompt context budgets
+ASK_TOP_K = _env_int("ASK_TOP_K", 8)
+QUIZ_TOP_K = _env_int("QUIZ_TOP_K", 15)
+ASK_CONTEXT_TOKENS = _env_int("ASK_CONTEXT_TOKENS", 1500)
+QUIZ_CONTEXT_TOKENS = _env_int("QUIZ_CONTEXT_TOKENS", 2000)
+
+# Optional cross-encoder reranking: retrieval fetches RERANK_CANDIDATES chunks,
+# scores them against the question in one batched forward pass and keeps the
+# best ASK_TOP_K / QUIZ_TOP_K. A rerank slower than RERANK_TIMEOUT_MS (0 for no
+# limit) falls back to the first-stage order.
+RERANK_ENABLED = _env_bool("RERANK_ENABLED", False)
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = _env_int("RERANK_CANDIDATES", 30)
+RERANK_TIMEOUT_MS = _env_float("RERANK_TIMEOUT_MS", 500.0)
+RERANK_CACHE_MAX_ENTRIES = _env_int("RERANK_CACHE_MAX_ENTRIES", 8192)
+
+# Quiz fan-out: questions per parallel LLM call, retries for a batch that comes
+# back short, and the smallest context slice a batch is given. A request may
+# ask for at most QUIZ_MAX_QUESTIONS questions, bounding its LLM fan-out.
+QUIZ_MAX_QUESTIONS = _env_int("QUIZ_MAX_QUESTIONS", 30)
+QUIZ_BATCH_SIZE = _env_int("QUIZ_BATCH_SIZE", 3)
+QUIZ_BATCH_RETRIES = _env_int("QUIZ_BATCH_RETRIES", 2)
+QUIZ_MIN_SLICE_TOKENS = _env_int("QUIZ_MIN_SLICE_TOKENS", 500)
+
+# Question bank: quiz questions pre-generated per document section and
+# difficulty after ingestion. /generate_quiz serves banked questions and asks
+# the LLM for only QUESTION_BANK_FRESH_QUESTIONS new ones (0 for none).
+# Off by default: a large document costs on the order of 100k LLM tokens.
+# Builds run at low priority within QUESTION_BANK_LLM_SHARE of each Groq
+# quota bucket and wait whenever an interactive call is waiting.
+QUESTION_BANK_ENABLED = _env_bool("QUESTION_BANK_ENABLED", False)
+QUESTION_BANK_LLM_SHARE = _env_float("QUESTION_BANK_LLM_SHARE", 0.25)
+QUESTION_BANK_DIR = os.getenv("QUESTION_BANK_DIR", os.path.join(VECTOR_DB_PATH, "question_bank"))
+QUESTION_BANK_DIFFICULTIES = [d.strip() for d in os.getenv("QUESTION_BANK_DIFFICULTIES", "easy,medium,hard").split(",") if d.strip()]
+QUESTION_BANK_QUESTIONS_PER_SECTION = _env_int("QUESTION_BANK_QUESTIONS_PER_SECTION", 4)
+QUESTION_BANK_SECTION_CHUNKS = _env_int("QUESTION_BANK_SECTION_CHUNKS", 8)
+QUESTION_BANK_MAX_SECTIONS = _env_int("QUESTION_BANK_MAX_SECTIONS", 12)
+QUESTION_BANK_CONTEXT_TOKENS = _env_int("QUESTION_BANK_CONTEXT_TOKENS", 1000)
+QUESTION_BANK_FRESH_QUESTIONS = _env_int("QUESTION_BANK_FRESH_QUESTIONS", 1)
+
+# Chunking per source type, in characters. MiniLM reads at most 256 tokens
+# (roughly 1000 characters) of a chunk, so larger chunks would be truncated.
+CHUNK_SIZE_PDF = _env_int("CHUNK_SIZE_PDF", 900)
+CHUNK_OVERLAP_PDF = _env_int("CHUNK_OVERLAP_PDF", 90)
+CHUNK_SIZE_WEB = _env_int("CHUNK_SIZE_WEB", 900)
+CHUNK_OVERLAP_WEB = _env_int("CHUNK_OVERLAP_WEB", 90)
+CHUNK_SIZE_TRANSCRIPT = _env_int("CHUNK_SIZE_TRANSCRIPT", 900)
+CHUNK_OVERLAP_TRANSCRIPT = _env_int("CHUNK_OVERLAP_TRANSCRIPT", 0)
+# YouTube transcripts are chunked into windows of this many seconds.
+TRANSCRIPT_WINDOW_SECONDS = _env_float("TRANSCRIPT_WINDOW_SECONDS", 60.0)
+
+# URL fetching: pooled session, per-host concurrency and the on-disk response cache
+HTTP_POOL_SIZE = _env_int("HTTP_POOL_SIZE", 16)
+HTTP_PER_HOST_LIMIT = _env_int("HTTP_PER_HOST_LIMIT", 4)
+HTTP_TIMEOUT_SECONDS = _env_float("HTTP_TIMEOUT_SECONDS", 15.0)
+HTTP_CACHE_MAX_BYTES = _env_int("HTTP_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+HTTP_CACHE_FRESH_SECONDS = _env_float("HTTP_CACHE_FRESH_SECONDS", 300.0)
+URL_BATCH_MAX = _env_int("URL_BATCH_MAX", 50)
+# HTML extraction: "lxml" (main content, heading-aware sections) or "bs4"
+# (whole page text); only the first HTML_MAX_BYTES of a page are read.
+HTML_EXTRACTOR = os.getenv("HTML_EXTRACTOR", "lxml").lower()
+HTML_MAX_BYTES = _env_int("HTML_MAX_BYTES", 5 * 1024 * 1024)
+HEALTH_SCRAPER_TTL_SECONDS = _env_float("HEALTH_SCRAPER_TTL_SECONDS", 300.0)
+
+# Request tracing: stage timings of a TRACE_SAMPLE_RATE fraction of requests,
+# and of every request slower than TRACE_SLOW_SECONDS (0 disables), are
+# logged with the request id. Latency histograms are served at /metrics.
+TRACE_SAMPLE_RATE = _env_float("TRACE_SAMPLE_RATE", 0.0)
+TRACE_SLOW_SECONDS = _env_float("TRACE_SLOW_SECONDS", 0.0)
+
+# LLM backend: "groq", or "stub" for a deterministic local stand-in with no
+# network calls (load tests, offline benchmarks).
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq").lower()
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+LLM_STUB_LATENCY_MS = _env_float("LLM_STUB_LATENCY_MS", 200.0)
+LLM_STUB_TOKENS_PER_SECOND = _env_float("LLM_STUB_TOKENS_PER_SECOND", 200.0)
+
+# LLM gateway: connection pool, concurrency limits, Groq quota and retries.
+# Quotas default to Groq's free tier for llama-3.3-70b-versatile; 0 disables a limit.
+GROQ_MAX_CONNECTIONS = _env_int("GROQ_MAX_CONNECTIONS", 20)
+LLM_MAX_CONCURRENCY = _env_int("LLM_MAX_CONCURRENCY", 8)
+LLM_MAX_CONCURRENCY_PER_NOTEBOOK = _env_int("LLM_MAX_CONCURRENCY_PER_NOTEBOOK", 2)
+GROQ_REQUESTS_PER_MINUTE = _env_int("GROQ_REQUESTS_PER_MINUTE", 30)
+GROQ_TOKENS_PER_MINUTE = _env_int("GROQ_TOKENS_PER_MINUTE", 12000)
+LLM_TIMEOUT_SECONDS = _env_float("LLM_TIMEOUT_SECONDS", 60.0)
+LLM_MAX_RETRIES = _env_int("LLM_MAX_RETRIES", 4)
+LLM_BACKOFF_BASE_SECONDS = _env_float("LLM_BACKOFF_BASE_SECONDS", 0.5)
+LLM_BACKOFF_MAX_SECONDS = _env_float("LLM_BACKOFF_MAX_SECONDS", 20.0)
+# Send a duplicate request if the first hasn't answered after this long; 0 disables hedging.
+LLM_HEDGE_AFTER_SECONDS = _env_float("LLM_HEDGE_AFTER_SECONDS", 6.0)
@@ -0,0 +1,247 @@
+import re
+import time
+import uuid
+import asyncio
+import random
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from a cached lookup to a slow LLM call.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Client-supplied request ids are echoed back, so only accept plain tokens.
+REQUEST_ID_RE = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """A Prometheus histogram with a fixed label set.
+
+    Observations take one lock and one bisect, so they are cheap enough for
+    every request.
+
+    Attributes:
+        name: Metric name
+        help: Help text shown in the exposition
+        labelnames: Names of the labels every observation provides values for
+        buckets: Upper bounds of the buckets, ascending
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """A Prometheus counter with a fixed label set."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for labels, value in snapshot:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+REGISTRY: List[Any] = []
+
+REQUEST_SECONDS = Histogram(
+    "smartstudy_request_seconds", "HTTP request latency, until the last byte of the response is sent.",
+    ["method", "route", "status"],
+)
+STAGE_SECONDS = Histogram("smartstudy_stage_seconds", "Time spent in each stage of request handling and ingestion.", ["stage"])
+LLM_TOKENS = Counter("smartstudy_llm_tokens_total", "Estimated tokens sent to and generated by the LLM.", ["purpose", "kind"])
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Timings of the stages of one request, logged when the request is sampled or slow."""
+
+    __slots__ = ("request_id", "sampled", "spans")
+
+    def __init__(self, request_id: str, sampled: bool):
+        self.request_id = request_id
+        self.sampled = sampled
+        self.spans: List[Tuple[str, float, Dict[str, Any]]] = []
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("smartstudy_trace", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace is not None else None
+
+
+def observe(stage: str, seconds: float, **fields):
+    """Record a stage duration, and add it to the current request's trace.
+
+    Args:
+        stage: Stage name, the "stage" label of smartstudy_stage_seconds
+        seconds: Duration of the stage
+        **fields: Extra details (token counts, result sizes) for the trace log only
+    """
+    STAGE_SECONDS.observe(seconds, stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append((stage, seconds, fields))
+
+
+@contextmanager
+def span(stage: str, **fields):
+    """Time the enclosed block as one stage; see observe."""
+    started = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        observe(stage, time.perf_counter() - started, **fields)
+
+
+def create_untraced_task(coro) -> asyncio.Task:
+    """Start a background task whose spans don't join the current request's trace.
+
+    A task copies the context it is created in, so without this, work that
+    outlives a request (ingestion jobs, worker loops) keeps appending spans
+    to that request's Trace.
+    """
+    token = _current_trace.set(None)
+    try:
+        return asyncio.create_task(coro)
+    finally:
+        _current_trace.reset(token)
+
+
+def count_llm_tokens(purpose: str, prompt_tokens: int, completion_tokens: int):
+    LLM_TOKENS.inc(prompt_tokens, purpose, "prompt")
+    LLM_TOKENS.inc(completion_tokens, purpose, "completion")
+
+
+def _format_trace(trace: Trace, method: str, route: str, status: int, seconds: float) -> str:
+    parts = []
+    for stage, duration, fields in trace.spans:
+        details = ",".join(f"{key}={value}" for key, value in fields.items())
+        parts.append(f"{stage}={duration * 1000:.1f}ms" + (f"({details})" if details else ""))
+    return f"[trace {trace.request_id}] {method} {route} {status} {seconds * 1000:.1f}ms " + " ".join(parts)
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times requests and traces their stages.
+
+    Every request gets a request id (the client's X-Request-ID if it sent a
+    usable one), echoed in the X-Request-ID response header. Stage spans
+    recorded while the request runs are collected on a per-request trace,
+    which is printed for a ``sample_rate`` fraction of requests and for any
+    request slower than ``slow_seconds``.
+
+    Attributes:
+        sample_rate: Fraction of requests whose trace is logged
+        slow_seconds: Log the trace of requests at least this slow (0 to disable)
+    """
+
+    def __init__(self, app, sample_rate: float = 0.0, slow_seconds: float = 0.0):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+
+    def _request_id(self, scope) -> str:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if REQUEST_ID_RE.fullmatch(candidate):
+                    return candidate
+                break
+        return uuid.uuid4().hex[:16]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(self._request_id(scope), self.sample_rate > 0 and random.random() < self.sample_rate)
+        token = _current_trace.set(trace)
+        header = (b"x-request-id", trace.request_id.encode("latin-1"))
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", ())) + [header]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            seconds = time.perf_counter() - started
+            # The router stores the matched route in the scope; label by its
+            # template so /jobs/{job_id} is one series.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(seconds, scope["method"], route, str(status))
+            if trace.sampled or (self.slow_seconds and seconds >= self.slow_seconds):
+                print(_format_trace(trace, scope["method"], route, status, seconds))
+            _current_trace.reset(token)
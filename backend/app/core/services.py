@@ -1,28 +1,321 @@
-from sentence_transformers import SentenceTransformer
-import chromadb
-from app.rag_core import RagEngine
 import os
+import time
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional
 from dotenv import load_dotenv
 
+from app.rag_core import RagEngine
+from app.services.jobs import JobBoard, JobManager
+from app.services.document_registry import DocumentRegistry
+from app.services.answer_cache import AnswerCache, InvalidationLog
+from app.services.question_bank import QuestionBank
+from app.services.document_text import DocumentTextStore
+from app.services.file_store import FileStore
+from app.services.reranker import Reranker
+from app.services.http_fetch import HttpFetcher
+from app.services.chunker import Chunker, ChunkConfig
+from app.services.context_builder import count_tokens
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.model_server import ModelServer, ModelServerClient, parse_address
+from app.core import config
+
 load_dotenv()
 
 # Create static dir if not exists
 os.makedirs("static/uploads", exist_ok=True)
 
-# Initialize singletons
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-client = chromadb.PersistentClient(path="vector_db")
-collection = client.get_or_create_collection("docs")
-rag = RagEngine()
+# Heavy singletons (the embedding model, the Chroma client and the indexes on
+# disk) are created on first use so importing this module is cheap; uvicorn
+# workers, the reload loop and liveness probes don't pay the model load.
+_instances: Dict[str, Any] = {}
+_instance_lock = threading.RLock()
+_warmup_error: Optional[str] = None
+# True inside the model server process, which always uses the local objects.
+_hosting = False
+
+
+def _lazy(name: str, factory: Callable[[], Any]) -> Any:
+    instance = _instances.get(name)
+    if instance is None:
+        with _instance_lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = factory()
+                _instances[name] = instance
+    return instance
+
+
+def _remote(target: str):
+    """Proxy for a service hosted by the model server, or None to use a local one."""
+    if _hosting or not config.EMBEDDING_SERVER_ADDRESS:
+        return None
+    client = _lazy("model_server_client", lambda: ModelServerClient(
+        parse_address(config.EMBEDDING_SERVER_ADDRESS), config.EMBEDDING_SERVER_AUTHKEY
+    ))
+    return client.service(target)
+
+
+def _load_embedder():
+    # Imported here: sentence_transformers pulls in torch, which takes seconds.
+    from sentence_transformers import SentenceTransformer
+
+    if config.EMBEDDER_BACKEND == "onnx":
+        model_kwargs = {"file_name": config.EMBEDDER_ONNX_FILE} if config.EMBEDDER_ONNX_FILE else {}
+        print(f"Loading embedding model {config.EMBEDDING_MODEL} (ONNX {config.EMBEDDER_ONNX_FILE or 'default'})")
+        return SentenceTransformer(config.EMBEDDING_MODEL, backend="onnx", model_kwargs=model_kwargs)
+
+    print(f"Loading embedding model {config.EMBEDDING_MODEL}")
+    return SentenceTransformer(config.EMBEDDING_MODEL)
+
+
+def _load_cross_encoder():
+    from sentence_transformers import CrossEncoder
+
+    print(f"Loading reranking model {config.RERANK_MODEL}")
+    return CrossEncoder(config.RERANK_MODEL)
+
+
+def _load_chroma_client():
+    import chromadb
+    return chromadb.PersistentClient(path=config.VECTOR_DB_PATH)
+
+
+def _load_vector_store():
+    from app.services.vector_store import VectorStore
+    return VectorStore(get_chroma_client(), per_notebook=config.PER_NOTEBOOK_COLLECTIONS)
+
+
+def _load_lexical_index():
+    from app.services.lexical_index import LexicalIndex
+    return LexicalIndex(config.LEXICAL_INDEX_PATH)
+
+
+def _load_embedding_cache():
+    from app.services.embedding_cache import EmbeddingCache
+    return EmbeddingCache(config.EMBEDDING_CACHE_DIR, config.EMBEDDING_MODEL)
+
+
+# Lightweight singletons
+query_embedder = EmbeddingBatcher(
+    lambda texts: get_embedder().encode(texts),
+    max_batch_size=config.EMBED_BATCH_MAX_SIZE,
+    max_wait_ms=config.EMBED_BATCH_MAX_WAIT_MS
+)
+document_registry = _remote("document_registry") or DocumentRegistry(config.DOCUMENT_REGISTRY_PATH)
+answer_cache = AnswerCache(
+    max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+    similarity_threshold=config.ANSWER_CACHE_SIMILARITY
+)
+rag = RagEngine(answer_cache=answer_cache)
+reranker = Reranker(
+    lambda pairs: get_cross_encoder().predict(pairs, batch_size=len(pairs), show_progress_bar=False),
+    max_entries=config.RERANK_CACHE_MAX_ENTRIES,
+    timeout_ms=config.RERANK_TIMEOUT_MS
+)
+question_bank = QuestionBank(config.QUESTION_BANK_DIR)
+document_text = DocumentTextStore(config.DOCUMENT_TEXT_DIR, max_cached=config.DOCUMENT_TEXT_CACHE_SIZE)
+file_store = FileStore(config.UPLOAD_DIR)
+http_fetcher = HttpFetcher(
+    config.HTTP_CACHE_DIR,
+    max_bytes=config.HTTP_CACHE_MAX_BYTES,
+    fresh_seconds=config.HTTP_CACHE_FRESH_SECONDS,
+    pool_size=config.HTTP_POOL_SIZE,
+    per_host_limit=config.HTTP_PER_HOST_LIMIT,
+    timeout=config.HTTP_TIMEOUT_SECONDS
+)
+job_manager = JobManager(board=_remote("jobs"))
+chunker = Chunker({
+    "pdf": ChunkConfig(config.CHUNK_SIZE_PDF, config.CHUNK_OVERLAP_PDF),
+    "web": ChunkConfig(config.CHUNK_SIZE_WEB, config.CHUNK_OVERLAP_WEB),
+    "transcript": ChunkConfig(config.CHUNK_SIZE_TRANSCRIPT, config.CHUNK_OVERLAP_TRANSCRIPT),
+})
 
 def get_embedder():
-    return embedder
+    return _remote("embedder") or _lazy("embedder", _load_embedder)
+
+def get_query_embedder():
+    return query_embedder
+
+def get_cross_encoder():
+    return _lazy("cross_encoder", _load_cross_encoder)
+
+def get_reranker():
+    return reranker
+
+def get_embedding_cache():
+    return _remote("embedding_cache") or _lazy("embedding_cache", _load_embedding_cache)
+
+def embed_chunks(chunks):
+    """Embed document chunks, reusing cached vectors for previously seen chunks."""
+    remote = _remote("services")
+    if remote is not None:
+        return remote.embed_chunks(chunks)
+    return get_embedding_cache().encode(chunks, get_embedder().encode)
+
+def get_answer_cache():
+    return answer_cache
+
+def invalidate_answers(notebook_id: str):
+    """Drop a notebook's cached answers here and, through the model server, in every other worker."""
+    answer_cache.invalidate(notebook_id)
+    remote = _remote("answer_invalidations")
+    if remote is not None:
+        remote.publish(notebook_id)
+
+
+def _sync_answer_cache(remote):
+    seq = None
+    while True:
+        try:
+            latest, notebooks = remote.since(seq)
+            # None: this worker fell behind the log; a lower seq: the server restarted.
+            if notebooks is None or (seq is not None and latest < seq):
+                answer_cache.clear()
+            else:
+                for notebook_id in notebooks:
+                    answer_cache.invalidate(notebook_id)
+            seq = latest
+        except Exception as e:
+            print(f"Answer cache sync failed: {e}")
+        time.sleep(config.ANSWER_CACHE_SYNC_SECONDS)
+
+
+def start_answer_cache_sync() -> Optional[threading.Thread]:
+    """In multi-worker mode, apply other workers' answer-cache invalidations on a daemon thread."""
+    remote = _remote("answer_invalidations")
+    if remote is None:
+        return None
+    thread = threading.Thread(target=_sync_answer_cache, args=(remote,), name="answer-cache-sync", daemon=True)
+    thread.start()
+    return thread
 
 def get_chroma_client():
-    return client
+    return _lazy("chroma_client", _load_chroma_client)
 
 def get_collection():
-    return collection
+    return get_vector_store().collection_for(None)
+
+def get_vector_store():
+    return _remote("vector_store") or _lazy("vector_store", _load_vector_store)
+
+def get_lexical_index():
+    return _remote("lexical_index") or _lazy("lexical_index", _load_lexical_index)
+
+def get_http_fetcher():
+    return http_fetcher
+
+def get_chunker():
+    return chunker
+
+def get_question_bank():
+    return question_bank
+
+def get_file_store():
+    return file_store
+
+def get_document_text():
+    return document_text
+
+def get_document_registry():
+    return document_registry
 
 def get_rag_engine():
     return rag
+
+def get_job_manager():
+    return job_manager
+
+
+def warm_up():
+    """Load the model and stores now instead of on the first request.
+
+    Runs a one-text encode so the model's first-call overhead is paid too.
+    Errors are recorded for the readiness check rather than raised.
+    """
+    global _warmup_error
+    try:
+        get_embedder().encode(["warm up"])
+        get_vector_store().count()
+        get_lexical_index().stats()
+        get_embedding_cache().stats()
+        # Loads (and on first use downloads) the tiktoken encoding.
+        count_tokens("warm up")
+        if config.RERANK_ENABLED:
+            get_cross_encoder().predict([("warm up", "warm up")], show_progress_bar=False)
+        _warmup_error = None
+        print("Warm-up complete: embedding model and vector store loaded.")
+    except Exception as e:
+        _warmup_error = str(e)
+        print(f"Warm-up failed: {e}")
+
+
+def start_background_warm_up() -> threading.Thread:
+    """Run warm_up on a daemon thread so startup doesn't block on it."""
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness() -> Dict[str, Any]:
+    """Report which heavy singletons are loaded, asking the model server if one is used."""
+    remote = _remote("services")
+    if remote is not None:
+        try:
+            return remote.readiness()
+        except Exception as e:
+            return {"ready": False, "components": {"model_server": False}, "error": str(e)}
+
+    components = {
+        "embedder": "embedder" in _instances,
+        "vector_store": "vector_store" in _instances,
+        "lexical_index": "lexical_index" in _instances,
+    }
+    if config.RERANK_ENABLED:
+        components["reranker"] = "cross_encoder" in _instances
+    return {
+        "ready": all(components.values()),
+        "components": components,
+        "error": _warmup_error,
+    }
+
+
+# What API workers may call on each service the model server hosts.
+REMOTE_METHODS = {
+    "embedder": ["encode"],
+    "vector_store": ["query", "get", "upsert", "delete", "count"],
+    "lexical_index": ["search", "upsert", "delete", "delete_source", "save", "stats"],
+    "embedding_cache": ["stats"],
+    "document_registry": ["get", "put"],
+    "jobs": ["publish", "get"],
+    "services": ["embed_chunks", "readiness"],
+    "answer_invalidations": ["publish", "since"],
+}
+
+
+def serve_model_server():
+    """Host the model and stores for API workers until the process is stopped.
+
+    Run via ``python model_server.py`` with EMBEDDING_SERVER_ADDRESS set, then
+    start uvicorn with several workers and the same setting.
+    """
+    global _hosting
+    if not config.EMBEDDING_SERVER_ADDRESS:
+        raise RuntimeError("Set EMBEDDING_SERVER_ADDRESS to the socket path (or host:port) to listen on.")
+    _hosting = True
+    warm_up()
+    server = ModelServer(parse_address(config.EMBEDDING_SERVER_ADDRESS), config.EMBEDDING_SERVER_AUTHKEY, {
+        "embedder": get_embedder(),
+        "vector_store": get_vector_store(),
+        "lexical_index": get_lexical_index(),
+        "embedding_cache": get_embedding_cache(),
+        "document_registry": DocumentRegistry(config.DOCUMENT_REGISTRY_PATH),
+        "jobs": JobBoard(),
+        "services": SimpleNamespace(embed_chunks=embed_chunks, readiness=readiness),
+        "answer_invalidations": InvalidationLog(),
+    }, REMOTE_METHODS)
+    try:
+        server.serve_forever()
+    finally:
+        get_lexical_index().save()
@@ -4,7 +4,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
 
-from app.api.endpoints import upload, qa, health
+from app.api.endpoints import upload, qa, health, jobs, documents, files
+from app.core import config
+from app.core.metrics import MetricsMiddleware
+from app.core.services import job_manager, rag, reranker, start_background_warm_up, start_answer_cache_sync
 
 load_dotenv()
 
@@ -14,7 +17,7 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Create static dir if not exists
+# Uploads saved before content-hash storage are still served from here
 os.makedirs("static/uploads", exist_ok=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -23,12 +26,40 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "ETag", "Accept-Ranges", "Content-Range", "Content-Length"],
 )
+app.add_middleware(MetricsMiddleware, sample_rate=config.TRACE_SAMPLE_RATE, slow_seconds=config.TRACE_SLOW_SECONDS)
 
 # Include routers
 app.include_router(upload.router, tags=["Upload"])
 app.include_router(qa.router, tags=["Q&A"])
 app.include_router(health.router, tags=["Health"])
+app.include_router(jobs.router, tags=["Jobs"])
+app.include_router(documents.router, tags=["Documents"])
+app.include_router(files.router, tags=["Documents"])
+
+
+@app.on_event("startup")
+def warm_up_services():
+    if config.WARMUP_ON_STARTUP:
+        start_background_warm_up()
+
+
+@app.on_event("startup")
+def sync_answer_cache():
+    start_answer_cache_sync()
+
+
+@app.on_event("shutdown")
+def shutdown_worker_pools():
+    job_manager.shutdown()
+    reranker.shutdown()
+
+
+@app.on_event("shutdown")
+async def close_llm_connections():
+    await rag.aclose()
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,24 +1,75 @@
-from typing import Optional
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+from app.core import config
 
 class QuizRequest(BaseModel):
     """Request model for quiz generation.
     
     Attributes:
         topic: The topic or subject for the quiz
-        context_filter: Optional filter for specific context
+        context_filter: Optional document (source filename) to restrict context to
+        notebook_id: Optional notebook to restrict context to
         difficulty: Quiz difficulty level (easy, medium, hard)
-        num_questions: Number of questions to generate
+        num_questions: Number of questions to generate (1 to QUIZ_MAX_QUESTIONS)
     """
     topic: str
     context_filter: Optional[str] = None 
     notebook_id: Optional[str] = None
     difficulty: str = "medium"
-    num_questions: int = 5
+    num_questions: int = Field(5, ge=1, le=config.QUIZ_MAX_QUESTIONS)
 
     class Config:
         extra = "allow"
 
+    def scoped_notebook_id(self) -> Optional[str]:
+        """Return the notebook id, accepting the frontend's camelCase "notebookId" too."""
+        return self.notebook_id or getattr(self, "notebookId", None)
+
+
+class QuizOption(BaseModel):
+    """One answer option of a quiz question.
+
+    Attributes:
+        id: Option identifier ("a"-"d", or "true"/"false")
+        text: Option text shown to the student
+    """
+    id: str
+    text: str
+
+
+class QuizQuestion(BaseModel):
+    """A generated quiz question, validated before it is served.
+
+    Attributes:
+        questionText: The question
+        type: "mcq" for multiple choice or "tf" for true/false
+        options: Answer options
+        correctOptionId: Id of the correct option
+        explanation: Why the correct option is right
+    """
+    questionText: str
+    type: Literal["mcq", "tf"]
+    options: List[QuizOption]
+    correctOptionId: str
+    explanation: str = ""
+
+    def check(self):
+        """Check what the field types can't express.
+
+        Raises:
+            ValueError: If the question is empty, has too few options, or the
+                correct option isn't one of them
+        """
+        if not self.questionText.strip():
+            raise ValueError("questionText is empty")
+        ids = [option.id for option in self.options]
+        if self.type == "tf" and sorted(ids) != ["false", "true"]:
+            raise ValueError("true/false questions need options 'true' and 'false'")
+        if self.type == "mcq" and len(set(ids)) < 2:
+            raise ValueError("multiple choice questions need at least two options")
+        if self.correctOptionId not in ids:
+            raise ValueError(f"correctOptionId '{self.correctOptionId}' is not an option id")
+
 
 class AskRequest(BaseModel):
     """Request model for RAG-based question answering.
@@ -40,3 +91,14 @@ class UrlRequest(BaseModel):
     url: str
     notebook_id: Optional[str] = None
     name: Optional[str] = None
+
+
+class UrlBatchRequest(BaseModel):
+    """Request model for ingesting several URLs at once.
+
+    Attributes:
+        urls: Website URLs, YouTube URLs or video IDs, and 'wikipedia:' queries
+        notebook_id: Optional notebook identifier for organization
+    """
+    urls: List[str]
+    notebook_id: Optional[str] = None
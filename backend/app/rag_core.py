@@ -1,65 +1,599 @@
-
 import os
+import abc
 import json
 import re
-from groq import Groq
-from typing import List, Dict, Any, Optional
+import time
+import random
+import asyncio
+import zlib
+import contextlib
+import httpx
+from groq import AsyncGroq, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from typing import List, Dict, Any, Optional, AsyncIterator, Set, Tuple
+
+from pydantic import ValidationError
+
+from app.core import config
+from app.core.metrics import observe, count_llm_tokens
+from app.models.schemas import QuizQuestion
+from app.services.answer_cache import normalize_question
+from app.services.context_builder import count_tokens
+
+# Transient failures worth retrying; other API errors (bad request, auth) are not.
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+# Tokens reserved per quiz question when the completion length isn't capped.
+QUIZ_TOKENS_PER_QUESTION = 250
+# Rough size of a token, for settling a stream that didn't report its usage.
+CHARS_PER_TOKEN = 4
+# How often a background caller re-checks a bucket that interactive callers are using.
+BACKGROUND_POLL_SECONDS = 0.1
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of a text from its length, for when tokenizing would cost more than it tells."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the LLM keeps failing with rate limits, timeouts or server errors.
+
+    Attributes:
+        retry_after: Suggested seconds before the client retries
+    """
+
+    def __init__(self, message: str, retry_after: float = 5.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at ``per_minute`` tokens per minute.
+
+    Used for both of Groq's quotas: requests per minute (one token per call)
+    and tokens per minute (prompt plus completion). A reservation that turns
+    out too large or too small is settled afterwards, so the bucket can go
+    briefly negative when a completion runs long.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self._background_lock: Optional[asyncio.Lock] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float):
+        """Wait until ``amount`` tokens are available and take them; callers are served in order."""
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._refill()
+            while self._tokens < amount:
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= amount
+
+    async def acquire_background(self, amount: float, share: float):
+        """Take ``amount`` tokens at low priority, within ``share`` of the bucket.
+
+        Background callers are served in order among themselves, but wait
+        while an interactive ``acquire`` is waiting and only take tokens that
+        leave ``1 - share`` of the capacity in the bucket, so interactive
+        calls keep a burst's worth of quota however much background work is
+        queued.
+        """
+        if self.rate <= 0:
+            return
+        floor = self.capacity * (1 - min(max(share, 0.01), 1.0))
+        amount = min(amount, self.capacity - floor)
+        if self._background_lock is None:
+            self._background_lock = asyncio.Lock()
+        async with self._background_lock:
+            while True:
+                self._refill()
+                interactive_waiting = self._lock is not None and self._lock.locked()
+                if not interactive_waiting and self._tokens - amount >= floor:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep(max((floor + amount - self._tokens) / self.rate, BACKGROUND_POLL_SECONDS))
+
+    def try_acquire(self, amount: float) -> bool:
+        """Take ``amount`` tokens only if they are available right now."""
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self._tokens < amount or (self._lock is not None and self._lock.locked()):
+            return False
+        self._tokens -= amount
+        return True
+
+    def settle(self, reserved: float, used: float):
+        """Return (or charge) the difference between a reservation and actual usage."""
+        if self.rate <= 0:
+            return
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + reserved - used)
+
+
+class LLMGateway:
+    """Async access to Groq chat completions under shared limits.
+
+    - One pooled ``httpx.AsyncClient`` keeps connections to Groq alive.
+    - A global semaphore caps in-flight calls, and a per-notebook semaphore
+      stops one notebook from taking every slot.
+    - Request and token buckets keep calls within the Groq quota instead of
+      running into 429s.
+    - Rate limits, timeouts and 5xx responses are retried with full-jitter
+      exponential backoff, honouring Retry-After; when retries run out,
+      LLMUnavailableError is raised.
+    - A non-streaming call that is slower than ``hedge_after`` seconds gets a
+      duplicate request if the quota has room; the first response wins.
+    - Background calls (question bank builds) take quota at low priority,
+      within ``background_share`` of each bucket, and are never hedged.
+
+    Attributes:
+        client: AsyncGroq client sharing the pooled HTTP client
+    """
+
+    def __init__(self, api_key: str):
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=config.GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=config.GROQ_MAX_CONNECTIONS,
+            ),
+            timeout=config.LLM_TIMEOUT_SECONDS,
+        )
+        # Retries are handled here so they share the backoff and rate limits.
+        self.client = AsyncGroq(api_key=api_key, http_client=self.http_client, max_retries=0)
+        self.max_concurrency = config.LLM_MAX_CONCURRENCY
+        self.max_per_notebook = config.LLM_MAX_CONCURRENCY_PER_NOTEBOOK
+        self.max_retries = config.LLM_MAX_RETRIES
+        self.hedge_after = config.LLM_HEDGE_AFTER_SECONDS
+        self.background_share = config.QUESTION_BANK_LLM_SHARE
+        self.requests = TokenBucket(config.GROQ_REQUESTS_PER_MINUTE)
+        self.tokens = TokenBucket(config.GROQ_TOKENS_PER_MINUTE)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # notebook -> [semaphore, number of callers holding or waiting on it]
+        self._notebook_slots: Dict[str, List[Any]] = {}
+
+    @contextlib.asynccontextmanager
+    async def _slot(self, notebook_id: Optional[str]):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        key = notebook_id or "general"
+        slot = self._notebook_slots.setdefault(key, [asyncio.Semaphore(self.max_per_notebook), 0])
+        slot[1] += 1
+        try:
+            async with slot[0], self._semaphore:
+                yield
+        finally:
+            slot[1] -= 1
+            if slot[1] == 0:
+                del self._notebook_slots[key]
+
+    @staticmethod
+    def _prompt_tokens(messages: List[Dict[str, str]]) -> int:
+        return sum(count_tokens(m["content"]) for m in messages)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(config.LLM_BACKOFF_MAX_SECONDS, config.LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:
+            return delay
+
+    async def _reserve(self, tokens: int, background: bool = False):
+        if background:
+            await self.requests.acquire_background(1, self.background_share)
+            await self.tokens.acquire_background(tokens, self.background_share)
+            return
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+    def _settle(self, reserved: int, response):
+        usage = getattr(response, "usage", None)
+        if usage is not None and usage.total_tokens:
+            self.tokens.settle(reserved, usage.total_tokens)
+
+    def _settle_failed(self, reserved: int, prompt_tokens: int, error: BaseException):
+        """Settle the reservation of an attempt that produced no response.
+
+        Nothing was generated. The prompt is only charged when the request
+        may have reached the model (a timeout, a server error, or the call
+        being cancelled); rate-limited, rejected and unsent requests cost nothing.
+        """
+        reached_model = isinstance(error, (APITimeoutError, InternalServerError, asyncio.CancelledError))
+        self.tokens.settle(reserved, prompt_tokens if reached_model else 0)
+
+    async def _hedged(self, params: Dict[str, Any], tokens: int, hedge: bool = True):
+        first = asyncio.create_task(self.client.chat.completions.create(**params))
+        if not hedge or self.hedge_after <= 0:
+            return await first
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        except asyncio.CancelledError:
+            # asyncio.wait leaves its tasks running; the request must not outlive its caller.
+            first.cancel()
+            raise
+        if done:
+            return first.result()
+        # Only hedge when it doesn't push us into the quota.
+        if not self.requests.try_acquire(1):
+            return await first
+        if not self.tokens.try_acquire(tokens):
+            self.requests.settle(1, 0)
+            return await first
+
+        pending = {first, asyncio.create_task(self.client.chat.completions.create(**params))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            # The caller settles one reservation against the winner's usage;
+            # the hedge's own reservation is returned.
+            self.tokens.settle(tokens, 0)
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        notebook_id: Optional[str] = None,
+        max_tokens: int = 1024,
+        background: bool = False,
+        **params,
+    ):
+        """Run a chat completion within the gateway's limits.
+
+        Args:
+            messages: Chat messages
+            notebook_id: Notebook the call is made for, used for fair sharing
+            max_tokens: Completion length cap, also used to reserve token quota
+            background: Low-priority call that yields quota to interactive ones
+            **params: Other chat completion parameters (model, temperature, ...)
+
+        Returns:
+            The chat completion response
+
+        Raises:
+            LLMUnavailableError: If retryable errors persist after all retries
+        """
+        params = dict(params, messages=messages, max_tokens=max_tokens)
+        prompt_tokens = self._prompt_tokens(messages)
+        tokens = prompt_tokens + max_tokens
+        async with self._slot(notebook_id):
+            for attempt in range(self.max_retries + 1):
+                await self._reserve(tokens, background)
+                try:
+                    response = await self._hedged(params, tokens, hedge=not background)
+                except BaseException as e:
+                    self._settle_failed(tokens, prompt_tokens, e)
+                    if not isinstance(e, RETRYABLE_ERRORS):
+                        raise
+                    delay = self._backoff(attempt, e)
+                    if attempt == self.max_retries:
+                        raise LLMUnavailableError(f"LLM service unavailable: {e}", retry_after=delay) from e
+                    print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                self._settle(tokens, response)
+                return response
+
+    async def stream(self, messages: List[Dict[str, str]], notebook_id: Optional[str] = None, max_tokens: int = 1024, **params) -> AsyncIterator[str]:
+        """Stream a chat completion's text within the gateway's limits.
+
+        Opening the stream is retried like ``complete``; once tokens have been
+        forwarded a failure is raised as is. Streams are never hedged. When
+        the stream ends (or is abandoned), the token reservation is settled
+        against the usage Groq reports, or an estimate from the text length.
+
+        Yields:
+            Text fragments as they arrive
+
+        Raises:
+            LLMUnavailableError: If the stream can't be opened after all retries
+        """
+        params = dict(params, messages=messages, max_tokens=max_tokens, stream=True)
+        prompt_tokens = self._prompt_tokens(messages)
+        tokens = prompt_tokens + max_tokens
+        async with self._slot(notebook_id):
+            for attempt in range(self.max_retries + 1):
+                await self._reserve(tokens)
+                try:
+                    stream = await self.client.chat.completions.create(**params)
+                    break
+                except BaseException as e:
+                    self._settle_failed(tokens, prompt_tokens, e)
+                    if not isinstance(e, RETRYABLE_ERRORS):
+                        raise
+                    delay = self._backoff(attempt, e)
+                    if attempt == self.max_retries:
+                        raise LLMUnavailableError(f"LLM service unavailable: {e}", retry_after=delay) from e
+                    print(f"LLM stream failed to open ({type(e).__name__}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+            usage = None
+            characters = 0
+            try:
+                async for chunk in stream:
+                    # Groq reports usage on the last chunk, under x_groq.
+                    usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        characters += len(delta)
+                        yield delta
+            finally:
+                if usage is not None and usage.total_tokens:
+                    used = usage.total_tokens
+                else:
+                    used = prompt_tokens + -(-characters // CHARS_PER_TOKEN)
+                self.tokens.settle(tokens, used)
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+
+class LLMBackend(abc.ABC):
+    """Interface RagEngine uses to talk to a language model.
+
+    Implementations return plain text so prompt building and response
+    parsing stay in RagEngine whichever model is behind it.
+
+    Attributes:
+        name: Short backend name reported by the health check
+    """
+
+    name = "llm"
+
+    @abc.abstractmethod
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        notebook_id: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.3,
+        json_mode: bool = False,
+        background: bool = False,
+    ) -> str:
+        """Return the completion text for a chat conversation.
+
+        Args:
+            messages: Chat messages
+            notebook_id: Notebook the call is made for
+            max_tokens: Completion length cap
+            temperature: Sampling temperature
+            json_mode: Ask for a JSON object as the whole response
+            background: Low-priority work that should yield to interactive calls
+        """
+
+    @abc.abstractmethod
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        notebook_id: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.3,
+    ) -> AsyncIterator[str]:
+        """Yield the completion text in fragments as it is generated."""
+
+    async def aclose(self):
+        """Release connections held by the backend."""
+
+
+class GroqBackend(LLMBackend):
+    """Groq-hosted model called through an LLMGateway."""
+
+    name = "groq"
+
+    def __init__(self, api_key: str, model: str = config.GROQ_MODEL):
+        self.model = model
+        self.gateway = LLMGateway(api_key)
+
+    async def complete(self, messages, notebook_id=None, max_tokens=1024, temperature=0.3, json_mode=False, background=False) -> str:
+        params = {"response_format": {"type": "json_object"}} if json_mode else {}
+        chat_completion = await self.gateway.complete(
+            messages,
+            notebook_id=notebook_id,
+            max_tokens=max_tokens,
+            background=background,
+            model=self.model,
+            temperature=temperature,
+            **params,
+        )
+        return chat_completion.choices[0].message.content
+
+    async def stream(self, messages, notebook_id=None, max_tokens=1024, temperature=0.3) -> AsyncIterator[str]:
+        async for delta in self.gateway.stream(
+            messages,
+            notebook_id=notebook_id,
+            max_tokens=max_tokens,
+            model=self.model,
+            temperature=temperature,
+        ):
+            yield delta
+
+    async def aclose(self):
+        await self.gateway.aclose()
+
+
+class StubBackend(LLMBackend):
+    """Deterministic local stand-in for load tests and offline benchmarks.
+
+    Makes no network calls. Each response waits ``latency_ms`` before its
+    first token and then produces ``tokens_per_second`` whitespace tokens
+    per second, so the rest of the RAG path can be measured under a known
+    LLM cost. Answers echo the question and the start of the context; JSON
+    requests get a canned quiz with as many questions as the prompt asks for.
+    """
+
+    name = "stub"
+    QUESTION_COUNT_RE = re.compile(r"(\d+) questions")
+
+    def __init__(self, latency_ms: float = config.LLM_STUB_LATENCY_MS, tokens_per_second: float = config.LLM_STUB_TOKENS_PER_SECOND):
+        self.latency = latency_ms / 1000.0
+        self.tokens_per_second = tokens_per_second
+
+    def _answer_text(self, messages: List[Dict[str, str]], max_tokens: int) -> str:
+        prompt = messages[-1]["content"]
+        question = prompt.rsplit("Question:", 1)[-1].replace("Answer:", "").strip()
+        context = prompt.split("Context:", 1)[-1].split("Question:", 1)[0].strip()
+        words = (
+            f"**Stub answer** to: {question}\n\n> Based on the context: {' '.join(context.split()[:40])}"
+            "\n\nWhat would you like to review next?"
+        ).split(" ")
+        return " ".join(words[:max_tokens])
+
+    def _quiz_json(self, messages: List[Dict[str, str]]) -> str:
+        prompt = messages[-1]["content"]
+        match = self.QUESTION_COUNT_RE.search(prompt)
+        count = int(match.group(1)) if match else 5
+        # Same prompt, same quiz; different context slices give different questions.
+        digest = f"{zlib.crc32(prompt.encode('utf-8')):08x}"
+        questions = []
+        for i in range(count):
+            if i % 2:
+                questions.append({
+                    "questionText": f"Stub statement {i + 1} ({digest}) is true.",
+                    "type": "tf",
+                    "options": [{"id": "true", "text": "True"}, {"id": "false", "text": "False"}],
+                    "correctOptionId": "true",
+                    "explanation": "Canned stub question.",
+                })
+            else:
+                questions.append({
+                    "questionText": f"Stub question {i + 1} ({digest})?",
+                    "type": "mcq",
+                    "options": [{"id": key, "text": f"Option {key.upper()}"} for key in "abcd"],
+                    "correctOptionId": "b",
+                    "explanation": "Canned stub question.",
+                })
+        return json.dumps({"questions": questions})
+
+    def _generation_time(self, text: str) -> float:
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return len(text.split()) / self.tokens_per_second
+
+    async def complete(self, messages, notebook_id=None, max_tokens=1024, temperature=0.3, json_mode=False, background=False) -> str:
+        text = self._quiz_json(messages) if json_mode else self._answer_text(messages, max_tokens)
+        await asyncio.sleep(self.latency + self._generation_time(text))
+        return text
+
+    async def stream(self, messages, notebook_id=None, max_tokens=1024, temperature=0.3) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency)
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        for i, word in enumerate(self._answer_text(messages, max_tokens).split(" ")):
+            await asyncio.sleep(delay)
+            yield word if i == 0 else f" {word}"
+
+
+def create_backend(name: str, api_key: Optional[str] = None) -> Optional[LLMBackend]:
+    """Build the LLM backend selected by LLM_BACKEND.
+
+    Returns:
+        The backend, or None for Groq when no API key is configured
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    if name == "stub":
+        return StubBackend()
+    if name == "groq":
+        return GroqBackend(api_key) if api_key else None
+    raise ValueError(f"Unknown LLM backend '{name}'. Expected 'groq' or 'stub'.")
 
 
 class RagEngine:
-    """Retrieval-Augmented Generation engine using Groq LLM.
+    """Retrieval-Augmented Generation engine.
     
-    Provides AI-powered question answering and quiz generation capabilities
-    using the Groq API with Llama 3.3 70B model.
+    Provides AI-powered question answering and quiz generation capabilities.
+    By default the model is Groq's Llama 3.3 70B; LLM_BACKEND=stub swaps in
+    a local stand-in with no network calls.
     
     Attributes:
         api_key: Groq API key for authentication
-        client: Groq client instance
-        model: LLM model identifier (default: llama-3.3-70b-versatile)
+        backend: LLMBackend that runs the prompts, None if Groq has no API key
+        answer_cache: Optional AnswerCache consulted by generate_answer_cached
     """
     
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the RAG engine with Groq API.
+    def __init__(self, api_key: Optional[str] = None, answer_cache=None, backend: Optional[LLMBackend] = None):
+        """Initialize the RAG engine.
         
         Args:
             api_key: Optional Groq API key. If not provided, reads from GROQ_API_KEY environment variable
+            answer_cache: Optional AnswerCache placed in front of generate_answer
+            backend: Optional backend to use instead of the one selected by LLM_BACKEND
         """
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
-        if not self.api_key:
-            print("Warning: GROQ_API_KEY not found in environment variables.")
-        
-        if self.api_key:
-            self.client = Groq(api_key=self.api_key)
-        else:
-            self.client = None
-            
-        self.model = "llama-3.3-70b-versatile"
+        if backend is None:
+            if config.LLM_BACKEND == "groq" and not self.api_key:
+                print("Warning: GROQ_API_KEY not found in environment variables.")
+            backend = create_backend(config.LLM_BACKEND, self.api_key)
+        self.backend = backend
+
+        self.answer_cache = answer_cache
 
     def set_api_key(self, api_key: str):
-        """Update the Groq API key and reinitialize the client.
+        """Update the Groq API key and switch to a Groq backend using it.
         
         Args:
             api_key: New Groq API key
         """
         self.api_key = api_key
-        self.client = Groq(api_key=api_key)
+        self.backend = GroqBackend(api_key)
 
-    def generate_answer(self, question: str, context: str) -> str:
-        """Generate an AI-powered answer to a question using provided context.
-        
-        Uses RAG approach to answer questions based on the provided context.
-        Falls back to general knowledge if context is insufficient.
-        
-        Args:
-            question: The question to answer
-            context: Retrieved context from documents to base the answer on
-            
-        Returns:
-            AI-generated answer with educational formatting and follow-up question
+    async def _complete(self, purpose: str, messages: List[Dict[str, str]], **params) -> str:
+        """Run a completion on the backend, recording its latency and estimated token counts.
+
+        Counts are estimated from text length; the gateway settles the quota
+        against the usage Groq reports, so these only feed the metrics.
         """
-        if not self.client:
-            return "Error: Groq API Key is missing. Please configure it in the backend."
+        started = time.perf_counter()
+        content = await self.backend.complete(messages, **params)
+        seconds = time.perf_counter() - started
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        completion_tokens = estimate_tokens(content)
+        observe(f"llm_{purpose}", seconds, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        count_llm_tokens(purpose, prompt_tokens, completion_tokens)
+        return content
 
+    async def _stream(self, purpose: str, messages: List[Dict[str, str]], **params) -> AsyncIterator[str]:
+        """Stream a completion from the backend, recording time to first token, latency and estimated token counts."""
+        started = time.perf_counter()
+        characters = 0
+        first = True
+        try:
+            async for delta in self.backend.stream(messages, **params):
+                if first:
+                    observe(f"llm_{purpose}_first_token", time.perf_counter() - started)
+                    first = False
+                characters += len(delta)
+                yield delta
+        finally:
+            # Also runs when the client disconnects mid-stream.
+            prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+            completion_tokens = -(-characters // CHARS_PER_TOKEN)
+            observe(f"llm_{purpose}", time.perf_counter() - started, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            count_llm_tokens(purpose, prompt_tokens, completion_tokens)
+
+    def _answer_messages(self, question: str, context: str) -> List[Dict[str, str]]:
+        """Build the chat messages for a context-grounded answer."""
         system_prompt = """You are 'Smart Study Hub AI', an advanced and encouraging academic tutor.
 Your goal is to help students understand their study materials deeply and prepare for exams.
 
@@ -81,50 +615,99 @@ Question:
 
 Answer:"""
 
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ]
+
+    async def generate_answer(self, question: str, context: str, notebook_id: Optional[str] = None) -> str:
+        """Generate an AI-powered answer to a question using provided context.
+        
+        Uses RAG approach to answer questions based on the provided context.
+        Falls back to general knowledge if context is insufficient.
+        
+        Args:
+            question: The question to answer
+            context: Retrieved context from documents to base the answer on
+            notebook_id: Notebook the question is asked in, for fair sharing of LLM capacity
+            
+        Returns:
+            AI-generated answer with educational formatting and follow-up question
+
+        Raises:
+            LLMUnavailableError: If Groq stays rate limited or unreachable after retries
+        """
+        if not self.backend:
+            return "Error: Groq API Key is missing. Please configure it in the backend."
+
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                model=self.model,
-                temperature=0.3,
+            return await self._complete(
+                "answer",
+                self._answer_messages(question, context),
+                notebook_id=notebook_id,
                 max_tokens=1024,
+                temperature=0.3,
             )
-            return chat_completion.choices[0].message.content
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             return f"Error generating answer: {str(e)}"
 
-    def generate_quiz(self, topic: str, context: str, difficulty: str = "medium", num_questions: int = 5) -> Dict[str, Any]:
-        """Generate a quiz with multiple choice and true/false questions.
-        
-        Creates quiz questions based on the provided context and topic.
-        Handles JSON parsing and normalization of the AI response.
-        
+    async def generate_answer_cached(self, question: str, context: str, scope, chunk_ids: List[str], question_embedding=None) -> Tuple[str, bool]:
+        """Answer a question, reusing a cached answer when one applies.
+
         Args:
-            topic: The topic or subject for the quiz
-            context: Document context to base questions on
-            difficulty: Quiz difficulty level (easy, medium, hard)
-            num_questions: Number of questions to generate
-            
+            question: The question to answer
+            context: Retrieved context from documents to base the answer on
+            scope: (notebook_id, filename) filters used for retrieval
+            chunk_ids: Ids of the retrieved chunks the context was built from
+            question_embedding: Optional question embedding for near-duplicate matching
+
         Returns:
-            Dictionary containing quiz questions with structure:
-            {
-                "questions": [
-                    {
-                        "questionText": str,
-                        "type": "mcq" | "tf",
-                        "options": [{"id": str, "text": str}, ...],
-                        "correctOptionId": str,
-                        "explanation": str
-                    }
-                ]
-            }
-            Returns error dict if generation fails
+            Tuple of (answer, whether it came from the cache)
         """
-        if not self.client:
-            return {"error": "Groq API Key missing"}
+        if self.answer_cache is not None:
+            cached = self.answer_cache.get(scope, chunk_ids, question, question_embedding)
+            if cached is not None:
+                return cached, True
+
+        answer = await self.generate_answer(question, context, notebook_id=scope[0])
+        if self.answer_cache is not None and not answer.startswith("Error"):
+            self.answer_cache.put(scope, chunk_ids, question, answer, question_embedding)
+        return answer, False
 
+    async def stream_answer(self, question: str, context: str, notebook_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream an AI-powered answer token by token.
+
+        Same prompt as generate_answer, but with streaming enabled so tokens
+        can be forwarded as they are generated.
+
+        Args:
+            question: The question to answer
+            context: Retrieved context from documents to base the answer on
+            notebook_id: Notebook the question is asked in, for fair sharing of LLM capacity
+
+        Yields:
+            Text fragments of the answer as they arrive
+
+        Raises:
+            RuntimeError: If the Groq API key is missing
+            LLMUnavailableError: If the stream can't be opened after retries
+        """
+        if not self.backend:
+            raise RuntimeError("Groq API Key is missing. Please configure it in the backend.")
+
+        async for delta in self._stream(
+            "answer",
+            self._answer_messages(question, context),
+            notebook_id=notebook_id,
+            max_tokens=1024,
+            temperature=0.3,
+        ):
+            yield delta
+
+    def _quiz_messages(self, topic: str, context: str, difficulty: str, num_questions: int) -> List[Dict[str, str]]:
+        """Build the chat messages for one batch of quiz questions."""
         schema_instruction = """
         Return ONLY a raw JSON object (no markdown, no backticks) with the following structure:
         {
@@ -150,57 +733,246 @@ Answer:"""
         Use the provided context to ensure accurate questions.
         
         Context derived from documents:
-        {context[:6000]}
+        {context}
 
         {schema_instruction}
         """
 
+        return [
+            {"role": "system", "content": "You are a quiz generator API. You strictly output JSON."},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _parse_quiz_items(content: str) -> List[Any]:
+        """Pull the list of question objects out of a quiz completion.
+
+        JSON mode normally returns {"questions": [...]}; the fallbacks cover
+        fenced output, bare lists and other wrapper keys.
+
+        Raises:
+            json.JSONDecodeError: If no JSON can be found in the content
+        """
+        content = content.replace("```json", "").replace("```", "").strip()
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "You are a quiz generator API. You strictly output JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                model=self.model,
-                temperature=0.5,
-            )
-            
-            content = chat_completion.choices[0].message.content
-            print(f"DEBUG: Quiz Gen Raw Output: {content[:200]}...")
-            
-            content = content.replace("```json", "").replace("```", "").strip()
-            
+            parsed = json.loads(content)
+        except json.JSONDecodeError:
             json_match = re.search(r'(\{.*\}|\[.*\])', content, re.DOTALL)
-            if json_match:
-                possible_json = json_match.group(1)
-                try:
-                    parsed = json.loads(possible_json)
-                except:
-                    try:
-                        parsed = json.loads(content)
-                    except:
-                        raise json.JSONDecodeError("Failed to parse matched JSON", possible_json, 0)
-            else:
-                parsed = json.loads(content)
-            
-            if isinstance(parsed, list):
-                 parsed = {"questions": parsed}
-                 
-            if "questions" not in parsed:
-                if "quiz" in parsed and "questions" in parsed["quiz"]:
-                    parsed = parsed["quiz"]
-                else:
-                    for val in parsed.values():
-                        if isinstance(val, list) and len(val) > 0 and isinstance(val[0], dict) and "questionText" in val[0]:
-                            parsed = {"questions": val}
-                            break
-            
-            if "questions" not in parsed or not isinstance(parsed["questions"], list):
-                 return {"error": "Invalid JSON structure: 'questions' array missing or invalid", "raw": content}
+            if not json_match:
+                raise
+            parsed = json.loads(json_match.group(1))
 
+        if isinstance(parsed, list):
             return parsed
+        if isinstance(parsed.get("questions"), list):
+            return parsed["questions"]
+        if isinstance(parsed.get("quiz"), dict) and isinstance(parsed["quiz"].get("questions"), list):
+            return parsed["quiz"]["questions"]
+        for val in parsed.values():
+            if isinstance(val, list) and val and isinstance(val[0], dict) and "questionText" in val[0]:
+                return val
+        return []
+
+    @staticmethod
+    def _validate_question(item: Any) -> Dict[str, Any]:
+        """Validate one generated question, fixing harmless case differences in option ids.
+
+        Raises:
+            ValueError: If the question doesn't match the QuizQuestion schema
+        """
+        if not isinstance(item, dict):
+            raise ValueError("question is not an object")
+        item = dict(item)
+        if isinstance(item.get("type"), str):
+            item["type"] = item["type"].strip().lower()
+        options = item.get("options")
+        if isinstance(options, list) and isinstance(item.get("correctOptionId"), str):
+            ids = {str(option.get("id")).lower(): option.get("id") for option in options if isinstance(option, dict)}
+            correct = item["correctOptionId"].strip().lower()
+            if item["type"] == "tf":
+                item["options"] = [dict(option, id=str(option.get("id")).lower()) for option in options if isinstance(option, dict)]
+                item["correctOptionId"] = correct
+            elif correct in ids:
+                item["correctOptionId"] = ids[correct]
+        try:
+            question = QuizQuestion(**item)
+        except ValidationError as e:
+            raise ValueError(str(e)) from e
+        question.check()
+        return question.dict()
+
+    async def _quiz_batch(
+        self, topic: str, context: str, difficulty: str, num_questions: int, notebook_id: Optional[str], background: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Generate one batch, returning only the questions that validate."""
+        content = await self._complete(
+            "quiz",
+            self._quiz_messages(topic, context, difficulty, num_questions),
+            notebook_id=notebook_id,
+            max_tokens=QUIZ_TOKENS_PER_QUESTION * num_questions + 200,
+            temperature=0.5,
+            json_mode=True,
+            background=background,
+        )
+        try:
+            items = self._parse_quiz_items(content)
         except json.JSONDecodeError:
-            print(f"JSON Parse Error. Raw content: {content}")
-            return {"error": "Failed to parse AI response as JSON", "raw_response": content}
-        except Exception as e:
-            return {"error": str(e)}
+            print(f"Quiz batch returned unparseable JSON: {content[:200]}...")
+            return []
+
+        questions = []
+        for item in items[:num_questions]:
+            try:
+                questions.append(self._validate_question(item))
+            except ValueError as e:
+                print(f"Dropped invalid quiz question: {e}")
+        return questions
+
+    async def iter_quiz_questions(
+        self,
+        topic: str,
+        contexts: List[str],
+        difficulty: str = "medium",
+        num_questions: int = 5,
+        notebook_id: Optional[str] = None,
+        background: bool = False,
+        exclude: Optional[Set[str]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Generate quiz questions in parallel batches, yielding each as soon as it is ready.
+
+        The questions are split into batches of QUIZ_BATCH_SIZE, and batch i
+        is generated from ``contexts[i % len(contexts)]`` so batches cover
+        different material. Every question is validated on its own; a batch
+        that comes back short (invalid JSON, invalid questions, duplicates,
+        excluded questions or an error) is retried for just the missing
+        questions, up to QUIZ_BATCH_RETRIES times.
+
+        Args:
+            topic: The topic or subject for the quiz
+            contexts: Context slices to spread the batches over
+            difficulty: Quiz difficulty level (easy, medium, hard)
+            num_questions: Number of questions to generate
+            notebook_id: Notebook the quiz is for, for fair sharing of LLM capacity
+            background: Generate at low priority, yielding LLM quota to interactive calls
+            exclude: Normalized texts (see normalize_question) of questions not to
+                yield, e.g. ones already served; they are replaced like duplicates
+
+        Yields:
+            Validated questions (see generate_quiz for their structure); fewer
+            than num_questions if some batches fail every retry
+
+        Raises:
+            RuntimeError: If the Groq API key is missing
+            LLMUnavailableError: If the LLM was unavailable and no question could be generated
+        """
+        if not self.backend:
+            raise RuntimeError("Groq API Key missing")
+        contexts = contexts or [""]
+        batch_size = max(1, config.QUIZ_BATCH_SIZE)
+        sizes = [min(batch_size, num_questions - start) for start in range(0, num_questions, batch_size)]
+
+        seen = set(exclude or ())
+        ready: asyncio.Queue = asyncio.Queue()
+        errors: List[Exception] = []
+
+        async def run_batch(index: int, size: int):
+            context = contexts[index % len(contexts)]
+            missing = size
+            for attempt in range(config.QUIZ_BATCH_RETRIES + 1):
+                try:
+                    questions = await self._quiz_batch(topic, context, difficulty, missing, notebook_id, background)
+                except LLMUnavailableError as e:
+                    # The gateway has already retried this one.
+                    errors.append(e)
+                    return
+                except Exception as e:
+                    print(f"Quiz batch {index} failed (attempt {attempt + 1}): {e}")
+                    errors.append(e)
+                    continue
+                for question in questions:
+                    key = normalize_question(question["questionText"])
+                    if key in seen or missing == 0:
+                        continue
+                    seen.add(key)
+                    missing -= 1
+                    ready.put_nowait(question)
+                if missing == 0:
+                    break
+
+        tasks = [asyncio.create_task(run_batch(i, size)) for i, size in enumerate(sizes)]
+        done = asyncio.gather(*tasks)
+        produced = 0
+        getter = None
+        try:
+            while True:
+                getter = asyncio.ensure_future(ready.get())
+                await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                produced += 1
+                yield getter.result()
+            while not ready.empty():
+                produced += 1
+                yield ready.get_nowait()
+        finally:
+            # Also reached when the caller is cancelled mid-wait or closes the generator early.
+            if getter is not None:
+                getter.cancel()
+            done.cancel()
+
+        if not produced:
+            unavailable = [e for e in errors if isinstance(e, LLMUnavailableError)]
+            if unavailable:
+                raise unavailable[-1]
+
+    async def generate_quiz(
+        self,
+        topic: str,
+        contexts: List[str],
+        difficulty: str = "medium",
+        num_questions: int = 5,
+        notebook_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Generate a quiz with multiple choice and true/false questions.
+        
+        Collects the questions from iter_quiz_questions, which fans the
+        quiz out over parallel batches and validates every question.
+        
+        Args:
+            topic: The topic or subject for the quiz
+            contexts: Context slices to spread the batches over, each already packed to its prompt budget
+            difficulty: Quiz difficulty level (easy, medium, hard)
+            num_questions: Number of questions to generate
+            notebook_id: Notebook the quiz is for, for fair sharing of LLM capacity
+            
+        Returns:
+            Dictionary containing quiz questions with structure:
+            {
+                "questions": [
+                    {
+                        "questionText": str,
+                        "type": "mcq" | "tf",
+                        "options": [{"id": str, "text": str}, ...],
+                        "correctOptionId": str,
+                        "explanation": str
+                    }
+                ]
+            }
+            Returns error dict if no question could be generated
+
+        Raises:
+            LLMUnavailableError: If Groq stays rate limited or unreachable after retries
+        """
+        if not self.backend:
+            return {"error": "Groq API Key missing"}
+
+        questions = [q async for q in self.iter_quiz_questions(topic, contexts, difficulty, num_questions, notebook_id)]
+        if not questions:
+            return {"error": "Failed to generate any valid quiz questions"}
+        return {"questions": questions}
+
+    async def aclose(self):
+        """Close the backend's pooled HTTP connections."""
+        if self.backend:
+            await self.backend.aclose()
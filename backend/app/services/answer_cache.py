@@ -0,0 +1,204 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# (notebook filter, filename filter)
+Scope = Tuple[Optional[str], Optional[str]]
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase a question, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+
+class AnswerCache:
+    """LRU + TTL cache of generated answers.
+
+    Entries are keyed on the retrieval scope (notebook and filename
+    filters), the set of retrieved chunk ids and the normalized question.
+    When a question embedding is supplied, a lookup that misses the exact
+    key also matches an entry with the same scope and chunk set whose
+    question embedding has cosine similarity at or above the threshold.
+
+    Attributes:
+        max_entries: Maximum number of cached answers before LRU eviction
+        ttl_seconds: Lifetime of a cached answer
+        similarity_threshold: Minimum cosine similarity for a near-duplicate hit (<= 0 disables)
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 3600, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        # (scope, chunk set) -> keys of entries sharing it, for near-duplicate lookups
+        self._buckets: Dict[tuple, Set[tuple]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(scope: Scope, chunk_ids: Iterable[str]) -> tuple:
+        return (scope, tuple(sorted(chunk_ids)))
+
+    def _remove(self, key: tuple):
+        self._entries.pop(key, None)
+        bucket = key[:2]
+        keys = self._buckets.get(bucket)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._buckets[bucket]
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["created_at"] > self.ttl_seconds
+
+    def get(self, scope: Scope, chunk_ids: Iterable[str], question: str, embedding: Optional[Any] = None) -> Optional[str]:
+        """Return a cached answer for the question, or None on a miss.
+
+        Args:
+            scope: (notebook_id, filename) filters the retrieval ran with
+            chunk_ids: Ids of the retrieved chunks the answer is grounded on
+            question: The user's question
+            embedding: Optional question embedding for near-duplicate matching
+        """
+        bucket = self._bucket(scope, chunk_ids)
+        key = bucket + (normalize_question(question),)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["answer"]
+
+            if embedding is not None and self.similarity_threshold > 0:
+                query = self._unit(embedding)
+                best_key, best_score = None, self.similarity_threshold
+                for candidate in list(self._buckets.get(bucket, ())):
+                    cached = self._entries[candidate]
+                    if self._expired(cached):
+                        self._remove(candidate)
+                        continue
+                    if cached["embedding"] is None:
+                        continue
+                    score = float(np.dot(query, cached["embedding"]))
+                    if score >= best_score:
+                        best_key, best_score = candidate, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.near_hits += 1
+                    return self._entries[best_key]["answer"]
+
+            self.misses += 1
+            return None
+
+    def put(self, scope: Scope, chunk_ids: Iterable[str], question: str, answer: str, embedding: Optional[Any] = None):
+        """Store an answer, evicting the least recently used entry if full."""
+        bucket = self._bucket(scope, chunk_ids)
+        key = bucket + (normalize_question(question),)
+
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "created_at": time.time(),
+                "embedding": self._unit(embedding) if embedding is not None else None,
+            }
+            self._entries.move_to_end(key)
+            self._buckets.setdefault(bucket, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate(self, notebook_id: str):
+        """Drop answers that may be stale after a notebook's documents changed.
+
+        Removes entries scoped to the notebook, entries grounded on any of its
+        chunks, and entries that found no documents at all (new content may
+        now answer them).
+        """
+        prefix = f"{notebook_id}:"
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if key[0][0] == notebook_id
+                or not key[1]
+                or any(chunk_id.startswith(prefix) for chunk_id in key[1])
+            ]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._buckets.clear()
+
+    @staticmethod
+    def _unit(embedding: Any) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and cache size."""
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "near_duplicate_hits": self.near_hits,
+                "misses": self.misses,
+                "invalidated": self.invalidations,
+                "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class InvalidationLog:
+    """Sequence of notebook invalidations, shared by API workers through the model server.
+
+    The worker that ingests a document publishes its notebook; every worker
+    polls ``since`` and invalidates its own AnswerCache for the notebooks
+    published after the last sequence number it saw.
+
+    Attributes:
+        max_entries: Number of invalidations kept; a worker that fell further
+            behind is told to clear its whole cache
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._seq = 0
+        self._entries: List[Tuple[int, str]] = []
+        self._lock = threading.Lock()
+
+    def publish(self, notebook_id: str) -> int:
+        with self._lock:
+            self._seq += 1
+            self._entries.append((self._seq, notebook_id))
+            del self._entries[:-self.max_entries]
+            return self._seq
+
+    def since(self, seq: Optional[int]) -> Tuple[int, Optional[List[str]]]:
+        """Notebooks invalidated after ``seq``, and the sequence number to poll from next.
+
+        ``seq`` None (a worker's first poll) returns no notebooks. If entries
+        after ``seq`` were already dropped, the notebooks are None: the
+        caller has to clear everything.
+        """
+        with self._lock:
+            if seq is None or seq >= self._seq:
+                return self._seq, []
+            if not self._entries or self._entries[0][0] > seq + 1:
+                return self._seq, None
+            return self._seq, list(dict.fromkeys(nb for s, nb in self._entries if s > seq))
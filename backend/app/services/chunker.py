@@ -0,0 +1,146 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Heading lines in extracted PDF text: "Chapter 3 Cell Division", "2.4 Results",
+# "Lecture 7: Sorting". Numbered headings must start with a capital letter.
+HEADING_LINE_RE = re.compile(
+    r"^[ \t]*("
+    r"(?i:chapter|section|part|unit|lecture|module)[ \t]+(?:\d+|[IVXivx]+)\b[^\n]{0,80}"
+    r"|\d{1,2}(?:\.\d{1,2}){0,3}\.?[ \t]+[A-Z][^\n]{1,80}"
+    r")[ \t]*$",
+    re.MULTILINE,
+)
+MAX_HEADING_WORDS = 12
+
+
+@dataclass
+class ChunkConfig:
+    """Splitter settings for one source type, in characters."""
+    size: int
+    overlap: int
+
+
+@dataclass
+class Chunk:
+    """A piece of a document ready to embed.
+
+    Attributes:
+        text: Chunk text
+        start: Offset of the chunk in the text it was split from (a PDF page,
+            a web page section or a transcript window)
+        end: Offset just past the chunk
+        section: Title of the section the chunk belongs to, if known
+        page: 1-based PDF page the chunk came from, if any
+        start_seconds: Start of the transcript window the chunk came from, if any
+        end_seconds: End of that transcript window
+    """
+    text: str
+    start: int
+    end: int
+    section: Optional[str] = None
+    page: Optional[int] = None
+    start_seconds: Optional[float] = None
+    end_seconds: Optional[float] = None
+
+    def metadata(self) -> Dict[str, Any]:
+        """Chroma metadata for the chunk; Chroma rejects None values, so unset fields are left out."""
+        meta: Dict[str, Any] = {"char_start": self.start, "char_end": self.end}
+        if self.section:
+            meta["section"] = self.section
+        if self.page is not None:
+            meta["page"] = self.page
+        if self.start_seconds is not None:
+            meta["start_seconds"] = self.start_seconds
+            meta["end_seconds"] = self.end_seconds
+        return meta
+
+
+def _is_heading(line: str) -> bool:
+    line = line.strip()
+    return len(line.split()) <= MAX_HEADING_WORDS and not line.endswith((".", ",", ";", ":"))
+
+
+def find_headings(text: str) -> List[Tuple[int, str]]:
+    """Offsets and titles of heading-like lines in plain extracted text."""
+    return [(m.start(1), m.group(1).strip()) for m in HEADING_LINE_RE.finditer(text) if _is_heading(m.group(1))]
+
+
+class Chunker:
+    """Splits extracted text into chunks along document structure.
+
+    Chunks never cross a PDF page, a heading or a transcript window, and
+    each records where it came from (page, section, character offsets) so
+    citations can point back into the document. Chunk size and overlap are
+    configured per source type; one splitter per type is built up front
+    and shared by all ingestions.
+
+    Attributes:
+        configs: Source type ("pdf", "web", "transcript") -> ChunkConfig
+    """
+
+    def __init__(self, configs: Dict[str, ChunkConfig]):
+        self.configs = configs
+        self._splitters = {
+            source_type: RecursiveCharacterTextSplitter(chunk_size=c.size, chunk_overlap=c.overlap)
+            for source_type, c in configs.items()
+        }
+
+    def _locate(self, text: str, pieces: List[str], overlap: int) -> Iterator[Tuple[str, int]]:
+        """Yield each split piece with its offset in text; pieces come back in order."""
+        previous_start, previous_len = 0, 0
+        for piece in pieces:
+            search_from = max(0, previous_start + previous_len - overlap) if previous_len else 0
+            index = text.find(piece, search_from)
+            if index < 0:
+                index = text.find(piece)
+            if index < 0:
+                # The splitter only strips whitespace, so this shouldn't happen.
+                index = search_from
+            yield piece, index
+            previous_start, previous_len = index, len(piece)
+
+    def split(self, text: str, source_type: str, section: Optional[str] = None, page: Optional[int] = None, offset: int = 0) -> List[Chunk]:
+        """Split one structural unit of text into chunks.
+
+        Args:
+            text: Text of the unit (it is not split any further by structure)
+            source_type: Key into the chunk configs
+            section: Section title recorded on every chunk
+            page: PDF page number recorded on every chunk
+            offset: Added to the recorded offsets, for units that are part of a larger text
+
+        Returns:
+            Chunks in text order
+        """
+        splitter = self._splitters[source_type]
+        pieces = splitter.split_text(text)
+        return [
+            Chunk(piece, offset + index, offset + index + len(piece), section, page)
+            for piece, index in self._locate(text, pieces, self.configs[source_type].overlap)
+        ]
+
+    def split_page(self, text: str, source_type: str, page: Optional[int] = None, section: Optional[str] = None) -> Tuple[List[Chunk], Optional[str]]:
+        """Split a page of plain text at its heading lines, then by size.
+
+        Text before the page's first heading continues the section the
+        previous page ended in.
+
+        Args:
+            text: Page text
+            source_type: Key into the chunk configs
+            page: Page number recorded on every chunk
+            section: Title of the section the previous page ended in
+
+        Returns:
+            Tuple of (chunks in page order, title of the section the page ends in)
+        """
+        chunks: List[Chunk] = []
+        start = 0
+        for heading_start, title in find_headings(text):
+            chunks.extend(self.split(text[start:heading_start], source_type, section, page, start))
+            start, section = heading_start, title
+        chunks.extend(self.split(text[start:], source_type, section, page, start))
+        return chunks, section
@@ -1,22 +1,35 @@
-import requests
-from bs4 import BeautifulSoup
+import os
+import re
+import json
 from youtube_transcript_api import YouTubeTranscriptApi
 from urllib.parse import urlparse, parse_qs
 import wikipedia
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core import config, services
+from app.core.metrics import span
+from app.services.html_extractor import extract_sections, render_sections
+
+# A bare YouTube video id, as accepted by the batch upload endpoint.
+VIDEO_ID_RE = re.compile(r"[A-Za-z0-9_-]{11}")
+# "== History ==" style headings in Wikipedia's plain-text article content.
+WIKI_HEADING_RE = re.compile(r"^(={2,6})\s*(.+?)\s*\1\s*$", re.MULTILINE)
 
 def get_youtube_video_id(url: str) -> Optional[str]:
     """Extract video ID from various YouTube URL formats.
     
     Supports multiple URL patterns including youtu.be, youtube.com/watch,
-    youtube.com/embed, and youtube.com/v/ formats.
+    youtube.com/embed, and youtube.com/v/ formats, as well as a bare
+    11-character video ID.
     
     Args:
-        url: YouTube URL in any supported format
+        url: YouTube URL in any supported format, or a video ID
         
     Returns:
         Video ID string if found, None otherwise
     """
+    if VIDEO_ID_RE.fullmatch(url):
+        return url
     query = urlparse(url)
     if query.hostname == 'youtu.be':
         return query.path[1:]
@@ -31,86 +44,187 @@ def get_youtube_video_id(url: str) -> Optional[str]:
     return None
 
 
-def extract_youtube_transcript(video_id: str) -> str:
-    """Fetch and translate YouTube video transcript to English.
+def _transcript_path(video_id: str, language: str) -> str:
+    return os.path.join(config.TRANSCRIPT_CACHE_DIR, f"{video_id}.{language}.json")
+
+
+def _load_cached_transcript(video_id: str, language: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_transcript_path(video_id, language), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _store_transcript(video_id: str, language: str, transcript: Dict[str, Any]):
+    os.makedirs(config.TRANSCRIPT_CACHE_DIR, exist_ok=True)
+    path = _transcript_path(video_id, language)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(transcript, f)
+    os.replace(tmp_path, path)
+
+
+def fetch_youtube_transcript(video_id: str, language: str = "en") -> Dict[str, Any]:
+    """Fetch a YouTube transcript with its segment timings, translated to English.
     
     Attempts to retrieve transcript with the following priority:
     1. Manual English transcript
     2. Auto-generated English transcript
     3. Any available language, translated to English
     
+    Transcripts are cached on disk by video id and requested language, so
+    repeat ingests of a video make no requests to YouTube.
+    
     Args:
         video_id: YouTube video identifier
+        language: Language the transcript is wanted in
         
     Returns:
-        Formatted transcript text with language code, or error message
+        {"language_code", "segments": [{"text", "start", "duration"}, ...]}
+        
+    Raises:
+        ValueError: If the video has no transcript
+        Exception: Errors from youtube_transcript_api are passed through
     """
+    cached = _load_cached_transcript(video_id, language)
+    if cached is not None:
+        return cached
+
+    with span("scrape", kind="youtube"):
+        return _fetch_youtube_transcript(video_id, language)
+
+
+def _fetch_youtube_transcript(video_id: str, language: str) -> Dict[str, Any]:
+    print(f"Fetching transcript list for YouTube Video: {video_id}")
+    transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+    
+    transcript = None
+    
     try:
-        print(f"Fetching transcript list for YouTube Video: {video_id}")
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        
-        transcript = None
-        
+       transcript = transcript_list.find_transcript([language])
+    except:
+        for t in transcript_list:
+            transcript = t
+            break
+    
+    if not transcript:
+        raise ValueError("No transcript found for this video.")
+
+    if not transcript.is_translatable and transcript.language_code != language:
+        pass
+    elif transcript.language_code != language:
         try:
-           transcript = transcript_list.find_transcript(['en'])
-        except:
-            for t in transcript_list:
-                transcript = t
-                break
+            transcript = transcript.translate(language)
+        except Exception as e:
+            print(f"Translation failed: {e}")
+
+    segments = [
+        {"text": t["text"], "start": float(t["start"]), "duration": float(t.get("duration", 0.0))}
+        for t in transcript.fetch()
+    ]
+    result = {"language_code": transcript.language_code, "segments": segments}
+    try:
+        _store_transcript(video_id, language, result)
+    except OSError as e:
+        print(f"Could not cache transcript for {video_id}: {e}")
+    return result
+
+
+def transcript_windows(segments: List[Dict[str, Any]], window_seconds: float) -> List[Dict[str, object]]:
+    """Group transcript segments into consecutive time windows.
+    
+    Args:
+        segments: Transcript segments with "text", "start" and "duration"
+        window_seconds: Length of a window; a window closes at the first
+            segment boundary past it
         
-        if transcript:
-            if not transcript.is_translatable and transcript.language_code != 'en':
-                pass
-            elif transcript.language_code != 'en':
-                try:
-                    transcript = transcript.translate('en')
-                except Exception as e:
-                    print(f"Translation failed: {e}")
-
-            full_data = transcript.fetch()
-            full_transcript = " ".join([t['text'] for t in full_data])
-            return f"YouTube Video Transcript ({transcript.language_code}):\\n\\n{full_transcript}"
-            
-        return "Error: No transcript found for this video."
+    Returns:
+        List of {"heading", "level", "text", "start_seconds", "end_seconds"} sections
+    """
+    windows = []
+    current: List[str] = []
+    window_start = window_end = 0.0
+    for segment in segments:
+        text = segment["text"].replace("\n", " ").strip()
+        if not text:
+            continue
+        if current and segment["start"] - window_start >= window_seconds:
+            windows.append({"heading": "", "level": 0, "text": " ".join(current), "start_seconds": window_start, "end_seconds": window_end})
+            current = []
+        if not current:
+            window_start = segment["start"]
+        current.append(text)
+        window_end = segment["start"] + segment["duration"]
+    if current:
+        windows.append({"heading": "", "level": 0, "text": " ".join(current), "start_seconds": window_start, "end_seconds": window_end})
+    return windows
 
+
+def _format_transcript(transcript: Dict[str, Any]) -> str:
+    full_transcript = " ".join(t["text"] for t in transcript["segments"])
+    return f"YouTube Video Transcript ({transcript['language_code']}):\\n\\n{full_transcript}"
+
+
+def _transcript_error(e: Exception) -> str:
+    print(f"Error fetching YouTube transcript: {e}")
+    return f"Error: Could not retrieve YouTube transcript. The video might not have captions enabled. ({str(e)})"
+
+
+def extract_youtube_transcript(video_id: str) -> str:
+    """Fetch a YouTube video transcript as text, translated to English.
+    
+    Args:
+        video_id: YouTube video identifier
+        
+    Returns:
+        Formatted transcript text with language code, or error message
+    """
+    try:
+        return _format_transcript(fetch_youtube_transcript(video_id))
     except Exception as e:
-        print(f"Error fetching YouTube transcript: {e}")
-        return f"Error: Could not retrieve YouTube transcript. The video might not have captions enabled. ({str(e)})"
+        return _transcript_error(e)
 
 
-def crawl_website_content(url: str) -> str:
-    """Scrape and extract clean text content from a website.
+def crawl_website_sections(url: str) -> List[Dict[str, object]]:
+    """Scrape a website into heading-delimited sections of main content.
     
-    Removes scripts, styles, navigation, headers, footers, and cleans
-    whitespace to extract the main textual content.
+    The page is fetched through the shared HttpFetcher, so repeat scrapes
+    reuse connections and cached responses, and only the first
+    HTML_MAX_BYTES of the body are read. Navigation, headers, footers and
+    other boilerplate are dropped by the HTML extractor.
     
     Args:
         url: Website URL to scrape
         
     Returns:
-        Cleaned text content from the website, or empty string on error
+        List of {"heading", "level", "text"} sections, or an empty list on error
     """
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        for tag in soup(["script", "style", "nav", "footer", "header", "aside"]):
-            tag.decompose()
-            
-        text = soup.get_text()
-        
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\\n'.join(chunk for chunk in chunks if chunk)
-        
-        return f"Website Content ({url}):\\n\\n{text}"
+        with span("scrape", kind="web"):
+            response = services.get_http_fetcher().get(url, max_bytes=config.HTML_MAX_BYTES)
+        if response.truncated:
+            print(f"Page {url} exceeds {config.HTML_MAX_BYTES} bytes; extracting the first part only")
+        with span("html_extract"):
+            return extract_sections(response.content, config.HTML_EXTRACTOR)
     except Exception as e:
         print(f"Error scraping URL: {e}")
+        return []
+
+
+def crawl_website_content(url: str) -> str:
+    """Scrape and extract clean text content from a website.
+    
+    Args:
+        url: Website URL to scrape
+        
+    Returns:
+        Cleaned text content from the website, or empty string on error
+    """
+    sections = crawl_website_sections(url)
+    if not sections:
         return ""
+    return f"Website Content ({url}):\\n\\n{render_sections(sections)}"
 
 
 def fetch_wikipedia_content(query: str) -> str:
@@ -128,7 +242,8 @@ def fetch_wikipedia_content(query: str) -> str:
         topic = query.replace("wikipedia:", "").strip()
         print(f"Searching Wikipedia for: {topic}")
         
-        page = wikipedia.page(topic, auto_suggest=True)
+        with span("scrape", kind="wikipedia"):
+            page = wikipedia.page(topic, auto_suggest=True)
         return f"Wikipedia Article ({page.title}):\\n\\n{page.content}"
     except wikipedia.exceptions.DisambiguationError as e:
         return f"Error: Wikipedia query is ambiguous. Possible options: {', '.join(e.options[:5])}"
@@ -138,6 +253,57 @@ def fetch_wikipedia_content(query: str) -> str:
         return f"Error fetching Wikipedia: {e}"
 
 
+def split_wikipedia_sections(content: str) -> List[Dict[str, object]]:
+    """Split Wikipedia plain-text content at its "== Heading ==" lines."""
+    sections = []
+    heading, level, start = "", 0, 0
+    for match in WIKI_HEADING_RE.finditer(content):
+        text = content[start:match.start()].strip()
+        if text:
+            sections.append({"heading": heading, "level": level, "text": text})
+        heading, level, start = match.group(2), len(match.group(1)), match.end()
+    text = content[start:].strip()
+    if text:
+        sections.append({"heading": heading, "level": level, "text": text})
+    return sections
+
+
+def process_url_document(url_or_query: str) -> Tuple[str, List[Dict[str, object]]]:
+    """Extract content from a URL or query as text and as sections.
+    
+    Website and Wikipedia content is split at its headings so chunking can
+    keep sections apart. A YouTube transcript is split into time windows of
+    TRANSCRIPT_WINDOW_SECONDS whose sections carry "start_seconds" and
+    "end_seconds".
+    
+    Args:
+        url_or_query: URL or query string (supports 'wikipedia:' prefix)
+        
+    Returns:
+        Tuple of (full text as returned by process_url_content, list of
+        {"heading", "level", "text"} sections covering the content)
+    """
+    if url_or_query.lower().startswith("wikipedia:"):
+        text = fetch_wikipedia_content(url_or_query)
+        if text.startswith("Error"):
+            return text, [{"heading": "", "level": 0, "text": text}]
+        return text, split_wikipedia_sections(text)
+
+    video_id = get_youtube_video_id(url_or_query)
+    if video_id:
+        try:
+            transcript = fetch_youtube_transcript(video_id)
+        except Exception as e:
+            text = _transcript_error(e)
+            return text, [{"heading": "", "level": 0, "text": text}]
+        return _format_transcript(transcript), transcript_windows(transcript["segments"], config.TRANSCRIPT_WINDOW_SECONDS)
+
+    sections = crawl_website_sections(url_or_query)
+    if not sections:
+        return "", []
+    return f"Website Content ({url_or_query}):\\n\\n{render_sections(sections)}", sections
+
+
 def process_url_content(url_or_query: str) -> str:
     """Route URL or query to the appropriate content extraction function.
     
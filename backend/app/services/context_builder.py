@@ -0,0 +1,183 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; fall back to an estimate
+    tiktoken = None
+
+# Loaded on the first count_tokens call: the first load downloads the BPE
+# file (cached under TIKTOKEN_CACHE_DIR when set), which shouldn't happen
+# at import time or block startup when offline.
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Longest chunk overlap to look for when merging neighbours; at least the
+# splitter's CHUNK_OVERLAP_* (90 chars by default).
+MAX_OVERLAP_CHARS = 200
+# Don't bother squeezing in a truncated passage smaller than this.
+MIN_PARTIAL_TOKENS = 40
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                if tiktoken is not None:
+                    try:
+                        _encoding = tiktoken.get_encoding("cl100k_base")
+                    except Exception as e:
+                        print(f"Could not load the tiktoken encoding, estimating token counts: {e}")
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens with tiktoken, or estimate them from words and punctuation."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return int(len(_WORD_RE.findall(text)) * 1.3) + 1
+
+
+def _overlap(left: str, right: str, max_overlap: int = MAX_OVERLAP_CHARS) -> int:
+    """Length of the longest suffix of left that is also a prefix of right."""
+    for size in range(min(max_overlap, len(left), len(right)), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep whole leading sentences of text that fit in max_tokens."""
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_END_RE.split(text):
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept)
+
+
+def _label(meta: Dict[str, Any]) -> str:
+    label = meta.get("source") or "Document"
+    if meta.get("page"):
+        label += f", page {meta['page']}"
+    if meta.get("start_seconds") is not None:
+        minutes, seconds = divmod(int(meta["start_seconds"]), 60)
+        label += f", at {minutes}:{seconds:02d}"
+    if meta.get("section"):
+        label += f", section \"{meta['section']}\""
+    return f"[Source: {label}]"
+
+
+def build_context(documents: List[str], metadatas: List[Dict[str, Any]], max_tokens: int) -> Tuple[str, List[int]]:
+    """Assemble retrieved chunks into a prompt context within a token budget.
+
+    - Exact duplicates and chunks contained in another chunk are dropped.
+    - Chunks of the same document with consecutive chunk indices are merged,
+      removing the text they overlap on.
+    - Passages are added in retrieval rank order until the budget is spent;
+      a passage that doesn't fit is cut at a sentence boundary.
+
+    Args:
+        documents: Retrieved chunk texts, best first
+        metadatas: Chunk metadata (source, notebook_id, page, chunk_index), parallel to documents
+        max_tokens: Token budget for the assembled context
+
+    Returns:
+        Tuple of (context string, indices of the input chunks that were used)
+    """
+    passages: List[Dict[str, Any]] = []
+    for rank, (text, meta) in enumerate(zip(documents, metadatas)):
+        text = text.strip()
+        if not text or any(text in p["text"] for p in passages):
+            continue
+        # A later chunk can also swallow an earlier, smaller one and take its rank.
+        swallowed = [p for p in passages if p["text"] in text]
+        passages = [p for p in passages if p["text"] not in text]
+        best = min([rank] + [p["rank"] for p in swallowed])
+        passages.append({"text": text, "meta": meta or {}, "rank": best, "ranks": [rank]})
+
+    groups: Dict[Tuple[Optional[str], Optional[str]], List[Dict[str, Any]]] = {}
+    loose = []
+    for passage in passages:
+        meta = passage["meta"]
+        if meta.get("chunk_index") is None:
+            loose.append(passage)
+        else:
+            groups.setdefault((meta.get("notebook_id"), meta.get("source")), []).append(passage)
+
+    merged = list(loose)
+    for group in groups.values():
+        group.sort(key=lambda p: p["meta"]["chunk_index"])
+        current = group[0]
+        for passage in group[1:]:
+            last_index = current["meta"].get("last_index", current["meta"]["chunk_index"])
+            if passage["meta"]["chunk_index"] == last_index + 1:
+                overlap = _overlap(current["text"], passage["text"])
+                current = {
+                    "text": current["text"] + ("" if overlap else " ") + passage["text"][overlap:],
+                    "meta": dict(current["meta"], last_index=passage["meta"]["chunk_index"]),
+                    "rank": min(current["rank"], passage["rank"]),
+                    "ranks": current["ranks"] + passage["ranks"],
+                }
+            else:
+                merged.append(current)
+                current = passage
+        merged.append(current)
+
+    merged.sort(key=lambda p: p["rank"])
+
+    parts = []
+    used_ranks: List[int] = []
+    remaining = max_tokens
+    for passage in merged:
+        label = _label(passage["meta"])
+        block = f"{label}\n{passage['text']}"
+        tokens = count_tokens(block)
+        if tokens <= remaining:
+            parts.append(block)
+            used_ranks.extend(passage["ranks"])
+            remaining -= tokens
+            continue
+        if remaining >= MIN_PARTIAL_TOKENS:
+            partial = _truncate_to_tokens(passage["text"], remaining - count_tokens(label))
+            if partial:
+                block = f"{label}\n{partial}"
+                parts.append(block)
+                used_ranks.extend(passage["ranks"])
+                remaining -= count_tokens(block)
+
+    return "\n\n".join(parts), sorted(used_ranks)
+
+
+def build_context_slices(documents: List[str], metadatas: List[Dict[str, Any]], n_slices: int, max_tokens: int) -> List[str]:
+    """Split retrieved chunks into distinct contexts, one per parallel prompt.
+
+    Chunks are dealt round-robin in rank order, so every slice gets some of
+    the best matches, and each slice is packed with build_context.
+
+    Args:
+        documents: Retrieved chunk texts, best first
+        metadatas: Chunk metadata, parallel to documents
+        n_slices: Number of slices wanted; fewer are returned if there are fewer chunks
+        max_tokens: Token budget of each slice
+
+    Returns:
+        List of context strings
+    """
+    n_slices = max(1, min(n_slices, len(documents)))
+    slices = []
+    for i in range(n_slices):
+        context, _ = build_context(documents[i::n_slices], metadatas[i::n_slices], max_tokens)
+        slices.append(context)
+    return slices
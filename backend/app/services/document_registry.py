@@ -0,0 +1,71 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+
+def document_key(source: str, notebook_id: Optional[str]) -> str:
+    """Return the registry key of a document within its notebook."""
+    return f"{notebook_id or 'general'}:{source}"
+
+
+def chunk_id(doc_key: str, index: int) -> str:
+    """Return the vector store id of a document's chunk."""
+    return f"{doc_key}-{index}"
+
+
+def file_hash(data: bytes) -> str:
+    """Return the content hash of a whole document."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class DocumentRegistry:
+    """Persistent record of every ingested document and its chunks.
+
+    Each entry stores the document's content hash, its chunk count and the
+    hash of every chunk in order. Re-ingestion compares against the entry so
+    unchanged documents are skipped, only changed chunks are rewritten, and
+    chunks past the new end of the document are deleted.
+
+    The registry is a single JSON file, rewritten atomically on every update.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self._documents = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not load document registry, starting empty: {e}")
+            self._documents = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._documents, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, doc_key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._documents.get(doc_key)
+            return dict(record) if record else None
+
+    def put(self, doc_key: str, record: Dict[str, Any]):
+        with self._lock:
+            self._documents[doc_key] = dict(record, updated_at=time.time())
+            self._save()
+
+    def remove(self, doc_key: str):
+        with self._lock:
+            if self._documents.pop(doc_key, None) is not None:
+                self._save()
@@ -0,0 +1,129 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Document ids are the hex digest of the registry key; anything else is not a file of ours.
+DOCUMENT_ID_RE = re.compile(r"[0-9a-f]{40}")
+
+
+def document_id(doc_key: str) -> str:
+    """The public id of a document's stored text, derived from its registry key."""
+    return hashlib.sha1(doc_key.encode("utf-8")).hexdigest()
+
+
+class DocumentTextStore:
+    """Extracted text of every ingested document, kept server-side by page.
+
+    Upload results only carry a document id; the viewer then fetches the
+    page or character range it displays. Each document is one JSON file
+    under ``root``, ``{"source", "notebook_id", "version", "pages": [...]}``,
+    rewritten atomically when the document is re-ingested. ``version`` is
+    the content hash of the document, so it doubles as the ETag of
+    everything served from it.
+
+    Recently read documents are kept in memory and re-read when their file
+    changes on disk, so every API worker serves text stored by any other.
+
+    Attributes:
+        root: Directory holding one JSON file per document
+        max_cached: Number of documents kept in memory
+    """
+
+    def __init__(self, root: str, max_cached: int = 16):
+        self.root = root
+        self.max_cached = max_cached
+        # document id -> (file mtime, document, joined text or None)
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any], Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, doc_id: str) -> str:
+        return os.path.join(self.root, f"{doc_id}.json")
+
+    def put(self, doc_key: str, record: Dict[str, Any]) -> str:
+        """Store a document's text, replacing the previous version.
+
+        Args:
+            doc_key: Registry key of the document
+            record: {"source", "notebook_id", "version", "pages": [text, ...]}
+
+        Returns:
+            The document id to fetch the text by
+        """
+        doc_id = document_id(doc_key)
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(doc_id)
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+            self._cache.pop(doc_id, None)
+        return doc_id
+
+    def has(self, doc_key: str) -> bool:
+        return os.path.exists(self._path(document_id(doc_key)))
+
+    def remove(self, doc_key: str):
+        """Drop a document's stored text, e.g. because it no longer has any."""
+        doc_id = document_id(doc_key)
+        with self._lock:
+            self._cache.pop(doc_id, None)
+            try:
+                os.remove(self._path(doc_id))
+            except FileNotFoundError:
+                pass
+
+    def _load(self, doc_id: str) -> Optional[Tuple[float, Dict[str, Any], Optional[str]]]:
+        if not DOCUMENT_ID_RE.fullmatch(doc_id):
+            return None
+        path = self._path(doc_id)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            self._cache.pop(doc_id, None)
+            return None
+        cached = self._cache.get(doc_id)
+        if cached and cached[0] == mtime:
+            self._cache.move_to_end(doc_id)
+            return cached
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                document = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not load document text {doc_id}: {e}")
+            return None
+        entry = (mtime, document, None)
+        self._cache[doc_id] = entry
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+        return entry
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """A stored document by id, or None if there is none."""
+        with self._lock:
+            entry = self._load(doc_id)
+            return entry[1] if entry else None
+
+    def text(self, doc_id: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """A stored document and its pages joined by newlines, for offset ranges.
+
+        The joined text is built on first use and cached with the document.
+        """
+        with self._lock:
+            entry = self._load(doc_id)
+            if entry is None:
+                return None
+            mtime, document, joined = entry
+            if joined is None:
+                joined = "\n".join(document.get("pages", []))
+                self._cache[doc_id] = (mtime, document, joined)
+            return document, joined
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            files = [name for name in os.listdir(self.root) if name.endswith(".json")] if os.path.isdir(self.root) else []
+            return {"documents": len(files), "cached": len(self._cache)}
@@ -0,0 +1,119 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Callable, List, Optional, Tuple
+
+from app.core.metrics import create_untraced_task
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent query embeddings into batched encode calls.
+
+    Callers await ``embed(text)``. A single worker task collects texts that
+    arrive within ``max_wait_ms`` of the first one (up to
+    ``max_batch_size``), encodes them in one call on an executor thread so
+    the event loop is never blocked, and resolves each caller's future.
+    If the worker stops (cancelled, or an unexpected error), the texts it was
+    holding fail and the next ``embed`` restarts it on the same queue, so
+    texts already queued are still encoded.
+
+    Attributes:
+        max_batch_size: Maximum number of texts per encode call
+        max_wait_ms: How long to wait for more texts after the first arrives
+        batches: Number of encode calls made
+        items: Number of texts embedded
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], object],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.executor = executor
+        self.batches = 0
+        self.items = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures queued on another event loop can't be resolved from this one.
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            # Picks up whatever a stopped worker left in the queue.
+            self._worker = create_untraced_task(self._run())
+
+    async def embed(self, text: str) -> List[float]:
+        """Return the embedding of a single text, batched with concurrent callers."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self, batch: List[Tuple[str, asyncio.Future]]):
+        batch.append(await self._queue.get())
+        deadline = self._loop.time() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Take anything else already waiting without extending the deadline.
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _encode(self, batch: List[Tuple[str, asyncio.Future]]):
+        pending = [(text, future) for text, future in batch if not future.cancelled()]
+        if not pending:
+            return
+        texts = [text for text, _ in pending]
+        try:
+            vectors = await self._loop.run_in_executor(self.executor, self.encode_fn, texts)
+            results = [vector.tolist() if hasattr(vector, "tolist") else list(vector) for vector in vectors]
+            if len(results) != len(pending):
+                raise ValueError(f"Encoder returned {len(results)} vectors for {len(pending)} texts")
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(texts)
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run(self):
+        batch: List[Tuple[str, asyncio.Future]] = []
+        try:
+            while True:
+                batch = []
+                await self._collect(batch)
+                await self._encode(batch)
+        finally:
+            # Cancelled or crashed mid-batch: nobody else would resolve these.
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Embedding batcher stopped before encoding this text."))
+
+    def stats(self):
+        """Return batching counters."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+        }
@@ -0,0 +1,253 @@
+import os
+import json
+import hashlib
+import threading
+import contextlib
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows; appends from several processes are then unsafe
+    fcntl = None
+
+
+def chunk_hash(text: str) -> str:
+    """Return the content hash used to key a chunk of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent content-addressed cache of chunk embeddings.
+
+    Vectors are stored as rows of a float32 memory-mapped array file, and an
+    append-only key file maps each chunk hash to its row. The cache directory
+    is namespaced by model id so vectors from different models never mix.
+
+    Layout under ``<root>/<model_id>/``:
+        meta.json     model id and vector dimension
+        vectors.f32   row-major float32 matrix, grown by doubling
+        keys.txt      one chunk hash per line, line number == row
+        .lock         flock'ed while appending, so several processes can share the cache
+
+    Each process picks up rows appended by the others when it misses.
+
+    Attributes:
+        model_id: Embedding model identifier the vectors belong to
+        hits: Number of lookups served from the cache
+        misses: Number of lookups that had to be encoded
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, root: str, model_id: str):
+        self.model_id = model_id
+        self.directory = os.path.join(root, model_id.replace("/", "__"))
+        self.hits = 0
+        self.misses = 0
+        self.dim = None
+        self._rows: Dict[str, int] = {}
+        self._vectors = None
+        self._capacity = 0
+        # Rows in use (lines in the key file) and how far the key file has been read.
+        self._count = 0
+        self._keys_offset = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.directory, "meta.json")
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.directory, "vectors.f32")
+
+    @property
+    def _keys_path(self):
+        return os.path.join(self.directory, "keys.txt")
+
+    @property
+    def _lock_path(self):
+        return os.path.join(self.directory, ".lock")
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Hold an exclusive lock on the cache directory, shared by every process using it."""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> Optional[dict]:
+        if not os.path.exists(self._meta_path):
+            return None
+        with open(self._meta_path) as f:
+            return json.load(f)
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with self._file_lock():
+                meta = self._read_meta()
+                if meta is not None and meta.get("model_id") != self.model_id:
+                    print(f"Embedding cache at {self.directory} belongs to another model, ignoring it.")
+                    return
+                self._refresh(truncate=True)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load embedding cache, starting empty: {e}")
+            self.dim = None
+            self._rows = {}
+            self._vectors = None
+            self._capacity = 0
+            self._count = 0
+            self._keys_offset = 0
+
+    def _refresh(self, truncate: bool = False):
+        """Pick up rows appended (by this or another process) since the last look.
+
+        Args:
+            truncate: Drop a partial last line from the key file. Only safe
+                while holding the file lock, when it can't be a write in progress.
+        """
+        if self.dim is None:
+            meta = self._read_meta()
+            if meta is None or meta.get("model_id") != self.model_id:
+                return
+            self.dim = int(meta["dim"])
+        if self._vectors is not None and os.path.getsize(self._keys_path) == self._keys_offset:
+            return
+        self._map()
+        self._read_keys(truncate)
+
+    def _map(self):
+        capacity = os.path.getsize(self._vectors_path) // (self.dim * 4)
+        if self._vectors is not None:
+            if capacity == self._capacity:
+                return
+            self._vectors.flush()
+            del self._vectors
+        self._capacity = capacity
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _read_keys(self, truncate: bool):
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if truncate and end < len(data):
+            # Left by a writer that died mid-append; the next append starts a fresh line.
+            with open(self._keys_path, "r+b") as f:
+                f.truncate(self._keys_offset + end)
+        for line in data[:end].decode("utf-8").splitlines():
+            key = line.strip()
+            # Rows past the vector file belong to an interrupted write.
+            if key and self._count < self._capacity:
+                self._rows.setdefault(key, self._count)
+            self._count += 1
+        self._keys_offset += end
+
+    def _init_storage(self, dim: int):
+        self.dim = dim
+        self._rows = {}
+        self._count = 0
+        self._keys_offset = 0
+        self._resize(self.INITIAL_CAPACITY)
+        open(self._keys_path, "w").close()
+        # Written last: other processes take the cache as usable once meta.json exists.
+        with open(self._meta_path, "w") as f:
+            json.dump({"model_id": self.model_id, "dim": dim}, f)
+
+    def _resize(self, capacity: int):
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+            self._vectors = None
+        with open(self._vectors_path, "ab") as f:
+            # Another process may already have grown the file further; never shrink it.
+            if f.tell() < capacity * self.dim * 4:
+                f.truncate(capacity * self.dim * 4)
+        self._map()
+
+    def _append(self, keys: List[str], vectors: np.ndarray):
+        with self._file_lock():
+            self._refresh(truncate=True)
+            if self.dim is None:
+                self._init_storage(vectors.shape[1])
+            # Another process may have stored some of them meanwhile.
+            fresh = [i for i, key in enumerate(keys) if key not in self._rows]
+            if not fresh:
+                return
+            keys = [keys[i] for i in fresh]
+            start = self._count
+            needed = start + len(keys)
+            if needed > self._capacity:
+                capacity = max(self._capacity, self.INITIAL_CAPACITY)
+                while capacity < needed:
+                    capacity *= 2
+                self._resize(capacity)
+
+            self._vectors[start:needed] = vectors[fresh]
+            self._vectors.flush()
+            # Keys are written after the vectors so a crash never maps a key to an unwritten row.
+            with open(self._keys_path, "ab") as f:
+                f.write("".join(f"{key}\n" for key in keys).encode("utf-8"))
+            for offset, key in enumerate(keys):
+                self._rows[key] = start + offset
+            self._count = needed
+            self._keys_offset = os.path.getsize(self._keys_path)
+
+    def encode(self, texts: Sequence[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return embeddings for texts, encoding only the ones not cached yet.
+
+        Args:
+            texts: Chunks of text to embed
+            encode_fn: Function that embeds a list of texts with the cached model
+
+        Returns:
+            float32 array with one row per input text, in input order
+        """
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+
+        keys = [chunk_hash(text) for text in texts]
+
+        with self._lock:
+            if any(key not in self._rows for key in keys):
+                # Another process may have embedded them since we last looked.
+                self._refresh()
+            missing: Dict[str, str] = {}
+            for key, text in zip(keys, texts):
+                if key not in self._rows and key not in missing:
+                    missing[key] = text
+            self.hits += len(keys) - sum(1 for key in keys if key in missing)
+            self.misses += sum(1 for key in keys if key in missing)
+
+        if missing:
+            encoded = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                new_keys = [key for key in missing if key not in self._rows]
+                if new_keys:
+                    index = {key: i for i, key in enumerate(missing)}
+                    self._append(new_keys, encoded[[index[key] for key in new_keys]])
+
+        with self._lock:
+            return np.array(self._vectors[[self._rows[key] for key in keys]], dtype=np.float32)
+
+    def stats(self) -> Dict[str, object]:
+        """Return hit/miss counters and cache size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model_id": self.model_id,
+                "entries": len(self._rows),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
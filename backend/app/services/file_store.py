@@ -0,0 +1,75 @@
+import os
+import re
+import hashlib
+import tempfile
+from typing import BinaryIO, Optional, Tuple
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Stored files are named by their SHA-256; anything else is not a file of ours.
+CONTENT_HASH_RE = re.compile(r"[0-9a-f]{64}")
+
+
+class FileStore:
+    """Uploaded files stored once per content, under their SHA-256.
+
+    A file lives at ``root/<first two hex digits>/<hash><suffix>``, so two
+    uploads with the same name no longer overwrite each other and the same
+    content uploaded twice (under any name) is stored once. Since a path
+    never changes content, it can be served as immutable.
+
+    Attributes:
+        root: Directory holding the stored files
+        suffix: Extension of every stored file
+    """
+
+    def __init__(self, root: str, suffix: str = ".pdf"):
+        self.root = root
+        self.suffix = suffix
+
+    def path(self, content_hash: str) -> str:
+        return os.path.join(self.root, content_hash[:2], f"{content_hash}{self.suffix}")
+
+    def save(self, source: BinaryIO) -> Tuple[str, str]:
+        """Stream a file to disk in chunks while hashing it.
+
+        The data is written to a temporary file next to its destination and
+        renamed into place once its hash is known; if that content is already
+        stored, the copy is dropped.
+
+        Args:
+            source: Readable binary file, read from the start
+
+        Returns:
+            (SHA-256 hex digest, path of the stored file)
+        """
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        source.seek(0)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    block = source.read(UPLOAD_CHUNK_SIZE)
+                    if not block:
+                        break
+                    digest.update(block)
+                    f.write(block)
+            content_hash = digest.hexdigest()
+            path = self.path(content_hash)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return content_hash, path
+
+    def find(self, content_hash: str) -> Optional[str]:
+        """Path of a stored file, or None if the hash is malformed or not stored."""
+        if not CONTENT_HASH_RE.fullmatch(content_hash):
+            return None
+        path = self.path(content_hash)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,196 @@
+import re
+from typing import Dict, List, Optional
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional; fall back to BeautifulSoup
+    lxml = None
+
+# Elements that never hold page content.
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "iframe", "form", "button", "select", "nav", "footer", "header", "aside"}
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+# Elements whose own text forms a paragraph; text of inline descendants is folded into it.
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dd", "dt", "pre", "blockquote",
+    "table", "tr", "td", "th", "figure", "figcaption", "body", "details", "summary",
+} | set(HEADING_TAGS)
+BOILERPLATE_RE = re.compile(
+    r"(^|[\s_-])(nav|navbar|menu|footer|sidebar|cookie|banner|breadcrumbs?|share|social|comments?|advert|ads|promo|related|subscribe|popup|modal|skip-link)($|[\s_-])",
+    re.IGNORECASE,
+)
+WHITESPACE_RE = re.compile(r"\s+")
+# Below this much paragraph text, the detected container is not trusted and the whole body is used.
+MIN_MAIN_CHARS = 200
+
+
+def _clean(text: str) -> str:
+    return WHITESPACE_RE.sub(" ", text).strip()
+
+
+def _tag(el) -> Optional[str]:
+    return el.tag.lower() if isinstance(el.tag, str) else None
+
+
+def _link_density(el, text: str) -> float:
+    if not text:
+        return 0.0
+    link_text = sum(len(_clean(a.text_content())) for a in el.iter("a"))
+    return link_text / len(text)
+
+
+def _is_boilerplate(el) -> bool:
+    if el.get("role") in ("navigation", "banner", "contentinfo", "complementary"):
+        return True
+    if el.get("aria-hidden") == "true" or el.get("hidden") is not None:
+        return True
+    if not BOILERPLATE_RE.search(f"{el.get('class', '')} {el.get('id', '')}"):
+        return False
+    # Class names like "has-sidebar" also appear on content wrappers; keep long prose.
+    text = _clean(el.text_content())
+    return len(text) < 1000 or _link_density(el, text) > 0.5
+
+
+def _strip_boilerplate(root):
+    doomed = []
+    for el in root.iter():
+        tag = _tag(el)
+        if tag is None:
+            doomed.append(el)  # comments, processing instructions
+        elif tag in SKIP_TAGS or (tag not in ("body", "html", "main", "article") and _is_boilerplate(el)):
+            doomed.append(el)
+    for el in doomed:
+        if el.getparent() is not None:
+            el.drop_tree()
+
+
+def _main_content(root):
+    """Pick the element holding the page's main content.
+
+    Semantic containers (<main>, role=main, a single <article>) win;
+    otherwise each paragraph's text scores its parent fully and its
+    grandparent by half, and the best scoring container is used.
+    """
+    for xpath in ("//main", "//*[@role='main']"):
+        found = root.xpath(xpath)
+        if found:
+            return found[0]
+    articles = root.xpath("//article")
+    if len(articles) == 1:
+        return articles[0]
+
+    scores: Dict = {}
+    for p in root.iter("p", "pre", "li", "td", "blockquote"):
+        length = len(_clean(p.text_content()))
+        if length < 25:
+            continue
+        parent = p.getparent()
+        if parent is not None:
+            scores[parent] = scores.get(parent, 0) + length
+            grandparent = parent.getparent()
+            if grandparent is not None:
+                scores[grandparent] = scores.get(grandparent, 0) + length / 2
+    body = root.find(".//body")
+    if body is None:
+        body = root
+    if not scores:
+        return body
+    best, score = max(scores.items(), key=lambda item: item[1])
+    return best if score >= MIN_MAIN_CHARS else body
+
+
+def _own_text(el) -> str:
+    """Text of an element and its inline descendants, excluding nested blocks."""
+    if _tag(el) == "pre":
+        return el.text_content().strip()
+    parts = [el.text or ""]
+    for child in el:
+        if _tag(child) not in BLOCK_TAGS:
+            parts.append(child.text_content())
+        parts.append(child.tail or "")
+    return _clean(" ".join(parts))
+
+
+def _sections_from_tree(root, title: str) -> List[Dict[str, object]]:
+    _strip_boilerplate(root)
+    main = _main_content(root)
+
+    sections: List[Dict[str, object]] = []
+    current = {"heading": title, "level": 0, "paragraphs": []}
+    for el in main.iter():
+        tag = _tag(el)
+        if tag in HEADING_TAGS:
+            heading = _clean(el.text_content())
+            if heading:
+                if current["paragraphs"]:
+                    sections.append(current)
+                current = {"heading": heading, "level": HEADING_TAGS[tag], "paragraphs": []}
+            continue
+        if tag not in BLOCK_TAGS:
+            continue
+        text = _own_text(el)
+        # Short, link-heavy blocks are leftover navigation (tables of contents, "next page" links).
+        if text and not (len(text) < 200 and _link_density(el, text) > 0.5):
+            current["paragraphs"].append(text)
+    if current["paragraphs"]:
+        sections.append(current)
+
+    return [
+        {"heading": section["heading"], "level": section["level"], "text": "\n".join(section["paragraphs"])}
+        for section in sections
+    ]
+
+
+def _sections_bs4(html: bytes) -> List[Dict[str, object]]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "nav", "footer", "header", "aside"]):
+        tag.decompose()
+    title = _clean(soup.title.get_text()) if soup.title else ""
+    lines = (line.strip() for line in soup.get_text().splitlines())
+    text = "\n".join(phrase.strip() for line in lines for phrase in line.split("  ") if phrase.strip())
+    return [{"heading": title, "level": 0, "text": text}] if text else []
+
+
+def extract_sections(html: bytes, parser: str = "lxml") -> List[Dict[str, object]]:
+    """Extract the main text of an HTML page as heading-delimited sections.
+
+    With lxml, boilerplate (navigation, headers, footers, sidebars, cookie
+    banners, link lists) is removed, the main content container is
+    detected, and the text is split at every heading so chunking can keep
+    sections apart. The ``"bs4"`` parser, or a missing lxml, falls back to
+    BeautifulSoup's html.parser and returns the whole page as one section;
+    so does a page lxml can't parse, or one where everything looked like
+    boilerplate (e.g. a page wrapped in a single ``<form>``).
+
+    Args:
+        html: Raw page bytes (already capped by the fetcher)
+        parser: "lxml" or "bs4"
+
+    Returns:
+        List of {"heading", "level", "text"} dicts in page order; the first
+        section is headed by the page title
+    """
+    if parser != "lxml" or lxml is None or not html.strip():
+        return _sections_bs4(html)
+    try:
+        root = lxml.html.document_fromstring(html)
+    except Exception as e:  # lxml rejects some malformed documents outright
+        print(f"lxml could not parse page, falling back to html.parser: {e}")
+        return _sections_bs4(html)
+    title_el = root.find(".//title")
+    title = _clean(title_el.text_content()) if title_el is not None else ""
+    sections = _sections_from_tree(root, title)
+    if not sections:
+        print("lxml found no main content, falling back to html.parser")
+        return _sections_bs4(html)
+    return sections
+
+
+def render_sections(sections: List[Dict[str, object]]) -> str:
+    """Join sections into plain text, keeping headings as their own lines."""
+    parts = []
+    for section in sections:
+        heading = section.get("heading")
+        parts.append(f"{heading}\n{section['text']}" if heading else str(section["text"]))
+    return "\n\n".join(parts)
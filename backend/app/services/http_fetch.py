@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+
+def _cache_directives(header: Optional[str]) -> Dict[str, Optional[str]]:
+    """Parse a Cache-Control header into {directive: value or None}."""
+    directives: Dict[str, Optional[str]] = {}
+    for part in (header or "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip().strip('"') or None
+    return directives
+
+
+@dataclass
+class FetchResult:
+    """A fetched (or cached) HTTP response body.
+
+    Attributes:
+        url: Requested URL
+        status: HTTP status of the response the body came from
+        content: Response body
+        content_type: Content-Type header, if any
+        from_cache: Whether the body was served from the disk cache
+        truncated: Whether the body was cut off at the byte cap
+    """
+    url: str
+    status: int
+    content: bytes
+    content_type: Optional[str]
+    from_cache: bool
+    truncated: bool = False
+
+
+class HttpFetcher:
+    """Pooled, cached HTTP GETs for scraping.
+
+    - One ``requests.Session`` with a sized connection pool is shared by all
+      scraper threads, so repeat requests to a host reuse connections.
+    - At most ``per_host_limit`` requests run against the same host at once.
+    - Successful responses are cached on disk, as a shared cache would:
+      ``no-store`` and ``private`` responses are not stored. For
+      ``fresh_seconds``, or less if the response's ``s-maxage`` / ``max-age``
+      says so, a cached body is returned without a request; after that (and
+      always for ``no-cache``) it is revalidated with If-None-Match /
+      If-Modified-Since and a 304 reuses it.
+    - Bodies cut off at a caller's ``max_bytes`` are not cached, so a later
+      caller never gets a body truncated for someone else; a cached full
+      body is cut to the caller's ``max_bytes`` instead.
+    - The cache is bounded to ``max_bytes``; least recently used entries are
+      evicted first.
+
+    Attributes:
+        cache_dir: Directory holding cached bodies and their metadata
+        max_bytes: Upper bound on the total size of cached bodies
+        fresh_seconds: How long a cached body is used without revalidation
+        timeout: Request timeout in seconds
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        fresh_seconds: float = 300.0,
+        pool_size: int = 16,
+        per_host_limit: int = 4,
+        timeout: float = 15.0,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        # cache key -> (body size, last used)
+        self._entries: Dict[str, list] = {}
+        self._total_bytes = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            body = os.path.join(self.cache_dir, f"{key}.body")
+            try:
+                size = os.path.getsize(body)
+                used = os.path.getmtime(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            self._entries[key] = [size, used]
+            self._total_bytes += size
+
+    def _paths(self, key: str):
+        return os.path.join(self.cache_dir, f"{key}.json"), os.path.join(self.cache_dir, f"{key}.body")
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return slot
+
+    def _read_cached(self, key: str):
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def _touch(self, key: str, meta: Dict, revalidated: bool = False):
+        meta_path, _ = self._paths(key)
+        now = time.time()
+        if revalidated:
+            meta["validated_at"] = now
+            self._write_json(meta_path, meta)
+        else:
+            try:
+                os.utime(meta_path, (now, now))
+            except OSError:
+                pass
+        with self._lock:
+            if key in self._entries:
+                self._entries[key][1] = now
+
+    @staticmethod
+    def _write_json(path: str, data: Dict):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _fresh_for(self, headers) -> Optional[float]:
+        """Seconds a response may be served without revalidation, or None if it mustn't be cached."""
+        directives = _cache_directives(headers.get("Cache-Control"))
+        if "no-store" in directives or "private" in directives:
+            return None
+        if "no-cache" in directives:
+            return 0.0
+        for name in ("s-maxage", "max-age"):
+            try:
+                return max(0.0, min(float(directives[name]), self.fresh_seconds))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return self.fresh_seconds
+
+    def _drop(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._total_bytes -= entry[0]
+
+    def _store(self, key: str, url: str, response: requests.Response, body: bytes, fresh_for: float):
+        if len(body) > self.max_bytes:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        meta_path, body_path = self._paths(key)
+        meta = {
+            "url": url,
+            "status": response.status_code,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type"),
+            "fresh_for": fresh_for,
+            "validated_at": time.time(),
+        }
+        tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, body_path)
+        self._write_json(meta_path, meta)
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous:
+                self._total_bytes -= previous[0]
+            self._entries[key] = [len(body), time.time()]
+            self._total_bytes += len(body)
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits; caller holds the lock."""
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            del self._entries[key]
+            self._total_bytes -= size
+
+    @staticmethod
+    def _read_body(response: requests.Response, max_bytes: Optional[int]):
+        """Read a streamed response body, stopping after max_bytes."""
+        if max_bytes is None:
+            return response.content, False
+        parts = []
+        size = 0
+        for block in response.iter_content(chunk_size=64 * 1024):
+            parts.append(block)
+            size += len(block)
+            if size >= max_bytes:
+                return b"".join(parts)[:max_bytes], True
+        return b"".join(parts), False
+
+    def get(self, url: str, max_bytes: Optional[int] = None) -> FetchResult:
+        """Fetch a URL, using and refreshing the disk cache.
+
+        Args:
+            url: URL to fetch
+            max_bytes: Stop reading the body after this many bytes
+
+        Returns:
+            FetchResult with the response body
+
+        Raises:
+            requests.RequestException: If the request fails and nothing is cached;
+                a cached copy is served when revalidation fails
+        """
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        meta, body = self._read_cached(key) if key in self._entries else (None, None)
+
+        def cached() -> FetchResult:
+            truncated = max_bytes is not None and len(body) > max_bytes
+            return FetchResult(url, meta["status"], body[:max_bytes] if truncated else body, meta.get("content_type"), True, truncated)
+
+        if meta is not None and time.time() - meta.get("validated_at", 0) < meta.get("fresh_for", self.fresh_seconds):
+            self.hits += 1
+            self._touch(key, meta)
+            return cached()
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            with self._host_slot(url):
+                with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                    if response.status_code != 304:
+                        response.raise_for_status()
+                    content, truncated = self._read_body(response, max_bytes)
+        except requests.RequestException as e:
+            if meta is None:
+                raise
+            print(f"Serving cached copy of {url} after fetch error: {e}")
+            self.hits += 1
+            return cached()
+
+        if response.status_code == 304 and meta is not None:
+            self.revalidated += 1
+            if "Cache-Control" in response.headers:
+                fresh_for = self._fresh_for(response.headers)
+                if fresh_for is None:
+                    self._drop(key)
+                    return cached()
+                meta["fresh_for"] = fresh_for
+            self._touch(key, meta, revalidated=True)
+            return cached()
+
+        self.misses += 1
+        fresh_for = self._fresh_for(response.headers)
+        if fresh_for is not None and not truncated:
+            self._store(key, url, response, content, fresh_for)
+        elif meta is not None:
+            self._drop(key)
+        return FetchResult(url, response.status_code, content, response.headers.get("Content-Type"), False, truncated)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+            }
@@ -0,0 +1,497 @@
+import json
+import asyncio
+import contextlib
+from typing import Any, Dict, List, Optional
+
+from app.core import config, services
+from app.core.metrics import span
+from app.rag_core import LLMUnavailableError
+from app.services.chunker import Chunk
+from app.services.jobs import IngestJob
+from app.services.pdf_processor import aiter_pdf_pages, count_pdf_pages
+from app.services.content_scraper import process_url_document
+from app.services.embedding_cache import chunk_hash
+from app.services.document_registry import document_key, chunk_id, file_hash
+from app.services.document_text import document_id
+from app.services.context_builder import build_context
+
+EMBED_BATCH_SIZE = 64
+
+# Serializes concurrent ingestions of the same document:
+# document key -> [lock, number of ingestions holding or waiting on it]
+_document_locks: Dict[str, List[Any]] = {}
+# Running question bank builds, by document key.
+_bank_builds: Dict[str, asyncio.Task] = {}
+# Concurrency group the bank builds share in the LLM gateway, so they can't
+# take the slots of interactive requests.
+QUESTION_BANK_LLM_SCOPE = "question-bank"
+
+
+@contextlib.asynccontextmanager
+async def _document_lock(doc_key: str):
+    """Hold the ingestion lock of a document; the lock is dropped once nobody needs it."""
+    entry = _document_locks.setdefault(doc_key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _document_locks[doc_key]
+
+
+async def _summarize(text: str, is_youtube: bool, notebook_id: Optional[str]) -> Optional[str]:
+    """Summarize scraped content, or None if the LLM couldn't produce a summary."""
+    if is_youtube:
+        summary_prompt = "The following is a transcript of a YouTube video. Summarize the key concepts, main arguments, and any educational takeaways."
+    else:
+        summary_prompt = "Summarize the key points of the following web page content."
+    try:
+        summary = await services.get_rag_engine().generate_answer(summary_prompt, text[:4000], notebook_id=notebook_id)
+    except LLMUnavailableError as e:
+        print(f"Summary skipped, LLM unavailable: {e}")
+        return None
+    # generate_answer reports its own failures as text.
+    if summary.startswith(("Error:", "Error generating answer:")):
+        print(f"Summary skipped: {summary}")
+        return None
+    return summary
+
+
+def _embed(chunks: List[str]) -> List[List[float]]:
+    return services.embed_chunks(chunks).tolist()
+
+
+def _upsert(notebook_id: str, chunks: List[str], embeddings: List[List[float]], ids: List[str], metadatas: List[Dict[str, Any]]):
+    services.get_vector_store().upsert(notebook_id, ids=ids, documents=chunks, embeddings=embeddings, metadatas=metadatas)
+    services.get_lexical_index().upsert(ids, chunks, metadatas)
+
+
+def _delete_ids(notebook_id: str, ids: List[str]):
+    services.get_vector_store().delete(notebook_id, ids=ids)
+    services.get_lexical_index().delete(ids)
+
+
+def _delete_unregistered(source: str, notebook_id: str):
+    # Chunks written before the registry existed used ids without a notebook prefix.
+    services.get_vector_store().delete(notebook_id, source=source)
+    services.get_lexical_index().delete_source(notebook_id, source)
+
+
+async def _store_text(doc_key: str, source: str, notebook_id: Optional[str], content_hash: str, pages: List[str]) -> Dict[str, Any]:
+    """Persist a document's text for /documents/{document_id}/text and return its id and size."""
+    await services.get_job_manager().run_in_thread(services.get_document_text().put, doc_key, {
+        "source": source,
+        "notebook_id": notebook_id or "general",
+        "version": content_hash,
+        "pages": pages,
+    })
+    return {"document_id": document_id(doc_key), "characters": sum(len(page) for page in pages) + len(pages) - 1}
+
+
+class ChunkWriter:
+    """Incrementally syncs a document's chunks into the vector store.
+
+    Chunks are added in document order as they are produced. Only chunks
+    whose hash differs from the previous ingestion of the document are
+    embedded and upserted, in batches, so embedding starts before the whole
+    document has been extracted. ``finish`` deletes chunks past the new end
+    of the document and updates the registry.
+    """
+
+    def __init__(self, job: IngestJob, source: str, notebook_id: Optional[str], previous: Optional[Dict[str, Any]]):
+        self.job = job
+        self.source = source
+        self.notebook = notebook_id or "general"
+        self.doc_key = document_key(source, notebook_id)
+        self.previous = previous
+        self.old_hashes = previous.get("chunk_hashes", []) if previous else []
+        self.hashes: List[str] = []
+        self.updated = 0
+        self._pending: List[tuple] = []
+        self._cleared_unregistered = previous is not None
+
+    async def add(self, chunks: List[Chunk]):
+        """Queue chunks in document order, with the page, section and offsets they carry."""
+        for chunk in chunks:
+            index = len(self.hashes)
+            chunk_meta = chunk.metadata()
+            # Metadata is part of the hash so moved chunks get their offsets updated;
+            # the embedding cache is keyed on text alone, so they aren't re-embedded.
+            h = chunk_hash(f"{json.dumps(chunk_meta, sort_keys=True)}\n{chunk.text}")
+            self.hashes.append(h)
+            if index >= len(self.old_hashes) or self.old_hashes[index] != h:
+                meta = {"source": self.source, "notebook_id": self.notebook, "chunk_index": index}
+                meta.update(chunk_meta)
+                self._pending.append((index, chunk.text, meta))
+        self.job.advance("chunk", len(chunks))
+
+        if len(self._pending) >= EMBED_BATCH_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        """Embed and upsert all queued changed chunks."""
+        if not self._pending:
+            return
+        jobs = services.get_job_manager()
+        if not self._cleared_unregistered:
+            await jobs.run_in_thread(_delete_unregistered, self.source, self.notebook)
+            self._cleared_unregistered = True
+
+        batch, self._pending = self._pending, []
+        chunks = [chunk for _, chunk, _ in batch]
+        with span("embed_chunks", chunks=len(chunks)):
+            embeddings = await jobs.run_in_thread(_embed, chunks)
+        self.job.advance("embed", len(batch))
+
+        ids = [chunk_id(self.doc_key, index) for index, _, _ in batch]
+        metadatas = [meta for _, _, meta in batch]
+        with span("store", chunks=len(chunks)):
+            await jobs.run_in_thread(_upsert, self.notebook, chunks, embeddings, ids, metadatas)
+        self.job.advance("store", len(batch))
+        self.updated += len(batch)
+
+    async def finish(self, content_hash: str, extra: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+        """Flush remaining chunks, delete orphans and record the document.
+
+        Returns:
+            dict: Counts of updated and deleted chunks
+        """
+        await self.flush()
+        jobs = services.get_job_manager()
+
+        orphaned = list(range(len(self.hashes), len(self.old_hashes)))
+        if orphaned:
+            await jobs.run_in_thread(_delete_ids, self.notebook, [chunk_id(self.doc_key, i) for i in orphaned])
+
+        record = {
+            "source": self.source,
+            "notebook_id": self.notebook,
+            "file_hash": content_hash,
+            "chunk_count": len(self.hashes),
+            "chunk_hashes": self.hashes,
+        }
+        record.update(extra or {})
+        await jobs.run_in_thread(services.get_document_registry().put, self.doc_key, record)
+        await jobs.run_in_thread(services.get_lexical_index().save)
+
+        if self.updated or orphaned:
+            await jobs.run_in_thread(services.invalidate_answers, self.notebook)
+
+        return {"chunks_updated": self.updated, "chunks_deleted": len(orphaned)}
+
+    async def discard(self) -> Dict[str, int]:
+        """Delete everything stored for the document, which no longer has any text.
+
+        Returns:
+            dict: Counts of updated and deleted chunks
+        """
+        jobs = services.get_job_manager()
+        if self.old_hashes:
+            await jobs.run_in_thread(_delete_ids, self.notebook, [chunk_id(self.doc_key, i) for i in range(len(self.old_hashes))])
+        await jobs.run_in_thread(services.get_document_registry().remove, self.doc_key)
+        await jobs.run_in_thread(services.get_document_text().remove, self.doc_key)
+        await jobs.run_in_thread(services.get_question_bank().remove, self.doc_key)
+        await jobs.run_in_thread(services.get_lexical_index().save)
+        if self.old_hashes:
+            await jobs.run_in_thread(services.invalidate_answers, self.notebook)
+        return {"chunks_updated": 0, "chunks_deleted": len(self.old_hashes)}
+
+
+async def ingest_pdf(job: IngestJob, file_path: str, content_hash: str, filename: str, notebook_id: Optional[str], url: str) -> Dict[str, Any]:
+    """Extract, chunk, embed and store an uploaded PDF.
+
+    Pages are extracted in parallel on the process pool and streamed into
+    the splitter and embedder as they arrive; each chunk records the page it
+    came from. Documents whose content hash matches the registry are not
+    re-indexed; their text is only extracted again if it isn't stored. A
+    PDF with no extractable text drops whatever an earlier upload under the
+    same name indexed.
+
+    Args:
+        job: Job record to report stage progress on
+        file_path: Path of the saved upload, memory-mapped by the extractor
+        content_hash: SHA-256 of the file, computed while it was saved
+        filename: Original upload filename, used as the document source
+        notebook_id: Optional notebook identifier for organization
+        url: Public URL the saved file is served from
+
+    Returns:
+        dict: Processing results including chunk count, page count, filename, and the
+            document_id the extracted text is served by
+    """
+    jobs = services.get_job_manager()
+    registry = services.get_document_registry()
+    doc_key = document_key(filename, notebook_id)
+
+    async with _document_lock(doc_key):
+        previous = registry.get(doc_key)
+
+        if previous and previous.get("file_hash") == content_hash:
+            page_count = previous.get("pages")
+            if services.get_document_text().has(doc_key):
+                text_info = {"document_id": document_id(doc_key), "characters": previous.get("characters")}
+            else:
+                # Indexed before the text store existed (or its text was lost): extract the
+                # text again for the viewer, without re-chunking or re-embedding.
+                job.start_stage("extract")
+                page_count = await jobs.run_in_process(count_pdf_pages, file_path)
+                job.stages["extract"]["total"] = page_count
+                pages = [""] * page_count
+                async for page_number, page_text in aiter_pdf_pages(file_path, jobs.process_pool, page_count):
+                    job.advance("extract")
+                    pages[page_number - 1] = page_text if page_text.strip() else ""
+                text_info = await _store_text(doc_key, filename, notebook_id, content_hash, pages)
+            return {
+                "message": "PDF unchanged since last upload; skipped re-indexing.",
+                "unchanged": True,
+                "chunks": previous["chunk_count"],
+                **text_info,
+                "pages": page_count,
+                "filename": filename,
+                "notebook_id": notebook_id,
+                "url": url
+            }
+
+        job.start_stage("extract")
+        page_count = await jobs.run_in_process(count_pdf_pages, file_path)
+        job.stages["extract"]["total"] = page_count
+
+        writer = ChunkWriter(job, filename, notebook_id, previous)
+        chunker = services.get_chunker()
+        section = None
+        # Every page keeps its slot, so the viewer's page numbers match the PDF's.
+        pages = [""] * page_count
+        async for page_number, page_text in aiter_pdf_pages(file_path, jobs.process_pool, page_count):
+            job.advance("extract")
+            if not page_text.strip():
+                continue
+            pages[page_number - 1] = page_text
+            with span("chunk"):
+                chunks, section = await jobs.run_in_thread(chunker.split_page, page_text, "pdf", page_number, section)
+            await writer.add(chunks)
+
+        if not any(pages):
+            # Whatever an earlier version of the file indexed is gone now.
+            counts = await writer.discard()
+            return {
+                "message": "PDF uploaded but no text extraction was possible (it might be an image-only PDF).",
+                "unchanged": False,
+                "chunks": 0,
+                **counts,
+                "filename": filename,
+                "notebook_id": notebook_id,
+                "url": url
+            }
+
+        text_info = await _store_text(doc_key, filename, notebook_id, content_hash, pages)
+        counts = await writer.finish(content_hash, {"pages": page_count, "characters": text_info["characters"]})
+
+    return {
+        "message": "PDF extracted and stored.",
+        "unchanged": False,
+        "chunks": len(writer.hashes),
+        **counts,
+        **text_info,
+        "pages": page_count,
+        "filename": filename,
+        "notebook_id": notebook_id,
+        "url": url
+    }
+
+
+async def ingest_url(job: IngestJob, url: str, name: Optional[str], notebook_id: Optional[str]) -> Dict[str, Any]:
+    """Scrape, chunk, embed, store and summarize content from a URL.
+
+    If the scraped text is identical to the last ingestion, the stored
+    chunks and the previous summary are reused; a summary that failed last
+    time is generated again. A failed summary is never stored, and the
+    result's summary is then empty.
+
+    Args:
+        job: Job record to report stage progress on
+        url: URL or query string (supports 'wikipedia:' prefix)
+        name: Optional custom name for the document
+        notebook_id: Optional notebook identifier for organization
+
+    Returns:
+        dict: Processing results with chunks, the document_id the text is served by,
+            and AI-generated summary
+
+    Raises:
+        ValueError: If text extraction fails
+    """
+    jobs = services.get_job_manager()
+    registry = services.get_document_registry()
+    filename = name or url
+    doc_key = document_key(filename, notebook_id)
+
+    job.start_stage("extract")
+    print(f"Scraping URL: {url}")
+    text, sections = await jobs.run_in_thread(process_url_document, url)
+
+    if not text.strip():
+        raise ValueError("Failed to extract text from URL.")
+    is_youtube = "YouTube Video Transcript" in text[:50]
+
+    async with _document_lock(doc_key):
+        content_hash = file_hash(text.encode("utf-8"))
+        previous = registry.get(doc_key)
+
+        if previous and previous.get("file_hash") == content_hash:
+            # Documents indexed before the text store existed get their text stored now.
+            if services.get_document_text().has(doc_key):
+                text_info = {"document_id": document_id(doc_key), "characters": len(text)}
+            else:
+                text_info = await _store_text(doc_key, filename, notebook_id, content_hash, [text])
+            summary = previous.get("summary")
+            if not summary:
+                summary = await _summarize(text, is_youtube, notebook_id)
+                if summary:
+                    await jobs.run_in_thread(registry.put, doc_key, {**previous, "summary": summary})
+            return {
+                "message": "URL content unchanged since last ingestion; skipped re-indexing.",
+                "unchanged": True,
+                "chunks": previous["chunk_count"],
+                **text_info,
+                "pages": 1,
+                "filename": filename,
+                "notebook_id": notebook_id,
+                "summary": summary or ""
+            }
+
+        job.start_stage("chunk")
+        writer = ChunkWriter(job, filename, notebook_id, previous)
+
+        # Chunks never straddle a heading, and carry it so citations can name the section.
+        chunker = services.get_chunker()
+        for section in sections:
+            with span("chunk"):
+                chunks = await jobs.run_in_thread(
+                    chunker.split, section["text"], "transcript" if is_youtube else "web", section["heading"] or None
+                )
+            if "start_seconds" in section:
+                for chunk in chunks:
+                    chunk.start_seconds, chunk.end_seconds = section["start_seconds"], section["end_seconds"]
+            await writer.add(chunks)
+
+        summary = await _summarize(text, is_youtube, notebook_id)
+
+        text_info = await _store_text(doc_key, filename, notebook_id, content_hash, [text])
+        counts = await writer.finish(content_hash, {"summary": summary} if summary else None)
+
+    return {
+        "message": "URL content processed.",
+        "unchanged": False,
+        "chunks": len(writer.hashes),
+        **counts,
+        **text_info,
+        "pages": 1,
+        "filename": filename,
+        "notebook_id": notebook_id,
+        "summary": summary or ""
+    }
+
+
+async def build_question_bank(source: str, notebook_id: Optional[str]):
+    """Pre-generate quiz questions for every section of an ingested document.
+
+    The document's chunks are split into at most QUESTION_BANK_MAX_SECTIONS
+    sections of consecutive chunks, and each section gets
+    QUESTION_BANK_QUESTIONS_PER_SECTION validated questions per difficulty.
+    Sections are generated one at a time, and every LLM call is a
+    background call that stays within QUESTION_BANK_LLM_SHARE of the quota
+    and waits for interactive calls, so a large document doesn't crowd out
+    asks and quizzes. The bank is discarded if the document is
+    re-ingested while it is being built.
+
+    Args:
+        source: Document source (filename or URL name)
+        notebook_id: Notebook the document belongs to
+    """
+    jobs = services.get_job_manager()
+    rag = services.get_rag_engine()
+    doc_key = document_key(source, notebook_id)
+    record = services.get_document_registry().get(doc_key)
+    if not record or not record.get("chunk_count") or not rag.backend:
+        return
+
+    count = record["chunk_count"]
+    notebook = notebook_id or "general"
+    found = await jobs.run_in_thread(services.get_vector_store().get, notebook, [chunk_id(doc_key, i) for i in range(count)])
+    chunks = sorted(
+        (((meta or {}).get("chunk_index", 0), document, meta or {}) for document, meta in zip(found["documents"], found["metadatas"])),
+        key=lambda chunk: chunk[0]
+    )
+    if not chunks:
+        return
+
+    n_sections = min(config.QUESTION_BANK_MAX_SECTIONS, -(-len(chunks) // config.QUESTION_BANK_SECTION_CHUNKS))
+    size = -(-len(chunks) // n_sections)
+    sections = []
+    for start in range(0, len(chunks), size):
+        part = chunks[start:start + size]
+        context, _ = build_context([c[1] for c in part], [c[2] for c in part], config.QUESTION_BANK_CONTEXT_TOKENS)
+        questions = {}
+        for difficulty in config.QUESTION_BANK_DIFFICULTIES:
+            try:
+                questions[difficulty] = [
+                    q async for q in rag.iter_quiz_questions(
+                        source, [context], difficulty, config.QUESTION_BANK_QUESTIONS_PER_SECTION, QUESTION_BANK_LLM_SCOPE,
+                        background=True,
+                    )
+                ]
+            except Exception as e:
+                print(f"Question bank for {doc_key} skipped a {difficulty} section: {e}")
+                questions[difficulty] = []
+        sections.append({"start": part[0][0], "end": part[-1][0], "questions": questions})
+
+    current = services.get_document_registry().get(doc_key)
+    if not current or current.get("file_hash") != record.get("file_hash"):
+        return
+    await jobs.run_in_thread(services.get_question_bank().put, doc_key, {
+        "source": source,
+        "notebook_id": notebook,
+        "file_hash": record.get("file_hash"),
+        "sections": sections,
+    })
+    total = sum(len(qs) for section in sections for qs in section["questions"].values())
+    print(f"Question bank for {doc_key}: {total} questions in {len(sections)} sections.")
+
+
+def schedule_question_bank(result: Dict[str, Any]):
+    """Start a background question bank build after an ingestion job.
+
+    Unchanged documents keep their existing bank; changed ones lose it at
+    once, and any build still running for the old content is cancelled.
+
+    Args:
+        result: Result payload returned by ingest_pdf or ingest_url
+    """
+    if not config.QUESTION_BANK_ENABLED or not result.get("chunks"):
+        return
+    source, notebook_id = result["filename"], result.get("notebook_id")
+    doc_key = document_key(source, notebook_id)
+    bank = services.get_question_bank()
+    if result.get("unchanged") and (bank.has(doc_key) or doc_key in _bank_builds):
+        return
+
+    bank.remove(doc_key)
+    previous = _bank_builds.pop(doc_key, None)
+    if previous is not None:
+        previous.cancel()
+
+    async def run():
+        try:
+            await build_question_bank(source, notebook_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Question bank build for {doc_key} failed: {e}")
+        finally:
+            if _bank_builds.get(doc_key) is task:
+                del _bank_builds[doc_key]
+
+    task = asyncio.create_task(run())
+    _bank_builds[doc_key] = task
@@ -0,0 +1,309 @@
+import asyncio
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core import config
+from app.core.metrics import observe, create_untraced_task
+
+STAGES = ["extract", "chunk", "embed", "store"]
+# How often a running job's progress is copied to the shared job board.
+PUBLISH_INTERVAL_SECONDS = 0.5
+
+
+class JobQueueFullError(Exception):
+    """Raised when the ingestion queue has no room for another job."""
+
+
+class IngestJob:
+    """Progress record for a single background ingestion job.
+
+    Attributes:
+        job_id: Unique job identifier returned to the client
+        kind: Type of ingestion ("pdf" or "url")
+        source: Filename or URL being ingested
+        status: One of queued, running, done, error
+        stage: Current pipeline stage (extract, chunk, embed, store)
+        stages: Per-stage progress information, with the times each stage
+            started and finished
+        result: Final response payload once the job is done
+        error: Error message if the job failed
+    """
+
+    def __init__(self, kind: str, source: str, notebook_id: Optional[str] = None):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.source = source
+        self.notebook_id = notebook_id
+        self.status = "queued"
+        self.stage: Optional[str] = None
+        self.stages: Dict[str, Dict[str, Any]] = {
+            name: {"status": "pending", "done": 0, "total": None, "started_at": None, "finished_at": None}
+            for name in STAGES
+        }
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start_stage(self, stage: str, total: Optional[int] = None):
+        """Mark a stage as running, completing any stage still marked running."""
+        with self._lock:
+            now = time.time()
+            for info in self.stages.values():
+                if info["status"] == "running":
+                    info.update({"status": "done", "finished_at": now})
+            self.stage = stage
+            self.stages[stage].update({"status": "running", "total": total})
+            if self.stages[stage]["started_at"] is None:
+                self.stages[stage]["started_at"] = now
+
+    def advance(self, stage: str, done: int = 1, total: Optional[int] = None):
+        """Record progress within a stage.
+
+        Stages may overlap (pages are chunked and embedded while later pages
+        are still being extracted), so progress is tracked per stage.
+        """
+        with self._lock:
+            info = self.stages[stage]
+            if info["status"] == "pending":
+                info.update({"status": "running", "started_at": time.time()})
+            info["done"] += done
+            if total is not None:
+                info["total"] = total
+
+    def finish(self, result: Dict[str, Any]):
+        with self._lock:
+            self.finished_at = time.time()
+            for info in self.stages.values():
+                if info["status"] == "running":
+                    info.update({"status": "done", "finished_at": self.finished_at})
+            self.status = "done"
+            self.stage = None
+            self.result = result
+
+    def fail(self, error: str):
+        with self._lock:
+            if self.stage:
+                self.stages[self.stage]["status"] = "error"
+            self.status = "error"
+            self.error = error
+            self.finished_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "kind": self.kind,
+                "source": self.source,
+                "notebook_id": self.notebook_id,
+                "status": self.status,
+                "stage": self.stage,
+                "stages": {name: dict(info) for name, info in self.stages.items()},
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobBoard:
+    """Latest snapshot of every job, shared by all API workers.
+
+    Hosted by the model server in multi-worker deployments so that
+    /jobs/{job_id} works whichever worker the poll lands on, not only the
+    one that accepted the upload.
+    """
+
+    def __init__(self, retention_seconds: int = config.JOB_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, snapshot: Dict[str, Any]):
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            self._snapshots[snapshot["job_id"]] = snapshot
+            expired = [
+                job_id for job_id, job in self._snapshots.items()
+                if job["finished_at"] is not None and job["finished_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._snapshots[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._snapshots.get(job_id)
+
+
+class JobManager:
+    """Runs ingestion jobs off the request path on bounded worker pools.
+
+    Jobs are coroutines scheduled on the event loop; their blocking stages are
+    pushed onto a thread pool (network I/O, embedding, vector store writes) or
+    a process pool (CPU-bound PDF parsing) so the loop keeps serving requests.
+
+    When a shared ``board`` is given, job progress is also published to it
+    so other API workers can report on this worker's jobs.
+    """
+
+    def __init__(
+        self,
+        thread_workers: int = config.INGEST_THREAD_WORKERS,
+        process_workers: int = config.INGEST_PROCESS_WORKERS,
+        max_concurrent: int = config.MAX_CONCURRENT_JOBS,
+        max_pending: int = config.MAX_PENDING_JOBS,
+        retention_seconds: int = config.JOB_RETENTION_SECONDS,
+        board: Optional[JobBoard] = None,
+    ):
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.board = board
+        self.jobs: Dict[str, IngestJob] = {}
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self.thread_workers, thread_name_prefix="ingest"
+                )
+            return self._thread_pool
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self.process_workers)
+            return self._process_pool
+
+    async def run_in_thread(self, fn: Callable, *args):
+        """Run a blocking callable on the ingestion thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread_pool, fn, *args)
+
+    async def run_in_process(self, fn: Callable, *args):
+        """Run a CPU-bound, picklable callable on the ingestion process pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.process_pool, fn, *args)
+
+    def pending_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status in ("queued", "running"))
+
+    def submit(self, job: IngestJob, work: Callable[[IngestJob], Awaitable[Dict[str, Any]]]) -> IngestJob:
+        """Schedule a job on the running event loop and return it immediately.
+
+        Args:
+            job: Job record to track progress on
+            work: Coroutine function that performs the ingestion and returns the result payload
+
+        Raises:
+            JobQueueFullError: If too many jobs are already queued or running
+        """
+        return self.submit_all([(job, work)])[0]
+
+    def submit_all(self, entries: List[Tuple[IngestJob, Callable[[IngestJob], Awaitable[Dict[str, Any]]]]]) -> List[IngestJob]:
+        """Schedule several jobs at once, all or none.
+
+        Args:
+            entries: (job record, coroutine function) pairs, as for submit
+
+        Raises:
+            JobQueueFullError: If the queue has no room for every job; none is scheduled
+        """
+        self._prune()
+        if self.pending_count() + len(entries) > self.max_pending:
+            raise JobQueueFullError("Ingestion queue is full, please retry shortly.")
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return [self._start(job, work) for job, work in entries]
+
+    def _start(self, job: IngestJob, work: Callable[[IngestJob], Awaitable[Dict[str, Any]]]) -> IngestJob:
+        self.jobs[job.job_id] = job
+        # The job outlives the upload request; its spans are the job's own.
+        task = create_untraced_task(self._run(job, work))
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.job_id, None))
+        return job
+
+    async def _run(self, job: IngestJob, work: Callable[[IngestJob], Awaitable[Dict[str, Any]]]):
+        publisher = None
+        if self.board is not None:
+            await self._publish(job)
+            publisher = asyncio.create_task(self._publish_progress(job))
+        try:
+            async with self._semaphore:
+                job.status = "running"
+                try:
+                    result = await work(job)
+                    job.finish(result)
+                    self._observe_stages(job)
+                except Exception as e:
+                    print(f"Ingestion job {job.job_id} ({job.source}) failed: {e}")
+                    job.fail(str(e))
+        finally:
+            if publisher is not None:
+                publisher.cancel()
+                await self._publish(job)
+
+    @staticmethod
+    def _observe_stages(job: IngestJob):
+        """Record a finished job's stage durations and total time in the stage histogram."""
+        for name, info in job.stages.items():
+            if info["started_at"] is not None and info["finished_at"] is not None:
+                observe(f"ingest_{name}", info["finished_at"] - info["started_at"])
+        observe(f"ingest_{job.kind}_total", job.finished_at - job.created_at)
+
+    async def _publish(self, job: IngestJob):
+        try:
+            await self.run_in_thread(self.board.publish, job.to_dict())
+        except Exception as e:
+            print(f"Could not publish progress of job {job.job_id}: {e}")
+
+    async def _publish_progress(self, job: IngestJob):
+        while True:
+            await asyncio.sleep(PUBLISH_INTERVAL_SECONDS)
+            await self._publish(job)
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job's progress, looking it up on the shared board if another worker owns it."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.board is not None:
+            return self.board.get(job_id)
+        return None
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def shutdown(self):
+        """Stop the worker pools, used on application shutdown."""
+        with self._lock:
+            if self._thread_pool is not None:
+                self._thread_pool.shutdown(wait=False, cancel_futures=True)
+                self._thread_pool = None
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False, cancel_futures=True)
+                self._process_pool = None
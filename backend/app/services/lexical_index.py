@@ -0,0 +1,189 @@
+import os
+import re
+import math
+import pickle
+import threading
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Keeps dotted/hyphenated terms such as "3.2", "k-means" or "h2o" intact.
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._\-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into index terms."""
+    return TOKEN_RE.findall(text.lower())
+
+
+class LexicalIndex:
+    """In-process BM25 inverted index over document chunks.
+
+    Postings are stored per term as a flat ``array('I')`` of interleaved
+    (document number, term frequency) pairs, which keeps them compact in
+    memory and on disk. Chunks are added and removed incrementally as
+    documents are ingested; removals are applied per batch, so each
+    affected posting list is rewritten once however many chunks of a
+    document change. The whole index is pickled next to the vector store.
+
+    Attributes:
+        path: File the index is persisted to
+        k1: BM25 term-frequency saturation parameter
+        b: BM25 length normalization parameter
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, array] = {}
+        # docno -> (chunk id, length, notebook_id, source, unique terms)
+        self._docs: Dict[int, Tuple[str, int, Optional[str], Optional[str], Tuple[str, ...]]] = {}
+        self._docnos: Dict[str, int] = {}
+        self._next_docno = 0
+        self._total_length = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") != self.VERSION:
+                print("Lexical index format changed, starting empty.")
+                return
+            self._postings = state["postings"]
+            self._docs = state["docs"]
+            self._next_docno = state["next_docno"]
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError) as e:
+            print(f"Could not load lexical index, starting empty: {e}")
+            return
+        self._docnos = {doc[0]: docno for docno, doc in self._docs.items()}
+        self._total_length = sum(doc[1] for doc in self._docs.values())
+
+    def save(self):
+        """Persist the index if it changed since the last save."""
+        with self._lock:
+            if not self._dirty:
+                return
+            state = {
+                "version": self.VERSION,
+                "postings": self._postings,
+                "docs": self._docs,
+                "next_docno": self._next_docno,
+            }
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def _remove_docnos(self, docnos: Iterable[int]):
+        """Drop documents from the index, rewriting each affected posting list once."""
+        removed = set()
+        terms = set()
+        for docno in docnos:
+            doc = self._docs.pop(docno, None)
+            if doc is None:
+                continue
+            chunk_id, length, _, _, doc_terms = doc
+            del self._docnos[chunk_id]
+            self._total_length -= length
+            removed.add(docno)
+            terms.update(doc_terms)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            kept = array("I")
+            for i in range(0, len(postings), 2):
+                if postings[i] not in removed:
+                    kept.append(postings[i])
+                    kept.append(postings[i + 1])
+            if kept:
+                self._postings[term] = kept
+            else:
+                del self._postings[term]
+        if removed:
+            self._dirty = True
+
+    def upsert(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]):
+        """Index chunks, replacing any previous version of the same ids."""
+        with self._lock:
+            self._remove_docnos([self._docnos[chunk_id] for chunk_id in ids if chunk_id in self._docnos])
+            for chunk_id, text, meta in zip(ids, texts, metadatas):
+                if chunk_id in self._docnos:
+                    # Repeated within the batch: the last version wins.
+                    self._remove_docnos([self._docnos[chunk_id]])
+                terms = tokenize(text)
+                counts = Counter(terms)
+                docno = self._next_docno
+                self._next_docno += 1
+                self._docs[docno] = (chunk_id, len(terms), meta.get("notebook_id"), meta.get("source"), tuple(counts))
+                self._docnos[chunk_id] = docno
+                self._total_length += len(terms)
+                for term, tf in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = array("I")
+                    postings.append(docno)
+                    postings.append(tf)
+            self._dirty = True
+
+    def delete(self, ids: List[str]):
+        """Remove chunks from the index."""
+        with self._lock:
+            self._remove_docnos([self._docnos[chunk_id] for chunk_id in ids if chunk_id in self._docnos])
+
+    def delete_source(self, notebook_id: str, source: str):
+        """Remove every chunk of a document in a notebook, whatever its id."""
+        with self._lock:
+            self._remove_docnos([docno for docno, doc in self._docs.items() if doc[2] == notebook_id and doc[3] == source])
+
+    def search(self, query: str, k: int, notebook_id: Optional[str] = None, source: Optional[str] = None) -> List[Tuple[str, float, Optional[str]]]:
+        """Rank chunks against a query with BM25.
+
+        Args:
+            query: Free-text query
+            k: Maximum number of results
+            notebook_id: Restrict results to one notebook
+            source: Restrict results to one document
+
+        Returns:
+            List of (chunk id, score, notebook id) tuples, best first
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._docs)
+            if not terms or not n_docs:
+                return []
+            avg_length = self._total_length / n_docs
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                df = len(postings) // 2
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for i in range(0, len(postings), 2):
+                    docno, tf = postings[i], postings[i + 1]
+                    doc = self._docs[docno]
+                    if notebook_id and doc[2] != notebook_id:
+                        continue
+                    if source and doc[3] != source:
+                        continue
+                    norm = tf + self.k1 * (1 - self.b + self.b * doc[1] / avg_length)
+                    scores[docno] = scores.get(docno, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [(self._docs[docno][0], score, self._docs[docno][2]) for docno, score in ranked]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"chunks": len(self._docs), "terms": len(self._postings)}
@@ -0,0 +1,194 @@
+import os
+import queue
+import ipaddress
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable, Collection, Dict, Tuple, Union
+
+Address = Union[str, Tuple[str, int]]
+
+
+class ModelServerError(RuntimeError):
+    """Raised when the model server can't be reached or a call to it fails."""
+
+
+def parse_address(address: str) -> Address:
+    """Turn EMBEDDING_SERVER_ADDRESS into a multiprocessing.connection address.
+
+    "host:port" is a TCP address; anything else is a Unix socket path (or a
+    named pipe such as ``\\\\.\\pipe\\smartstudy`` on Windows).
+
+    Requests are unpickled by the server, so TCP is only allowed on a
+    loopback host; use a Unix socket to share the server between containers.
+
+    Raises:
+        ValueError: If the address is TCP on a non-loopback host
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and not address.startswith(("/", "\\\\")):
+        host = host.strip("[]") or "127.0.0.1"
+        if host != "localhost":
+            try:
+                loopback = ipaddress.ip_address(host).is_loopback
+            except ValueError:
+                loopback = False
+            if not loopback:
+                raise ValueError(f"Model server address {address!r} is not a loopback host or a Unix socket path.")
+        return (host, int(port))
+    return address
+
+
+def _address_family(address: Address) -> str:
+    if isinstance(address, tuple):
+        return "AF_INET"
+    if address.startswith("\\\\"):
+        return "AF_PIPE"
+    return "AF_UNIX"
+
+
+class ModelServer:
+    """Serves the embedding model and the stores over a local socket.
+
+    One server process owns the SentenceTransformer model, the Chroma
+    client, the lexical index, the embedding cache and the document
+    registry. API workers call them through ``RemoteService`` proxies, so
+    running several uvicorn workers neither loads the model once per
+    worker nor has several processes writing to ``chroma.sqlite3``.
+
+    Each client connection is served on its own thread. Requests are
+    ``(target, method, args, kwargs)`` tuples; replies are ``("ok", value)``
+    or ``("error", exception)``. Only the methods listed for a target in
+    ``methods`` can be called.
+
+    Attributes:
+        address: Socket path or (host, port) the server listens on
+        targets: Name -> object served under that name
+        methods: Name -> methods of the target that clients may call
+    """
+
+    def __init__(self, address: Address, authkey: bytes, targets: Dict[str, Any], methods: Dict[str, Collection[str]]):
+        if not authkey:
+            raise ValueError("The model server needs a non-empty authkey.")
+        self.address = address
+        self.authkey = authkey
+        self.targets = targets
+        self.methods = {name: frozenset(allowed) for name, allowed in methods.items()}
+        self._listener = None
+
+    def serve_forever(self):
+        family = _address_family(self.address)
+        if family == "AF_UNIX" and os.path.exists(self.address):
+            # Left behind by a previous server that didn't shut down cleanly.
+            os.unlink(self.address)
+        self._listener = Listener(self.address, family=family, authkey=self.authkey)
+        print(f"Model server listening on {self.address}")
+        try:
+            while True:
+                try:
+                    conn = self._listener.accept()
+                except (OSError, EOFError, AuthenticationError) as e:
+                    if self._listener is None:
+                        break
+                    print(f"Model server rejected a connection: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+
+    def _dispatch(self, target: str, method: str, args, kwargs) -> Any:
+        obj = self.targets.get(target)
+        if obj is None:
+            raise KeyError(f"Unknown model server target '{target}'")
+        if method not in self.methods.get(target, ()):
+            raise AttributeError(f"'{target}.{method}' can't be called remotely")
+        return getattr(obj, method)(*args, **kwargs)
+
+    def _serve_connection(self, conn: Connection):
+        with conn:
+            while True:
+                try:
+                    target, method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self._dispatch(target, method, args, kwargs))
+                except Exception as e:
+                    reply = ("error", e)
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    # The result or exception didn't pickle; report it as text.
+                    conn.send(("error", ModelServerError(f"{target}.{method}: {e!r}")))
+
+
+class ModelServerClient:
+    """Pool of connections from one API worker to the model server.
+
+    ``Connection`` objects aren't safe to share between threads, so each
+    call borrows one from the pool for its request/reply round trip and
+    opens a new one if none is idle.
+    """
+
+    def __init__(self, address: Address, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._idle: "queue.LifoQueue[Connection]" = queue.LifoQueue()
+
+    def _connect(self) -> Connection:
+        try:
+            return Client(self.address, family=_address_family(self.address), authkey=self.authkey)
+        except OSError as e:
+            raise ModelServerError(f"Could not connect to model server at {self.address}: {e}") from e
+
+    def call(self, target: str, method: str, *args, **kwargs) -> Any:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            conn.send((target, method, args, kwargs))
+            status, value = conn.recv()
+        except (EOFError, OSError) as e:
+            conn.close()
+            raise ModelServerError(f"Lost connection to model server during {target}.{method}: {e}") from e
+        self._idle.put(conn)
+        if status == "error":
+            raise value
+        return value
+
+    def service(self, target: str) -> "RemoteService":
+        return RemoteService(self, target)
+
+
+class RemoteService:
+    """Stands in for a service object hosted by the model server.
+
+    Attribute access returns a function that runs the method remotely, so
+    ``remote.encode(texts)`` behaves like ``embedder.encode(texts)``.
+    Only methods are proxied; arguments and results must be picklable.
+    """
+
+    def __init__(self, client: ModelServerClient, target: str):
+        self._client = client
+        self._target = target
+
+    def __getattr__(self, method: str) -> Callable[..., Any]:
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def call(*args, **kwargs):
+            return self._client.call(self._target, method, *args, **kwargs)
+
+        call.__name__ = method
+        return call
+
+    def __repr__(self) -> str:
+        return f"<RemoteService {self._target} at {self._client.address}>"
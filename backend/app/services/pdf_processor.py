@@ -1,35 +1,86 @@
-import tempfile
-import os
+import io
+import mmap
+import asyncio
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import AsyncIterator, List, Tuple, Union
+
 import PyPDF2
 
-def extract_pdf_text(pdf_bytes: bytes) -> str:
-    """Extract text content from PDF file bytes.
-    
-    Creates a temporary file to process the PDF and extracts text from
-    all pages. Cleans up the temporary file after processing.
-    
+# A PDF source is either a path on disk (memory-mapped) or the raw bytes.
+PdfSource = Union[str, bytes]
+
+PAGES_PER_TASK = 8
+
+
+@contextmanager
+def _open_reader(source: PdfSource):
+    """Open a PdfReader over a memory-mapped file or an in-memory buffer."""
+    if isinstance(source, (bytes, bytearray)):
+        yield PyPDF2.PdfReader(io.BytesIO(source))
+        return
+
+    with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        yield PyPDF2.PdfReader(buffer)
+
+
+def count_pdf_pages(source: PdfSource) -> int:
+    """Return the number of pages in a PDF.
+
+    Args:
+        source: Path to the PDF file or its content as bytes
+    """
+    with _open_reader(source) as reader:
+        return len(reader.pages)
+
+
+def extract_page_range(source: PdfSource, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract text from pages [start, end) of a PDF.
+
+    Runs in a worker process, so it re-opens the source itself rather than
+    receiving a parsed reader.
+
     Args:
-        pdf_bytes: PDF file content as bytes
-        
+        source: Path to the PDF file or its content as bytes
+        start: Index of the first page to extract (0-based)
+        end: Index one past the last page to extract
+
     Returns:
-        Extracted text from all PDF pages
+        List of (page_number, text) tuples with 1-based page numbers
     """
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        try:
-            tmp.write(pdf_bytes)
-            tmp_path = tmp.name
-        finally:
-            tmp.close()
+    pages = []
+    with _open_reader(source) as reader:
+        for index in range(start, min(end, len(reader.pages))):
+            txt = reader.pages[index].extract_text() or ""
+            pages.append((index + 1, txt))
+    return pages
+
+
+def _page_ranges(page_count: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
 
+
+async def aiter_pdf_pages(source: PdfSource, executor: Executor, page_count: int, pages_per_task: int = PAGES_PER_TASK) -> AsyncIterator[Tuple[int, str]]:
+    """Yield (page_number, text) for every page, in page order, without blocking the event loop.
+
+    Page ranges are extracted in parallel on the executor, and pages are
+    yielded as soon as their range (and every range before it) is done.
+
+    Args:
+        source: Path to the PDF file or its content as bytes
+        executor: Executor (typically a process pool) to parallelize extraction
+        page_count: Number of pages in the PDF, from count_pdf_pages
+        pages_per_task: Number of pages extracted per task
+    """
+    loop = asyncio.get_running_loop()
+    futures = [
+        loop.run_in_executor(executor, extract_page_range, source, start, end)
+        for start, end in _page_ranges(page_count, pages_per_task)
+    ]
     try:
-        reader = PyPDF2.PdfReader(tmp_path)
-        full_text = ""
-
-        for page in reader.pages:
-            txt = page.extract_text()
-            if txt:
-                full_text += txt + "\\n"
-        return full_text
+        for future in futures:
+            for page in await future:
+                yield page
     finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,182 @@
+import os
+import json
+import random
+import hashlib
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.services.answer_cache import normalize_question
+from app.services.document_registry import document_key
+
+# (notebook filter, document filter, difficulty)
+ServedScope = Tuple[Optional[str], Optional[str], str]
+
+
+class QuestionBank:
+    """Pre-generated quiz questions per document section and difficulty.
+
+    After a document is ingested, a background job splits its chunks into
+    sections and stores a pool of validated questions for each section and
+    difficulty. A quiz request then samples from the sections its retrieved
+    chunks fall in instead of asking the LLM for every question.
+
+    Each document's bank is one JSON file under ``root``, rewritten
+    atomically when the document is re-ingested. Files are re-read when
+    they change on disk, so every API worker sees banks built by any other.
+
+    Questions already served for a scope (notebook, document filter,
+    difficulty) are skipped until the scope's pool is used up.
+
+    Attributes:
+        root: Directory holding one JSON file per document
+        max_served_scopes: Number of scopes whose served questions are remembered
+    """
+
+    def __init__(self, root: str, max_served_scopes: int = 512):
+        self.root = root
+        self.max_served_scopes = max_served_scopes
+        # doc_key -> (file mtime, bank)
+        self._banks: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._served: "OrderedDict[ServedScope, Set[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, doc_key: str) -> str:
+        digest = hashlib.sha1(doc_key.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, f"{digest}.json")
+
+    def _load(self, doc_key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(doc_key)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            self._banks.pop(doc_key, None)
+            return None
+        cached = self._banks.get(doc_key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                bank = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not load question bank for {doc_key}: {e}")
+            return None
+        self._banks[doc_key] = (mtime, bank)
+        return bank
+
+    def put(self, doc_key: str, bank: Dict[str, Any]):
+        """Store a document's bank, replacing the previous one.
+
+        Args:
+            doc_key: Registry key of the document
+            bank: {"source", "notebook_id", "sections": [{"start", "end",
+                "questions": {difficulty: [question, ...]}}, ...]} with sections
+                ordered by their first chunk index
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(doc_key)
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(bank, f)
+            os.replace(tmp_path, path)
+            self._banks.pop(doc_key, None)
+
+    def has(self, doc_key: str) -> bool:
+        return os.path.exists(self._path(doc_key))
+
+    def remove(self, doc_key: str):
+        """Drop a document's bank, e.g. because its content changed."""
+        with self._lock:
+            self._banks.pop(doc_key, None)
+            try:
+                os.remove(self._path(doc_key))
+            except FileNotFoundError:
+                pass
+
+    def sample(self, scope: ServedScope, metadatas: List[Dict[str, Any]], difficulty: str, k: int) -> List[Dict[str, Any]]:
+        """Pick up to k banked questions for the sections of the retrieved chunks.
+
+        Sections are visited in the rank order of their best retrieved chunk
+        and questions are taken round-robin across them, so the quiz covers
+        the most relevant material first. Picked questions are marked as served.
+
+        Args:
+            scope: (notebook filter, document filter, difficulty) of the request
+            metadatas: Metadata of the retrieved chunks, best first
+            difficulty: Requested difficulty
+            k: Maximum number of questions
+
+        Returns:
+            Questions in the QuizQuestion format
+        """
+        if k <= 0:
+            return []
+        with self._lock:
+            pools = []
+            seen_sections = set()
+            for meta in metadatas:
+                index = meta.get("chunk_index")
+                if index is None or not meta.get("source"):
+                    continue
+                doc_key = document_key(meta["source"], meta.get("notebook_id"))
+                bank = self._load(doc_key)
+                if not bank or not bank.get("sections"):
+                    continue
+                sections = bank["sections"]
+                position = bisect_right([section["start"] for section in sections], index) - 1
+                if position < 0 or (doc_key, position) in seen_sections:
+                    continue
+                seen_sections.add((doc_key, position))
+                pool = list(sections[position]["questions"].get(difficulty, []))
+                random.shuffle(pool)
+                if pool:
+                    pools.append(pool)
+
+            served = self._served.get(scope, set())
+            available = sum(1 for pool in pools for q in pool if normalize_question(q["questionText"]) not in served)
+            if available == 0:
+                # Everything relevant has been served; start the rotation again.
+                served = set()
+
+            picked = []
+            while pools and len(picked) < k:
+                for pool in list(pools):
+                    while pool:
+                        question = pool.pop()
+                        key = normalize_question(question["questionText"])
+                        if key not in served:
+                            served.add(key)
+                            picked.append(question)
+                            break
+                    if not pool:
+                        pools.remove(pool)
+                    if len(picked) >= k:
+                        break
+
+            self._remember(scope, served)
+            return picked
+
+    def mark_served(self, scope: ServedScope, questions: List[Dict[str, Any]]):
+        """Record freshly generated questions as served for a scope."""
+        with self._lock:
+            served = self._served.get(scope, set())
+            served.update(normalize_question(q["questionText"]) for q in questions)
+            self._remember(scope, served)
+
+    def served(self, scope: ServedScope) -> Set[str]:
+        """Normalized texts of the questions already served for a scope."""
+        with self._lock:
+            return set(self._served.get(scope, ()))
+
+    def _remember(self, scope: ServedScope, served: Set[str]):
+        self._served[scope] = served
+        self._served.move_to_end(scope)
+        while len(self._served) > self.max_served_scopes:
+            self._served.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            files = [name for name in os.listdir(self.root) if name.endswith(".json")] if os.path.isdir(self.root) else []
+            return {"documents": len(files), "served_scopes": len(self._served)}
@@ -0,0 +1,149 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.services.answer_cache import normalize_question
+
+
+class Reranker:
+    """Reorders retrieved chunks by cross-encoder relevance to the question.
+
+    All uncached (question, chunk) pairs of a request are scored in one
+    ``score_fn`` call, i.e. one batched forward pass. Scores are cached per
+    normalized question and chunk id (and re-computed if the chunk's text
+    changed), so a repeated or follow-up question only scores new chunks.
+
+    Forward passes run one at a time on the reranker's own thread, so they
+    neither fight over the CPU nor take threads from the default executor.
+    ``rerank`` gives up after ``timeout_ms`` and returns None, so callers
+    can keep their first-stage order. A pass already running still finishes
+    and fills the cache for the next request, but a call whose deadline
+    passed while it waited for the thread is skipped without scoring.
+
+    Attributes:
+        max_entries: Number of cached scores
+        timeout_ms: Latency budget of one rerank call (0 for none)
+        hits: Scores served from the cache
+        misses: Scores computed by the model
+        batches: Forward passes made
+        timeouts: Rerank calls that ran out of budget
+        skipped: Timed-out calls dropped before their forward pass
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[List[Tuple[str, str]]], Sequence[float]],
+        max_entries: int = 8192,
+        timeout_ms: float = 500.0,
+    ):
+        self.score_fn = score_fn
+        self.max_entries = max_entries
+        self.timeout_ms = timeout_ms
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.timeouts = 0
+        self.skipped = 0
+        # (normalized question, chunk id) -> (hash of the chunk text, score)
+        self._scores: "OrderedDict[Tuple[str, str], Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One forward pass at a time; concurrent passes only fight over the CPU.
+        self._model_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+            return self._executor
+
+    def _expired(self, deadline: Optional[float]) -> bool:
+        if deadline is None or time.monotonic() < deadline:
+            return False
+        with self._lock:
+            self.skipped += 1
+        return True
+
+    def score(self, question: str, ids: List[str], documents: List[str], deadline: Optional[float] = None) -> Optional[List[float]]:
+        """Cross-encoder scores of the chunks for a question, higher is more relevant.
+
+        Args:
+            question: Question the chunks are scored against
+            ids: Chunk ids, for the cache
+            documents: Chunk texts
+            deadline: time.monotonic() after which the forward pass isn't worth running
+
+        Returns:
+            One score per chunk, or None if the deadline passed before scoring
+        """
+        query = normalize_question(question)
+        scores: Dict[int, float] = {}
+        with self._lock:
+            for index, (chunk_id, document) in enumerate(zip(ids, documents)):
+                cached = self._scores.get((query, chunk_id))
+                if cached and cached[0] == hash(document):
+                    self._scores.move_to_end((query, chunk_id))
+                    scores[index] = cached[1]
+            self.hits += len(scores)
+
+        missing = [index for index in range(len(ids)) if index not in scores]
+        if missing:
+            if self._expired(deadline):
+                return None
+            with self._model_lock:
+                if self._expired(deadline):
+                    return None
+                computed = self.score_fn([(question, documents[index]) for index in missing])
+            with self._lock:
+                self.misses += len(missing)
+                self.batches += 1
+                for index, value in zip(missing, computed):
+                    scores[index] = float(value)
+                    self._scores[(query, ids[index])] = (hash(documents[index]), float(value))
+                while len(self._scores) > self.max_entries:
+                    self._scores.popitem(last=False)
+        return [scores[index] for index in range(len(ids))]
+
+    async def rerank(self, question: str, ids: List[str], documents: List[str]) -> Optional[List[int]]:
+        """Indices of the chunks ordered by score, best first, or None if over budget.
+
+        Scoring runs on the reranker's thread so the event loop is never blocked.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self.timeout_ms / 1000 if self.timeout_ms > 0 else None
+        pending = loop.run_in_executor(self.executor, self.score, question, ids, documents, deadline)
+        try:
+            if deadline is not None:
+                # A pass already running when this times out still fills the cache.
+                scores = await asyncio.wait_for(pending, self.timeout_ms / 1000)
+            else:
+                scores = await pending
+        except asyncio.TimeoutError:
+            scores = None
+        if scores is None:
+            with self._lock:
+                self.timeouts += 1
+            return None
+        return sorted(range(len(ids)), key=lambda index: scores[index], reverse=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._scores),
+                "hits": self.hits,
+                "misses": self.misses,
+                "batches": self.batches,
+                "timeouts": self.timeouts,
+                "skipped": self.skipped,
+            }
+
+    def shutdown(self):
+        """Stop the scoring thread, used on application shutdown."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,169 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core import config, services
+from app.core.metrics import span
+
+RETRIEVAL_MODES = ("hybrid", "vector", "keyword")
+
+# Standard RRF constant; damps the influence of any single ranking's top ranks.
+RRF_K = 60
+CANDIDATE_MULTIPLIER = 2
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    """Fuse several ranked id lists into one ranking by reciprocal rank.
+
+    Args:
+        rankings: Lists of ids, each ordered best first
+        k: RRF smoothing constant
+
+    Returns:
+        Ids ordered by fused score, best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def _empty(embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+    return {"ids": [], "documents": [], "metadatas": [], "embedding": embedding}
+
+
+async def _vector_search(question: str, n: int, notebook_id: Optional[str], source: Optional[str]):
+    with span("embed_query"):
+        q_embed = await services.get_query_embedder().embed(question)
+    with span("vector_query"):
+        results = await run_in_threadpool(
+            services.get_vector_store().query, [q_embed], n, notebook_id=notebook_id, source=source
+        )
+    return results, q_embed
+
+
+def _lexical_search(question: str, n: int, notebook_id: Optional[str], source: Optional[str]):
+    with span("keyword_query"):
+        return services.get_lexical_index().search(question, n, notebook_id, source)
+
+
+def _fetch_chunks(hits: Dict[str, Optional[str]]) -> Dict[str, Dict[str, Any]]:
+    """Load chunk text and metadata by id, grouped by the notebook that stores them."""
+    store = services.get_vector_store()
+    by_notebook: Dict[Optional[str], List[str]] = {}
+    for chunk_id, notebook_id in hits.items():
+        by_notebook.setdefault(notebook_id, []).append(chunk_id)
+
+    chunks = {}
+    for notebook_id, ids in by_notebook.items():
+        found = store.get(notebook_id, ids)
+        for chunk_id, document, meta in zip(found["ids"], found["documents"], found["metadatas"]):
+            chunks[chunk_id] = {"document": document, "metadata": meta or {}}
+    return chunks
+
+
+async def _rerank(question: str, results: Dict[str, Any], n_results: int) -> Dict[str, Any]:
+    with span("rerank", candidates=len(results["ids"])) as fields:
+        order = await services.get_reranker().rerank(question, results["ids"], results["documents"])
+        fields["timed_out"] = order is None
+    # Over the latency budget: keep the first-stage order.
+    order = (order if order is not None else list(range(len(results["ids"]))))[:n_results]
+    return {
+        "ids": [results["ids"][i] for i in order],
+        "documents": [results["documents"][i] for i in order],
+        "metadatas": [results["metadatas"][i] for i in order],
+        "embedding": results["embedding"],
+    }
+
+
+async def retrieve(
+    question: str,
+    n_results: int,
+    notebook_id: Optional[str] = None,
+    source: Optional[str] = None,
+    mode: str = "hybrid",
+    rerank: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """Retrieve the chunks most relevant to a question.
+
+    Modes:
+    - ``vector``: MiniLM embedding search only
+    - ``keyword``: BM25 over the lexical index only; never touches the embedder
+    - ``hybrid``: both searches run concurrently and are fused with reciprocal rank fusion
+
+    With reranking, the search fetches RERANK_CANDIDATES chunks and the
+    cross-encoder picks the best n_results of them.
+
+    Args:
+        question: The user's question or quiz topic
+        n_results: Number of chunks to return
+        notebook_id: Optional notebook to scope retrieval to
+        source: Optional document to scope retrieval to
+        mode: One of "hybrid", "vector" or "keyword"
+        rerank: Rerank the candidates with the cross-encoder (default RERANK_ENABLED)
+
+    Returns:
+        dict: Parallel "ids", "documents" and "metadatas" lists, best first,
+        plus the query "embedding" (None in keyword mode)
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}'. Expected one of: {', '.join(RETRIEVAL_MODES)}")
+
+    if rerank is None:
+        rerank = config.RERANK_ENABLED
+    if not rerank:
+        return await _search(question, n_results, notebook_id, source, mode)
+
+    results = await _search(question, max(n_results, config.RERANK_CANDIDATES), notebook_id, source, mode)
+    if len(results["ids"]) <= 1:
+        return results
+    return await _rerank(question, results, n_results)
+
+
+async def _search(question: str, n_results: int, notebook_id: Optional[str], source: Optional[str], mode: str) -> Dict[str, Any]:
+    """First-stage retrieval in the given mode; see retrieve."""
+    n_candidates = n_results * CANDIDATE_MULTIPLIER if mode == "hybrid" else n_results
+
+    if mode == "vector":
+        results, q_embed = await _vector_search(question, n_results, notebook_id, source)
+        if not results or not results["ids"] or not results["ids"][0]:
+            return _empty(q_embed)
+        return {
+            "ids": results["ids"][0],
+            "documents": results["documents"][0],
+            "metadatas": [meta or {} for meta in results["metadatas"][0]],
+            "embedding": q_embed,
+        }
+
+    lexical_search = run_in_threadpool(_lexical_search, question, n_candidates, notebook_id, source)
+    if mode == "keyword":
+        lexical_hits, results, q_embed = await lexical_search, None, None
+    else:
+        lexical_hits, (results, q_embed) = await asyncio.gather(
+            lexical_search, _vector_search(question, n_candidates, notebook_id, source)
+        )
+
+    chunks: Dict[str, Dict[str, Any]] = {}
+    vector_ranking: List[str] = []
+    if results and results["ids"] and results["ids"][0]:
+        for chunk_id, document, meta in zip(results["ids"][0], results["documents"][0], results["metadatas"][0]):
+            chunks[chunk_id] = {"document": document, "metadata": meta or {}}
+            vector_ranking.append(chunk_id)
+
+    lexical_ranking = [chunk_id for chunk_id, _, _ in lexical_hits]
+    ranked = reciprocal_rank_fusion([vector_ranking, lexical_ranking])[:n_results]
+
+    missing = {chunk_id: nb for chunk_id, _, nb in lexical_hits if chunk_id in ranked and chunk_id not in chunks}
+    if missing:
+        chunks.update(await run_in_threadpool(_fetch_chunks, missing))
+
+    # Chunks the index knows about but the store no longer has are dropped.
+    ranked = [chunk_id for chunk_id in ranked if chunk_id in chunks]
+    return {
+        "ids": ranked,
+        "documents": [chunks[chunk_id]["document"] for chunk_id in ranked],
+        "metadatas": [chunks[chunk_id]["metadata"] for chunk_id in ranked],
+        "embedding": q_embed,
+    }
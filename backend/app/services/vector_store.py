@@ -0,0 +1,115 @@
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+DEFAULT_COLLECTION = "docs"
+NOTEBOOK_COLLECTION_PREFIX = "nb-"
+
+
+def notebook_collection_name(notebook_id: Optional[str]) -> str:
+    """Return the Chroma collection holding a notebook's chunks in per-notebook mode.
+
+    Chunks without a notebook ("general") stay in the shared default collection.
+    Names are hashed because Chroma restricts collection names to a short
+    alphanumeric alphabet.
+    """
+    if not notebook_id or notebook_id == "general":
+        return DEFAULT_COLLECTION
+    digest = hashlib.sha1(notebook_id.encode("utf-8")).hexdigest()[:16]
+    return f"{NOTEBOOK_COLLECTION_PREFIX}{digest}"
+
+
+class VectorStore:
+    """Notebook-scoped access to the Chroma chunk collections.
+
+    In the default shared mode, every chunk lives in the single "docs"
+    collection and notebook scoping is a metadata filter. In per-notebook
+    mode, each notebook gets its own collection (and therefore its own HNSW
+    index), so query cost depends on the notebook's size rather than the
+    whole deployment.
+
+    Switching modes does not migrate existing chunks; re-ingest documents
+    after changing it.
+
+    Attributes:
+        client: Chroma client
+        per_notebook: Whether each notebook has its own collection
+    """
+
+    def __init__(self, client, per_notebook: bool = False):
+        self.client = client
+        self.per_notebook = per_notebook
+        self._collections: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def collection_for(self, notebook_id: Optional[str]):
+        """Return the collection that stores (or would store) a notebook's chunks."""
+        name = notebook_collection_name(notebook_id) if self.per_notebook else DEFAULT_COLLECTION
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self.client.get_or_create_collection(name)
+                self._collections[name] = collection
+            return collection
+
+    def _where(self, notebook_id: Optional[str], source: Optional[str]) -> Optional[Dict[str, Any]]:
+        clauses = []
+        if notebook_id and not self.per_notebook:
+            clauses.append({"notebook_id": notebook_id})
+        if source:
+            clauses.append({"source": source})
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {"$and": clauses}
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        notebook_id: Optional[str] = None,
+        source: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Search for the chunks nearest to the query embeddings.
+
+        Args:
+            query_embeddings: One or more query vectors
+            n_results: Number of chunks to return per query
+            notebook_id: Restrict results to one notebook (all notebooks if None in shared mode)
+            source: Restrict results to one document
+
+        Returns:
+            Chroma query results (ids, documents, metadatas, distances)
+        """
+        params = {"query_embeddings": query_embeddings, "n_results": n_results}
+        where = self._where(notebook_id, source)
+        if where:
+            params["where"] = where
+        return self.collection_for(notebook_id).query(**params)
+
+    def get(self, notebook_id: Optional[str], ids: List[str]) -> Dict[str, Any]:
+        """Fetch chunks by id from a notebook's collection."""
+        return self.collection_for(notebook_id).get(ids=ids)
+
+    def upsert(self, notebook_id: Optional[str], ids: List[str], documents: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]]):
+        self.collection_for(notebook_id).upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+
+    def delete(self, notebook_id: Optional[str], ids: Optional[List[str]] = None, source: Optional[str] = None):
+        """Delete chunks by id, or every chunk of a document in the notebook."""
+        collection = self.collection_for(notebook_id)
+        if ids is not None:
+            collection.delete(ids=ids)
+            return
+        where = self._where(notebook_id or "general", source)
+        if where:
+            collection.delete(where=where)
+
+    def count(self) -> int:
+        """Total number of chunks across all chunk collections."""
+        total = 0
+        for collection in self.client.list_collections():
+            name = collection if isinstance(collection, str) else collection.name
+            if name == DEFAULT_COLLECTION or name.startswith(NOTEBOOK_COLLECTION_PREFIX):
+                total += self.client.get_collection(name).count()
+        return total
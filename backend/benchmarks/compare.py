@@ -0,0 +1,94 @@
+"""Compare two benchmark reports written by benchmarks.run.
+
+Prints the change in latency percentiles and throughput from the baseline
+to the candidate, and exits with status 1 if any stage's p95 latency grew
+by more than --threshold percent (or throughput fell by more than that).
+
+Usage (from backend/):
+    python -m benchmarks.compare baseline.json candidate.json --threshold 15
+"""
+import sys
+import json
+import argparse
+from typing import Any, Dict, List, Optional
+
+
+def _change(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    if before is None or after is None or before == 0:
+        return None
+    return (after - before) / before * 100
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:,.2f}"
+
+
+def _fmt_change(change: Optional[float]) -> str:
+    return "" if change is None else f"{change:+.1f}%"
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float) -> List[str]:
+    """Print a comparison table and return the regressions found."""
+    regressions = []
+    print(f"baseline:  {baseline.get('commit')} ({baseline.get('created_at')})")
+    print(f"candidate: {candidate.get('commit')} ({candidate.get('created_at')})")
+    print()
+    print(f"{'latency (ms)':<24}{'p50':>22}{'p95':>22}{'p99':>22}")
+    stages = sorted(set(baseline.get("latency_ms", {})) | set(candidate.get("latency_ms", {})))
+    for stage in stages:
+        before = baseline.get("latency_ms", {}).get(stage, {})
+        after = candidate.get("latency_ms", {}).get(stage, {})
+        cells = []
+        for key in ("p50", "p95", "p99"):
+            change = _change(before.get(key), after.get(key))
+            cells.append(f"{_fmt(after.get(key))} {_fmt_change(change):>8}")
+            if key == "p95" and change is not None and change > threshold:
+                regressions.append(f"{stage} p95 {_fmt(before.get(key))} -> {_fmt(after.get(key))} ms ({_fmt_change(change)})")
+        print(f"{stage:<24}" + "".join(f"{cell:>22}" for cell in cells))
+
+    print()
+    print(f"{'throughput':<24}{'baseline':>22}{'candidate':>22}")
+    keys = sorted(set(baseline.get("throughput", {})) | set(candidate.get("throughput", {})))
+    for key in keys:
+        before = baseline.get("throughput", {}).get(key)
+        after = candidate.get("throughput", {}).get(key)
+        change = _change(before, after)
+        print(f"{key:<24}{_fmt(before):>22}{_fmt(after) + ' ' + _fmt_change(change):>22}")
+        if key.endswith("_per_second") and change is not None and change < -threshold:
+            regressions.append(f"{key} {_fmt(before)} -> {_fmt(after)} ({_fmt_change(change)})")
+
+    print()
+    rss_before = baseline.get("peak_rss_mb", {})
+    rss_after = candidate.get("peak_rss_mb", {})
+    for key in ("benchmark", "server"):
+        if rss_before.get(key) is not None or rss_after.get(key) is not None:
+            print(f"peak RSS {key:<15}{_fmt(rss_before.get(key)):>22}{_fmt(rss_after.get(key)):>22} MiB")
+    errors = candidate.get("errors") or {}
+    if errors:
+        print(f"candidate errors: {errors}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p95 / throughput change in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, "r", encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    regressions = compare(baseline, candidate, args.threshold)
+    if regressions:
+        print()
+        print(f"Regressions beyond {args.threshold}%:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Benchmark the ingestion and query paths with a synthetic corpus.
+
+Generates PDFs, uploads them through /upload_pdf, waits for their
+ingestion jobs, then sends /ask and /generate_quiz requests, all with a
+bounded number of requests in flight. Latency percentiles, ingestion
+throughput and peak RSS are written as JSON for benchmarks.compare.
+
+By default the app runs in-process on a throwaway data directory with the
+stub LLM backend, so a run needs no network and no API key. With --url the
+same load is sent to a running server instead; start it with
+LLM_BACKEND=stub to keep the LLM out of the numbers.
+
+Usage (from backend/):
+    python -m benchmarks.run --docs 8 --pages 20 --asks 200 --quizzes 20 --output bench.json
+    python -m benchmarks.run --url http://127.0.0.1:8000 --server-pid 4242 --output bench.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.synthetic import corpus, questions  # noqa: E402
+
+POLL_INTERVAL_SECONDS = 0.05
+INGEST_STAGES = ["extract", "chunk", "embed", "store"]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summarize latencies given in seconds as nearest-rank percentiles in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+        return round(ordered[index] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+class Recorder:
+    """Collects latency samples and error counts per named stage."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, name: str, seconds: float):
+        self.samples.setdefault(name, []).append(seconds)
+
+    def error(self, name: str, detail: str):
+        self.errors[name] = self.errors.get(name, 0) + 1
+        if self.errors[name] <= 3:
+            print(f"  {name} failed: {detail}")
+
+    def latency(self) -> Dict[str, Dict[str, float]]:
+        return {name: percentiles(samples) for name, samples in sorted(self.samples.items())}
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Peak resident set size of this process, or of pid (Linux only), in MiB."""
+    if pid is not None:
+        try:
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            return None
+        return None
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def git_commit() -> Dict[str, Any]:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip())
+        return {"commit": sha, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+async def _bounded(concurrency: int, jobs):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job):
+        async with semaphore:
+            return await job
+
+    return await asyncio.gather(*(run(job) for job in jobs))
+
+
+async def ingest_document(client, recorder: Recorder, filename: str, pdf: bytes, notebook_id: str, timeout: float) -> int:
+    """Upload one PDF, wait for its job and record its stage timings.
+
+    Returns:
+        Number of chunks the document was split into, 0 if ingestion failed
+    """
+    started = time.perf_counter()
+    response = await client.post(
+        "/upload_pdf", files={"pdf": (filename, pdf, "application/pdf")}, data={"notebook_id": notebook_id}
+    )
+    recorder.record("upload_pdf", time.perf_counter() - started)
+    if response.status_code != 202:
+        recorder.error("upload_pdf", f"HTTP {response.status_code}: {response.text[:200]}")
+        return 0
+    job_id = response.json()["job_id"]
+
+    deadline = time.monotonic() + timeout
+    while True:
+        job = (await client.get(f"/jobs/{job_id}")).json()
+        if job.get("status") in ("done", "error") or time.monotonic() > deadline:
+            break
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+    if job.get("status") != "done":
+        recorder.error("ingest", job.get("error") or f"job {job_id} still {job.get('status')} after {timeout}s")
+        return 0
+
+    recorder.record("ingest", job["finished_at"] - job["created_at"])
+    for stage in INGEST_STAGES:
+        info = job["stages"].get(stage, {})
+        if info.get("started_at") and info.get("finished_at"):
+            recorder.record(f"ingest.{stage}", info["finished_at"] - info["started_at"])
+    return job["result"].get("chunks", 0)
+
+
+async def ask(client, recorder: Recorder, question: str, notebook_id: str):
+    started = time.perf_counter()
+    response = await client.post("/ask", data={"question": question, "notebook_id": notebook_id})
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        recorder.error("ask", f"HTTP {response.status_code}: {response.text[:200]}")
+        return
+    recorder.record("ask.cached" if response.json().get("cached") else "ask", elapsed)
+
+
+async def generate_quiz(client, recorder: Recorder, topic: str, notebook_id: str, num_questions: int):
+    started = time.perf_counter()
+    response = await client.post(
+        "/generate_quiz",
+        json={"topic": topic, "notebook_id": notebook_id, "difficulty": "medium", "num_questions": num_questions},
+    )
+    elapsed = time.perf_counter() - started
+    body = response.json() if response.status_code == 200 else {}
+    if response.status_code != 200 or "error" in body:
+        recorder.error("generate_quiz", body.get("error") or f"HTTP {response.status_code}: {response.text[:200]}")
+        return
+    recorder.record("generate_quiz", elapsed)
+
+
+async def drive(client, args) -> Dict[str, Any]:
+    """Run the warm-up, ingestion, ask and quiz phases against one client."""
+    recorder = Recorder()
+    notebook_id = f"bench-{args.seed}"
+
+    if args.warmup:
+        print("Warming up...")
+        warm = Recorder()
+        await ingest_document(client, warm, "bench-warmup.pdf", corpus(1, 1, seed=args.seed + 1)[0][1], f"{notebook_id}-warmup", args.job_timeout)
+        await ask(client, warm, "What is a warm-up?", f"{notebook_id}-warmup")
+
+    print(f"Ingesting {args.docs} documents of {args.pages} pages...")
+    documents = corpus(args.docs, args.pages, seed=args.seed)
+    started = time.perf_counter()
+    chunk_counts = await _bounded(args.concurrency, [
+        ingest_document(client, recorder, filename, pdf, notebook_id, args.job_timeout) for filename, pdf in documents
+    ])
+    ingest_seconds = time.perf_counter() - started
+
+    print(f"Sending {args.asks} questions...")
+    # Every question is asked once unless --repeat-questions makes some of them answer cache hits.
+    unique = max(1, args.asks - int(args.asks * args.repeat_questions))
+    pool = questions(args.seed, unique)
+    started = time.perf_counter()
+    await _bounded(args.concurrency, [ask(client, recorder, pool[i % unique], notebook_id) for i in range(args.asks)])
+    ask_seconds = time.perf_counter() - started
+
+    print(f"Generating {args.quizzes} quizzes...")
+    topics = questions(args.seed + 2, max(1, args.quizzes))
+    started = time.perf_counter()
+    await _bounded(args.concurrency, [
+        generate_quiz(client, recorder, topics[i], notebook_id, args.quiz_questions) for i in range(args.quizzes)
+    ])
+    quiz_seconds = time.perf_counter() - started
+
+    chunks = sum(chunk_counts)
+    pages = args.pages * sum(1 for count in chunk_counts if count)
+    return {
+        "latency_ms": recorder.latency(),
+        "throughput": {
+            "documents": sum(1 for count in chunk_counts if count),
+            "chunks": chunks,
+            "ingest_seconds": round(ingest_seconds, 3),
+            "chunks_per_second": round(chunks / ingest_seconds, 2) if ingest_seconds else None,
+            "pages_per_second": round(pages / ingest_seconds, 2) if ingest_seconds else None,
+            "asks_per_second": round(args.asks / ask_seconds, 2) if args.asks and ask_seconds else None,
+            "quizzes_per_second": round(args.quizzes / quiz_seconds, 2) if args.quizzes and quiz_seconds else None,
+        },
+        "errors": recorder.errors,
+    }
+
+
+async def run_in_process(args) -> Dict[str, Any]:
+    """Drive the FastAPI app through an in-memory ASGI transport."""
+    import httpx
+
+    workdir = tempfile.mkdtemp(prefix="smartstudy-bench-")
+    os.environ["VECTOR_DB_PATH"] = os.path.join(workdir, "vector_db")
+    os.environ["LLM_BACKEND"] = args.llm_backend
+    os.environ["LLM_STUB_LATENCY_MS"] = str(args.stub_latency_ms)
+    os.environ["WARMUP_ON_STARTUP"] = "false"
+    os.environ["QUESTION_BANK_ENABLED"] = "true" if args.question_bank else "false"
+    os.environ.pop("EMBEDDING_SERVER_ADDRESS", None)
+    # Uploads are saved under ./uploads and ./static, so keep them in the throwaway directory too.
+    os.chdir(workdir)
+    print(f"Running in-process in {workdir} with the {args.llm_backend} LLM backend")
+
+    from app.main import app
+    from app.core.services import job_manager, rag
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.request_timeout) as client:
+            report = await drive(client, args)
+    finally:
+        await rag.aclose()
+        job_manager.shutdown()
+    report["peak_rss_mb"] = {"benchmark": peak_rss_mb(), "server": None}
+    return report
+
+
+async def run_over_http(args) -> Dict[str, Any]:
+    """Drive a running server over HTTP."""
+    import httpx
+
+    print(f"Running against {args.url}; start the server with LLM_BACKEND=stub for LLM-free numbers")
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.request_timeout, limits=limits) as client:
+        report = await drive(client, args)
+    report["peak_rss_mb"] = {"benchmark": peak_rss_mb(), "server": peak_rss_mb(args.server_pid) if args.server_pid else None}
+    return report
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=4, help="number of synthetic PDFs to ingest")
+    parser.add_argument("--pages", type=int, default=10, help="pages per PDF")
+    parser.add_argument("--asks", type=int, default=50, help="number of /ask requests")
+    parser.add_argument("--repeat-questions", type=float, default=0.0, help="fraction of /ask requests that repeat an earlier question")
+    parser.add_argument("--quizzes", type=int, default=5, help="number of /generate_quiz requests")
+    parser.add_argument("--quiz-questions", type=int, default=5, help="questions per quiz")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic corpus and questions")
+    parser.add_argument("--url", help="benchmark a running server at this URL instead of in-process")
+    parser.add_argument("--server-pid", type=int, help="pid of the server, to report its peak RSS (Linux)")
+    parser.add_argument("--llm-backend", default="stub", help="LLM backend for in-process runs")
+    parser.add_argument("--stub-latency-ms", type=float, default=50.0, help="stub LLM latency for in-process runs")
+    parser.add_argument("--question-bank", action="store_true", help="build question banks after ingestion (in-process)")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="skip the unmeasured warm-up request")
+    parser.add_argument("--job-timeout", type=float, default=600.0, help="seconds to wait for an ingestion job")
+    parser.add_argument("--request-timeout", type=float, default=120.0, help="seconds to wait for a response")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **git_commit(),
+        "mode": "http" if args.url else "in-process",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": vars(args),
+    }
+    report.update(asyncio.run(run_over_http(args) if args.url else run_in_process(args)))
+
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Report written to {output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
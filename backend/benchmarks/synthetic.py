@@ -0,0 +1,122 @@
+import random
+import textwrap
+from typing import List, Tuple
+
+TERMS = [
+    "mitochondria", "photosynthesis", "entropy", "recursion", "supply curve", "osmosis", "inflation",
+    "binary search", "enzyme", "covalent bond", "momentum", "hash table", "allele", "feudalism",
+    "derivative", "integral", "catalyst", "plate tectonics", "opportunity cost", "neuron",
+    "transistor", "eigenvalue", "ribosome", "renaissance", "isotope", "gradient descent",
+    "monopoly", "chlorophyll", "refraction", "sorting network",
+]
+VERBS = ["regulates", "depends on", "explains", "limits", "produces", "transforms", "measures", "predicts"]
+QUALIFIERS = [
+    "under ideal conditions", "in most textbook examples", "when the system is at equilibrium",
+    "according to the standard model", "over long time scales", "in the simplest case",
+]
+
+LINES_PER_PAGE = 46
+LINE_WIDTH = 90
+
+
+def _sentence(rng: random.Random) -> str:
+    a, b = rng.sample(TERMS, 2)
+    return f"The {a} {rng.choice(VERBS)} the {b} {rng.choice(QUALIFIERS)}."
+
+
+def document_pages(seed: int, pages: int) -> List[str]:
+    """Generate the text of a synthetic study document.
+
+    Every page opens with a numbered heading and holds paragraphs of
+    sentences relating the TERMS vocabulary, so chunking, retrieval and
+    quiz prompts all have something realistic to work with.
+
+    Args:
+        seed: Random seed; the same seed always gives the same document
+        pages: Number of pages
+
+    Returns:
+        One string per page, with lines already wrapped to fit the page
+    """
+    rng = random.Random(seed)
+    result = []
+    for page in range(pages):
+        term = rng.choice(TERMS)
+        lines = [f"{page // 4 + 1}.{page % 4 + 1} {term.title()} and its applications", ""]
+        while len(lines) < LINES_PER_PAGE:
+            paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+            lines.extend(textwrap.wrap(paragraph, LINE_WIDTH))
+            lines.append("")
+        result.append("\n".join(lines[:LINES_PER_PAGE]))
+    return result
+
+
+def questions(seed: int, count: int) -> List[str]:
+    """Questions about the synthetic vocabulary, for /ask and quiz topics."""
+    rng = random.Random(seed)
+    templates = [
+        "What does the {a} depend on?",
+        "How does the {a} relate to the {b}?",
+        "Explain the role of the {a} {q}.",
+        "Why does the {a} matter for the {b}?",
+    ]
+    result = []
+    for _ in range(count):
+        a, b = rng.sample(TERMS, 2)
+        result.append(rng.choice(templates).format(a=a, b=b, q=rng.choice(QUALIFIERS)))
+    return result
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[str]) -> bytes:
+    """Render page texts into a minimal PDF with one Helvetica text block per page.
+
+    Args:
+        pages: Page texts; lines are separated by newlines
+
+    Returns:
+        PDF file bytes that PyPDF2 extracts the same text from
+    """
+    # Object 1 is the catalog, 2 the page tree, 3 the font; then a page and
+    # its content stream for every page.
+    objects: List[bytes] = [b"", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for text in pages:
+        ops = ["BT", "/F1 10 Tf", "13 TL", "56 760 Td"]
+        for line in text.split("\n"):
+            ops.append(f"({_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(b"")  # page, filled in below once the content object number is known
+        page_number = len(objects)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects[page_number - 1] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (page_number + 1)
+        )
+        page_refs.append(b"%d 0 R" % page_number)
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(page_refs), len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets: List[int] = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def corpus(documents: int, pages: int, seed: int = 0) -> List[Tuple[str, bytes]]:
+    """Generate (filename, PDF bytes) pairs for a benchmark run."""
+    return [
+        (f"bench-{seed}-{i:03d}.pdf", make_pdf(document_pages(seed * 1000 + i, pages)))
+        for i in range(documents)
+    ]
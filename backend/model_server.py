@@ -0,0 +1,4 @@
+from app.core.services import serve_model_server
+
+if __name__ == "__main__":
+    serve_model_server()
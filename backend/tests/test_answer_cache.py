@@ -0,0 +1,176 @@
+import types
+
+import pytest
+
+import app.services.answer_cache as answer_cache_module
+from app.core import services
+from app.services.answer_cache import AnswerCache, InvalidationLog, normalize_question
+
+SCOPE = ("n1", None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache_module, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_normalize_question():
+    assert normalize_question("  What IS\n entropy?! ") == "what is entropy"
+
+
+def test_exact_hit_ignores_case_spacing_and_chunk_order(clock):
+    cache = AnswerCache()
+    cache.put(SCOPE, ["n1:a-0", "n1:a-1"], "What is entropy?", "disorder")
+    assert cache.get(SCOPE, ["n1:a-1", "n1:a-0"], "what  is ENTROPY") == "disorder"
+    assert cache.get(SCOPE, ["n1:a-0"], "What is entropy?") is None
+    assert cache.get(("n2", None), ["n1:a-0", "n1:a-1"], "What is entropy?") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = AnswerCache(max_entries=2)
+    cache.put(SCOPE, ["c"], "one", "1")
+    cache.put(SCOPE, ["c"], "two", "2")
+    assert cache.get(SCOPE, ["c"], "one") == "1"  # two is now the oldest
+    cache.put(SCOPE, ["c"], "three", "3")
+    assert cache.get(SCOPE, ["c"], "two") is None
+    assert cache.get(SCOPE, ["c"], "one") == "1"
+    assert cache.get(SCOPE, ["c"], "three") == "3"
+    assert cache.stats()["entries"] == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = AnswerCache(ttl_seconds=60)
+    cache.put(SCOPE, ["c"], "q", "a", [1.0, 0.0])
+    clock[0] += 60
+    assert cache.get(SCOPE, ["c"], "q") == "a"
+    clock[0] += 1
+    assert cache.get(SCOPE, ["c"], "q") is None
+    assert cache.get(SCOPE, ["c"], "q again", [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_near_duplicate_question_matches_above_threshold(clock):
+    cache = AnswerCache(similarity_threshold=0.95)
+    cache.put(SCOPE, ["c"], "What is entropy?", "disorder", [1.0, 0.0])
+    # cos = 0.96 and 0.94
+    assert cache.get(SCOPE, ["c"], "Define entropy", [0.96, 0.28]) == "disorder"
+    assert cache.get(SCOPE, ["c"], "Explain entropy", [0.94, 0.3412]) is None
+    # Embeddings are only compared within the same scope and chunk set.
+    assert cache.get(SCOPE, ["d"], "Define entropy", [1.0, 0.0]) is None
+    assert cache.stats()["near_duplicate_hits"] == 1
+
+
+def test_near_duplicate_picks_the_most_similar_entry(clock):
+    cache = AnswerCache(similarity_threshold=0.9)
+    cache.put(SCOPE, ["c"], "first", "far", [0.9, 0.43589])
+    cache.put(SCOPE, ["c"], "second", "near", [1.0, 0.0])
+    assert cache.get(SCOPE, ["c"], "third", [2.0, 0.0]) == "near"
+
+
+def test_near_duplicate_matching_can_be_disabled(clock):
+    cache = AnswerCache(similarity_threshold=0)
+    cache.put(SCOPE, ["c"], "q", "a", [1.0, 0.0])
+    assert cache.get(SCOPE, ["c"], "other", [1.0, 0.0]) is None
+
+
+def test_invalidate_drops_the_notebooks_answers(clock):
+    cache = AnswerCache()
+    cache.put(("n1", None), ["n1:doc-0"], "scoped to n1", "a")
+    cache.put((None, None), ["n1:doc-0", "n2:doc-0"], "grounded on n1", "b")
+    cache.put((None, None), [], "found nothing", "c")
+    cache.put(("n2", None), ["n2:doc-0"], "scoped to n2", "d")
+    cache.put((None, None), ["n10:doc-0"], "similar prefix", "e")
+
+    cache.invalidate("n1")
+    assert cache.get(("n1", None), ["n1:doc-0"], "scoped to n1") is None
+    assert cache.get((None, None), ["n1:doc-0", "n2:doc-0"], "grounded on n1") is None
+    assert cache.get((None, None), [], "found nothing") is None
+    assert cache.get(("n2", None), ["n2:doc-0"], "scoped to n2") == "d"
+    assert cache.get((None, None), ["n10:doc-0"], "similar prefix") == "e"
+    assert cache.stats()["invalidated"] == 3
+
+
+def test_invalidation_log_reports_notebooks_since_a_sequence():
+    log = InvalidationLog()
+    assert log.since(None) == (0, [])
+    log.publish("n1")
+    log.publish("n2")
+    log.publish("n1")
+    assert log.since(0) == (3, ["n1", "n2"])
+    assert log.since(2) == (3, ["n1"])
+    assert log.since(3) == (3, [])
+
+
+def test_invalidation_log_tells_a_lagging_worker_to_clear():
+    log = InvalidationLog(max_entries=2)
+    for notebook in ("n1", "n2", "n3"):
+        log.publish(notebook)
+    assert log.since(1) == (3, ["n2", "n3"])
+    assert log.since(0) == (3, None)
+
+
+class _Stop(Exception):
+    pass
+
+
+def _run_sync(monkeypatch, remote, between_polls):
+    """Run the sync loop for one poll per entry of ``between_polls``, calling each after its poll."""
+    steps = list(between_polls)
+
+    def sleep(seconds):
+        if not steps:
+            raise _Stop()
+        steps.pop(0)()
+
+    monkeypatch.setattr(services, "time", types.SimpleNamespace(sleep=sleep))
+    with pytest.raises(_Stop):
+        services._sync_answer_cache(remote)
+
+
+def test_sync_applies_other_workers_invalidations(monkeypatch):
+    log = InvalidationLog()
+    log.publish("n1")  # before this worker started: not applied
+    cache = AnswerCache()
+    monkeypatch.setattr(services, "answer_cache", cache)
+    cache.put(("n1", None), ["n1:doc-0"], "q1", "a1")
+    cache.put(("n2", None), ["n2:doc-0"], "q2", "a2")
+
+    seen = []
+    _run_sync(monkeypatch, log, [
+        lambda: seen.append(cache.stats()["entries"]),
+        lambda: log.publish("n2"),
+        lambda: seen.append(cache.stats()["entries"]),
+    ])
+    assert seen == [2, 1]
+    assert cache.get(("n1", None), ["n1:doc-0"], "q1") == "a1"
+    assert cache.get(("n2", None), ["n2:doc-0"], "q2") is None
+
+
+def test_sync_clears_the_cache_when_it_fell_behind_or_the_server_restarted(monkeypatch):
+    cache = AnswerCache()
+    monkeypatch.setattr(services, "answer_cache", cache)
+    log = InvalidationLog(max_entries=1)
+
+    def fall_behind():
+        cache.put(("n9", None), ["n9:doc-0"], "q", "a")
+        log.publish("n1")
+        log.publish("n2")
+
+    def restart():
+        cache.put(("n9", None), ["n9:doc-0"], "q", "a")
+        log._seq, log._entries = 0, []
+
+    counts = []
+    _run_sync(monkeypatch, log, [
+        lambda: log.publish("n0"),
+        lambda: None,
+        fall_behind,
+        lambda: counts.append(cache.stats()["entries"]),
+        restart,
+        lambda: counts.append(cache.stats()["entries"]),
+    ])
+    assert counts == [0, 0]
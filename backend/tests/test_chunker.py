@@ -0,0 +1,71 @@
+from app.services.chunker import Chunk, ChunkConfig, Chunker, find_headings
+
+
+def _chunker(size=60, overlap=20):
+    return Chunker({"pdf": ChunkConfig(size, overlap), "transcript": ChunkConfig(size, 0)})
+
+
+def test_find_headings_matches_numbered_and_named_headings():
+    text = (
+        "Intro text.\n"
+        "Chapter 3 Cell Division\n"
+        "Cells divide.\n"
+        "2.4 Results\n"
+        "Lecture 7: Sorting\n"
+        "Unit IV\n"
+    )
+    assert [title for _, title in find_headings(text)] == ["Chapter 3 Cell Division", "2.4 Results", "Lecture 7: Sorting", "Unit IV"]
+    for offset, title in find_headings(text):
+        assert text[offset:offset + len(title)] == title
+
+
+def test_find_headings_rejects_sentences_and_lowercase_numbers():
+    text = (
+        "1. the list item starts lowercase\n"
+        "3 Results were significant across every one of the many trials we ran this year\n"
+        "2.1 Results continued.\n"
+        "Section 2 ends here,\n"
+        "12345 Main Street\n"
+    )
+    assert find_headings(text) == []
+
+
+def test_locate_returns_offsets_of_overlapping_pieces():
+    text = "alpha beta gamma alpha beta delta"
+    pieces = ["alpha beta gamma", "gamma alpha beta", "alpha beta delta"]
+    located = list(_chunker()._locate(text, pieces, overlap=6))
+    assert located == [("alpha beta gamma", 0), ("gamma alpha beta", 11), ("alpha beta delta", 17)]
+
+
+def test_locate_finds_repeated_text_after_the_previous_piece():
+    text = "same words. same words. same words."
+    pieces = ["same words.", "same words.", "same words."]
+    assert [index for _, index in _chunker()._locate(text, pieces, overlap=0)] == [0, 12, 24]
+
+
+def test_split_offsets_point_back_into_the_text():
+    text = " ".join(f"Sentence number {i} talks about topic {i}." for i in range(20))
+    chunks = _chunker().split(text, "pdf", section="S", page=3, offset=100)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert text[chunk.start - 100:chunk.end - 100] == chunk.text
+        assert chunk.section == "S" and chunk.page == 3
+
+
+def test_split_page_breaks_at_headings_and_carries_the_section():
+    text = "Leftover from the previous page.\n2.1 Methods\nWe measured things.\n2.2 Results\nThings were measured."
+    chunks, section = _chunker(size=200).split_page(text, "pdf", page=4, section="2 Background")
+    assert [(chunk.section, chunk.text.splitlines()[0]) for chunk in chunks] == [
+        ("2 Background", "Leftover from the previous page."),
+        ("2.1 Methods", "2.1 Methods"),
+        ("2.2 Results", "2.2 Results"),
+    ]
+    assert section == "2.2 Results"
+    for chunk in chunks:
+        assert text[chunk.start:chunk.end] == chunk.text
+
+
+def test_chunk_metadata_leaves_out_unset_fields():
+    assert Chunk("t", 0, 1).metadata() == {"char_start": 0, "char_end": 1}
+    meta = Chunk("t", 0, 1, section="S", page=2, start_seconds=5.0, end_seconds=9.0).metadata()
+    assert meta == {"char_start": 0, "char_end": 1, "section": "S", "page": 2, "start_seconds": 5.0, "end_seconds": 9.0}
@@ -0,0 +1,130 @@
+import gzip
+import types
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import documents
+from app.core import services
+from app.services.document_text import DocumentTextStore, document_id
+
+DOC_KEY = "n1:notes.pdf"
+PAGES = ["First page.", "Second page is longer.", "Third."]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = DocumentTextStore(str(tmp_path))
+    store.put(DOC_KEY, {"source": "notes.pdf", "notebook_id": "n1", "version": "a" * 64, "pages": PAGES})
+    monkeypatch.setattr(services, "get_document_text", lambda: store)
+    app = FastAPI()
+    app.include_router(documents.router)
+    return TestClient(app)
+
+
+def _url(**params):
+    query = "&".join(f"{key}={value}" for key, value in params.items())
+    return f"/documents/{document_id(DOC_KEY)}/text" + (f"?{query}" if query else "")
+
+
+def test_page_is_served(client):
+    response = client.get(_url(page=2))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["text"] == "Second page is longer."
+    assert (body["page"], body["page_count"], body["source"]) == (2, 3, "notes.pdf")
+    assert body["length"] == len("\n".join(PAGES))
+
+
+def test_page_past_the_end_is_404(client):
+    assert client.get(_url(page=4)).status_code == 404
+    assert client.get(_url(page=0)).status_code == 422
+
+
+def test_character_range_is_sliced_from_the_joined_pages(client):
+    joined = "\n".join(PAGES)
+    body = client.get(_url(start=6, end=20)).json()
+    assert (body["start"], body["end"], body["text"]) == (6, 20, joined[6:20])
+    assert body["page"] is None
+
+    body = client.get(_url(start=30)).json()
+    assert (body["start"], body["end"], body["text"]) == (30, len(joined), joined[30:])
+
+
+def test_range_is_clamped_and_capped(client, monkeypatch):
+    joined = "\n".join(PAGES)
+    body = client.get(_url(start=500, end=900)).json()
+    assert (body["start"], body["end"], body["text"]) == (len(joined), len(joined), "")
+    body = client.get(_url(start=10, end=5)).json()
+    assert (body["start"], body["end"], body["text"]) == (10, 10, "")
+
+    monkeypatch.setattr(documents.config, "DOCUMENT_TEXT_MAX_CHARS", 4)
+    body = client.get(_url()).json()
+    assert (body["start"], body["end"], body["text"]) == (0, 4, joined[:4])
+
+
+def test_unknown_document_is_404(client):
+    assert client.get("/documents/" + "0" * 40 + "/text").status_code == 404
+    assert client.get("/documents/not-an-id/text?page=1").status_code == 404
+
+
+def test_etag_revalidation_gives_304(client):
+    response = client.get(_url(page=1))
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"') and response.headers["cache-control"] == "private, no-cache"
+
+    for header in (etag, etag.removeprefix("W/"), f'"other", {etag}', "*"):
+        revalidated = client.get(_url(page=1), headers={"If-None-Match": header})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["etag"] == etag
+
+    # Every page or range has its own ETag.
+    assert client.get(_url(page=2), headers={"If-None-Match": etag}).status_code == 200
+    assert client.get(_url(start=0, end=5)).headers["etag"] != etag
+
+
+def test_etag_changes_with_the_document_version(client):
+    etag = client.get(_url(page=1)).headers["etag"]
+    services.get_document_text().put(DOC_KEY, {"source": "notes.pdf", "notebook_id": "n1", "version": "b" * 64, "pages": PAGES})
+    response = client.get(_url(page=1), headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def _raw(client, url, accept_encoding):
+    # Read the body as sent, without the client decoding it.
+    with client.stream("GET", url, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response.headers, b"".join(response.iter_raw())
+
+
+def test_gzip_is_negotiated(client, monkeypatch):
+    monkeypatch.setattr(documents.config, "DOCUMENT_TEXT_COMPRESS_MIN_BYTES", 0)
+    monkeypatch.setattr(documents, "brotli", None)
+    headers, body = _raw(client, _url(page=2), "br, gzip;q=0.5")
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert b"Second page is longer." in gzip.decompress(body)
+
+
+def test_brotli_is_preferred_when_available(client, monkeypatch):
+    monkeypatch.setattr(documents.config, "DOCUMENT_TEXT_COMPRESS_MIN_BYTES", 0)
+    monkeypatch.setattr(documents, "brotli", types.SimpleNamespace(compress=lambda body, quality: b"BR:" + body))
+    headers, body = _raw(client, _url(page=2), "gzip, br")
+    assert headers["content-encoding"] == "br"
+    assert body.startswith(b"BR:")
+
+    headers, _ = _raw(client, _url(page=2), "gzip, br;q=0")
+    assert headers["content-encoding"] == "gzip"
+
+
+def test_small_or_unaccepted_bodies_are_not_compressed(client, monkeypatch):
+    headers, body = _raw(client, _url(page=2), "gzip")
+    assert "content-encoding" not in headers
+    assert b"Second page is longer." in body
+
+    monkeypatch.setattr(documents.config, "DOCUMENT_TEXT_COMPRESS_MIN_BYTES", 0)
+    for accept_encoding in ("identity", "gzip;q=0", "deflate"):
+        headers, _ = _raw(client, _url(page=2), accept_encoding)
+        assert "content-encoding" not in headers
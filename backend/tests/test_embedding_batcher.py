@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+def _encode(texts):
+    return [[float(len(text))] for text in texts]
+
+
+def test_concurrent_calls_share_one_batch():
+    batcher = EmbeddingBatcher(_encode, max_batch_size=8, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed("x" * i) for i in range(5)))
+
+    assert asyncio.run(run()) == [[float(i)] for i in range(5)]
+    assert batcher.stats()["batches"] == 1
+    assert batcher.stats()["items"] == 5
+
+
+def test_batches_are_capped():
+    batcher = EmbeddingBatcher(_encode, max_batch_size=2, max_wait_ms=20)
+
+    async def run():
+        await asyncio.gather(*(batcher.embed("x") for _ in range(5)))
+
+    asyncio.run(run())
+    assert batcher.stats()["batches"] == 3
+
+
+def test_encode_error_fails_the_batch_and_worker_keeps_going():
+    calls = []
+
+    def encode(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            raise RuntimeError("model failed")
+        return _encode(texts)
+
+    batcher = EmbeddingBatcher(encode, max_wait_ms=0)
+
+    async def run():
+        with pytest.raises(RuntimeError, match="model failed"):
+            await batcher.embed("a")
+        return await batcher.embed("bb")
+
+    assert asyncio.run(run()) == [2.0]
+
+
+def test_short_encoder_output_fails_instead_of_hanging():
+    batcher = EmbeddingBatcher(lambda texts: [[0.0]], max_wait_ms=20)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True), 1
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_stopped_worker_fails_its_batch_and_restarts_on_the_same_queue():
+    release = threading.Event()
+
+    async def run():
+        started = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def encode(texts):
+            loop.call_soon_threadsafe(started.set)
+            release.wait(5)
+            return _encode(texts)
+
+        batcher = EmbeddingBatcher(encode, max_batch_size=1, max_wait_ms=0)
+        in_flight = asyncio.ensure_future(batcher.embed("a"))
+        await started.wait()
+        # A second text waits in the queue while the worker is stopped mid-batch.
+        queued = asyncio.ensure_future(batcher.embed("bbb"))
+        await asyncio.sleep(0)
+        batcher._worker.cancel()
+        with pytest.raises(RuntimeError, match="stopped"):
+            await in_flight
+        release.set()
+        # The next caller restarts the worker, which also serves the queued text.
+        assert await batcher.embed("cc") == [2.0]
+        assert await queued == [3.0]
+
+    asyncio.run(run())
@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+
+from app.services.embedding_cache import EmbeddingCache, chunk_hash
+
+DIM = 4
+
+
+class FakeModel:
+    """Deterministic embeddings that record what was encoded."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[len(text), ord(text[0]), i, 1.0] for i, text in enumerate(texts)], dtype=np.float32)
+
+
+def _cache(tmp_path):
+    return EmbeddingCache(str(tmp_path), "test/model")
+
+
+def test_reload_serves_stored_vectors(tmp_path):
+    model = FakeModel()
+    first = _cache(tmp_path).encode(["alpha", "beta", "alpha"], model)
+    assert model.encoded == ["alpha", "beta"]
+
+    reloaded = _cache(tmp_path)
+    again = reloaded.encode(["beta", "alpha"], FakeModel())
+    np.testing.assert_array_equal(again, first[[1, 0]])
+    assert reloaded.stats()["hits"] == 2
+    assert reloaded.stats()["misses"] == 0
+
+
+def test_reload_truncates_partial_last_line(tmp_path):
+    cache = _cache(tmp_path)
+    vectors = cache.encode(["alpha", "beta"], FakeModel())
+    with open(cache._keys_path, "a") as f:
+        f.write("deadbeef")  # a writer died before finishing the line
+
+    reloaded = _cache(tmp_path)
+    assert reloaded.stats()["entries"] == 2
+    with open(reloaded._keys_path) as f:
+        assert f.read().endswith("\n")
+    # The next row lands after the complete lines, not on the partial one.
+    gamma = reloaded.encode(["gamma"], FakeModel())
+    np.testing.assert_array_equal(_cache(tmp_path).encode(["alpha", "beta", "gamma"], FakeModel()), np.vstack([vectors, gamma]))
+
+
+def test_duplicate_key_lines_keep_rows_aligned(tmp_path):
+    cache = _cache(tmp_path)
+    cache.encode(["alpha"], FakeModel())
+    # Two processes stored the same chunk: its key takes two rows.
+    with open(cache._keys_path, "a") as f:
+        f.write(f"{chunk_hash('alpha')}\n")
+    cache._vectors[1] = 7.0
+    cache._vectors.flush()
+
+    reloaded = _cache(tmp_path)
+    beta = reloaded.encode(["beta"], FakeModel())
+    # beta goes to row 2, after both alpha lines, and reads back intact.
+    assert reloaded._rows[chunk_hash("beta")] == 2
+    np.testing.assert_array_equal(_cache(tmp_path).encode(["beta"], FakeModel()), beta)
+
+
+def test_instances_share_appends(tmp_path):
+    one = _cache(tmp_path)
+    two = _cache(tmp_path)
+    alpha = one.encode(["alpha"], FakeModel())
+
+    model = FakeModel()
+    both = two.encode(["alpha", "beta"], model)
+    # The other instance's row is picked up instead of re-encoded.
+    assert model.encoded == ["beta"]
+    np.testing.assert_array_equal(both[0], alpha[0])
+    assert one.encode(["beta"], FakeModel()).tolist() == both[1:].tolist()
+    with open(one._keys_path) as f:
+        assert len(f.read().splitlines()) == 2
+
+
+def test_growth_past_initial_capacity(tmp_path, monkeypatch):
+    monkeypatch.setattr(EmbeddingCache, "INITIAL_CAPACITY", 2)
+    texts = [f"text {i}" for i in range(5)]
+    vectors = _cache(tmp_path).encode(texts, FakeModel())
+    reloaded = _cache(tmp_path)
+    np.testing.assert_array_equal(reloaded.encode(texts, FakeModel()), vectors)
+    assert os.path.getsize(reloaded._vectors_path) == 8 * DIM * 4
@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.endpoints import files
+from app.services.file_store import FileStore
+
+PDF = b"%PDF-1.4 " + bytes(range(256)) * 8
+
+
+def test_save_stores_content_under_its_hash(tmp_path):
+    store = FileStore(str(tmp_path))
+    content_hash, path = store.save(io.BytesIO(PDF))
+    assert content_hash == hashlib.sha256(PDF).hexdigest()
+    assert path == os.path.join(str(tmp_path), content_hash[:2], content_hash + ".pdf")
+    with open(path, "rb") as f:
+        assert f.read() == PDF
+
+
+def test_save_dedupes_identical_content(tmp_path):
+    store = FileStore(str(tmp_path))
+    first = store.save(io.BytesIO(PDF))
+    source = io.BytesIO(PDF)
+    source.read(10)  # save reads from the start regardless
+    assert store.save(source) == first
+    stored = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert stored == [os.path.basename(first[1])]
+
+
+def test_find_rejects_malformed_and_missing_hashes(tmp_path):
+    store = FileStore(str(tmp_path))
+    content_hash, path = store.save(io.BytesIO(PDF))
+    assert store.find(content_hash) == path
+    assert store.find("0" * 64) is None
+    assert store.find("../" + content_hash) is None
+    assert store.find(content_hash.upper()) is None
+
+
+def _get(monkeypatch, tmp_path, url, headers=None):
+    store = FileStore(str(tmp_path))
+    content_hash, _ = store.save(io.BytesIO(PDF))
+    monkeypatch.setattr(files, "file_store", store)
+    app = FastAPI()
+    app.include_router(files.router)
+
+    async def request():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(url.format(hash=content_hash), headers=headers or {})
+
+    return content_hash, asyncio.run(request())
+
+
+def test_file_is_served_with_etag_and_immutable_caching(monkeypatch, tmp_path):
+    content_hash, response = _get(monkeypatch, tmp_path, "/files/{hash}")
+    assert response.status_code == 200
+    assert response.content == PDF
+    assert response.headers["etag"] == f'"{content_hash}"'
+    assert response.headers["cache-control"] == files.IMMUTABLE_CACHE_CONTROL
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+def test_matching_if_none_match_gives_304(monkeypatch, tmp_path):
+    content_hash = hashlib.sha256(PDF).hexdigest()
+    for header in (f'"{content_hash}"', f'W/"{content_hash}"', f'"other", "{content_hash}"', "*"):
+        _, response = _get(monkeypatch, tmp_path, "/files/{hash}", {"If-None-Match": header})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == f'"{content_hash}"'
+
+    _, response = _get(monkeypatch, tmp_path, "/files/{hash}", {"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+def test_range_request_gives_206(monkeypatch, tmp_path):
+    _, response = _get(monkeypatch, tmp_path, "/files/{hash}", {"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == PDF[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(PDF)}"
+
+
+def test_unknown_or_malformed_hash_is_404(monkeypatch, tmp_path):
+    _, response = _get(monkeypatch, tmp_path, "/files/" + "0" * 64)
+    assert response.status_code == 404
+    _, response = _get(monkeypatch, tmp_path, "/files/not-a-hash")
+    assert response.status_code == 404
@@ -0,0 +1,100 @@
+import pytest
+
+from app.services import html_extractor
+from app.services.html_extractor import extract_sections, render_sections
+
+PROSE = "Photosynthesis turns light, water and carbon dioxide into sugar and oxygen inside the chloroplasts of plant cells. "
+
+ARTICLE = f"""<!DOCTYPE html>
+<html>
+<head><title>Plant Biology</title><style>body {{ color: red; }}</style></head>
+<body>
+  <header><a href="/">Home</a> <a href="/about">About</a></header>
+  <nav><ul><li><a href="/a">Chapter A</a></li><li><a href="/b">Chapter B</a></li></ul></nav>
+  <div class="cookie-banner">We use cookies. Accept?</div>
+  <div id="content">
+    <p>{PROSE * 2}</p>
+    <h2>Light reactions</h2>
+    <p>The light reactions happen in the <b>thylakoid</b> membranes and make ATP.</p>
+    <script>trackPageView();</script>
+    <h3>Photosystems</h3>
+    <p>Photosystem II splits water; photosystem I reduces NADP+.</p>
+    <ul><li>Chlorophyll a absorbs red and blue light.</li></ul>
+    <h2>Calvin cycle</h2>
+    <p>The Calvin cycle fixes carbon dioxide into sugars in the stroma.</p>
+  </div>
+  <aside class="sidebar"><a href="/x">Related reading</a></aside>
+  <footer>Copyright 2024 Plant Site. <a href="/privacy">Privacy</a></footer>
+</body>
+</html>
+""".encode()
+
+
+@pytest.fixture
+def sections():
+    if html_extractor.lxml is None:
+        pytest.skip("lxml is not installed")
+    return extract_sections(ARTICLE)
+
+
+def test_boilerplate_is_removed(sections):
+    text = render_sections(sections)
+    for boilerplate in ("Home", "Chapter A", "cookies", "trackPageView", "color: red", "Related reading", "Copyright"):
+        assert boilerplate not in text
+    assert "Photosynthesis turns light" in text
+
+
+def test_page_is_split_at_headings(sections):
+    assert [(s["heading"], s["level"]) for s in sections] == [
+        ("Plant Biology", 0),
+        ("Light reactions", 2),
+        ("Photosystems", 3),
+        ("Calvin cycle", 2),
+    ]
+    assert sections[1]["text"] == "The light reactions happen in the thylakoid membranes and make ATP."
+    assert sections[2]["text"].split("\n") == [
+        "Photosystem II splits water; photosystem I reduces NADP+.",
+        "Chlorophyll a absorbs red and blue light.",
+    ]
+
+
+def test_main_element_wins_over_other_containers():
+    if html_extractor.lxml is None:
+        pytest.skip("lxml is not installed")
+    html = f"<html><body><div><p>{PROSE * 3}</p></div><main><p>The real article.</p></main></body></html>".encode()
+    assert render_sections(extract_sections(html)) == "The real article."
+
+
+def test_link_lists_inside_content_are_dropped():
+    if html_extractor.lxml is None:
+        pytest.skip("lxml is not installed")
+    html = f"""<html><body><article>
+        <p>{PROSE}</p>
+        <p><a href="/1">Next page</a> | <a href="/2">Previous page</a></p>
+    </article></body></html>""".encode()
+    assert render_sections(extract_sections(html)) == PROSE.strip()
+
+
+def test_falls_back_to_html_parser_when_lxml_finds_no_text(capsys):
+    if html_extractor.lxml is None:
+        pytest.skip("lxml is not installed")
+    # ASP.NET-style pages wrap the whole body in a form, which the lxml path drops.
+    html = b"<html><head><title>Old Page</title></head><body><form id='form1'><div>Mitosis has four phases.</div></form></body></html>"
+    sections = extract_sections(html)
+    assert [(s["heading"], s["level"]) for s in sections] == [("Old Page", 0)]
+    assert "Mitosis has four phases." in sections[0]["text"]
+    assert "falling back" in capsys.readouterr().out
+
+
+def test_bs4_parser_returns_one_section_without_boilerplate():
+    sections = extract_sections(ARTICLE, parser="bs4")
+    assert len(sections) == 1
+    assert sections[0]["heading"] == "Plant Biology"
+    text = sections[0]["text"]
+    assert "Calvin cycle" in text and "Photosynthesis turns light" in text
+    assert "Chapter A" not in text and "trackPageView" not in text and "Copyright" not in text
+
+
+def test_empty_page_gives_no_sections():
+    assert extract_sections(b"") == []
+    assert extract_sections(b"<html><body><nav>Menu</nav></body></html>") == []
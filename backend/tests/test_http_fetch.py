@@ -0,0 +1,198 @@
+import types
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import app.services.http_fetch as http_fetch
+from app.services.http_fetch import HttpFetcher
+
+URL = "http://example.com/page"
+
+
+class _Response:
+    def __init__(self, status=200, body=b"", headers=None):
+        self.status_code = status
+        self.content = body
+        self.headers = CaseInsensitiveDict(headers or {})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(http_fetch, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def _fetcher(tmp_path, responses, **kwargs):
+    """A fetcher whose session answers with ``responses`` in order and records request headers."""
+    fetcher = HttpFetcher(str(tmp_path / "cache"), **kwargs)
+    fetcher.requests = []
+
+    def get(url, headers, timeout, stream):
+        fetcher.requests.append((url, dict(headers)))
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    fetcher.session.get = get
+    return fetcher
+
+
+@pytest.mark.parametrize("cache_control", ["no-store", "private", "private, max-age=60"])
+def test_no_store_and_private_responses_are_not_stored(tmp_path, clock, cache_control):
+    fetcher = _fetcher(tmp_path, [_Response(body=b"one", headers={"Cache-Control": cache_control}), _Response(body=b"two")])
+    assert fetcher.get(URL).content == b"one"
+    assert fetcher.stats()["entries"] == 0
+    result = fetcher.get(URL)
+    assert (result.content, result.from_cache) == (b"two", False)
+    assert len(fetcher.requests) == 2
+
+
+def test_cached_body_is_served_without_a_request_while_fresh(tmp_path, clock):
+    fetcher = _fetcher(tmp_path, [_Response(body=b"body", headers={"Content-Type": "text/html"})], fresh_seconds=300)
+    fetcher.get(URL)
+    clock[0] += 299
+    result = fetcher.get(URL)
+    assert (result.content, result.content_type, result.from_cache) == (b"body", "text/html", True)
+    assert len(fetcher.requests) == 1
+    assert fetcher.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("cache_control, fresh_for", [
+    ("max-age=1000", 300),
+    ("max-age=60", 60),
+    ("max-age=1000, s-maxage=30", 30),
+    ("max-age=oops", 300),
+])
+def test_max_age_is_capped_at_fresh_seconds(tmp_path, clock, cache_control, fresh_for):
+    fetcher = _fetcher(tmp_path, [
+        _Response(body=b"body", headers={"Cache-Control": cache_control, "ETag": '"v1"'}),
+        _Response(status=304),
+    ], fresh_seconds=300)
+    fetcher.get(URL)
+    clock[0] += fresh_for - 1
+    fetcher.get(URL)
+    assert len(fetcher.requests) == 1
+    clock[0] += 2
+    fetcher.get(URL)
+    assert len(fetcher.requests) == 2
+
+
+def test_no_cache_forces_revalidation(tmp_path, clock):
+    fetcher = _fetcher(tmp_path, [
+        _Response(body=b"body", headers={"Cache-Control": "no-cache", "ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}),
+        _Response(status=304),
+    ])
+    fetcher.get(URL)
+    result = fetcher.get(URL)
+    assert (result.content, result.from_cache) == (b"body", True)
+    assert fetcher.requests[1][1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+
+
+def test_304_reuses_the_body_and_refreshes_validated_at(tmp_path, clock):
+    fetcher = _fetcher(tmp_path, [_Response(body=b"body", headers={"ETag": '"v1"'}), _Response(status=304)], fresh_seconds=100)
+    fetcher.get(URL)
+    clock[0] += 150
+    result = fetcher.get(URL)
+    assert (result.status, result.content, result.from_cache) == (200, b"body", True)
+    assert fetcher.stats()["revalidated"] == 1
+    # Fresh again for a full period from the revalidation.
+    clock[0] += 99
+    assert fetcher.get(URL).from_cache
+    assert len(fetcher.requests) == 2
+
+
+def test_304_with_no_store_drops_the_entry(tmp_path, clock):
+    fetcher = _fetcher(tmp_path, [
+        _Response(body=b"body", headers={"ETag": '"v1"'}),
+        _Response(status=304, headers={"Cache-Control": "no-store"}),
+        _Response(body=b"new"),
+    ], fresh_seconds=10)
+    fetcher.get(URL)
+    clock[0] += 20
+    assert fetcher.get(URL).content == b"body"
+    assert fetcher.stats()["entries"] == 0
+    assert fetcher.get(URL).content == b"new"
+
+
+def test_truncated_body_is_not_cached(tmp_path, clock):
+    fetcher = _fetcher(tmp_path, [_Response(body=b"0123456789"), _Response(body=b"0123456789")])
+    result = fetcher.get(URL, max_bytes=4)
+    assert (result.content, result.truncated) == (b"0123", True)
+    assert fetcher.stats()["entries"] == 0
+    # A later caller without the cap gets (and caches) the whole body.
+    result = fetcher.get(URL)
+    assert (result.content, result.truncated, result.from_cache) == (b"0123456789", False, False)
+    assert fetcher.stats()["entries"] == 1
+
+
+def test_cached_full_body_is_cut_to_the_callers_cap(tmp_path, clock):
+    fetcher = _fetcher(tmp_path, [_Response(body=b"0123456789")])
+    fetcher.get(URL)
+    result = fetcher.get(URL, max_bytes=4)
+    assert (result.content, result.truncated, result.from_cache) == (b"0123", True, True)
+    assert fetcher.get(URL).content == b"0123456789"
+
+
+def test_cached_copy_is_served_when_the_fetch_fails(tmp_path, clock):
+    fetcher = _fetcher(tmp_path, [
+        _Response(body=b"body"),
+        requests.ConnectionError("down"),
+        _Response(status=503),
+    ], fresh_seconds=10)
+    fetcher.get(URL)
+    clock[0] += 20
+    assert fetcher.get(URL).content == b"body"
+    assert fetcher.get(URL).content == b"body"
+    assert len(fetcher.requests) == 3
+
+
+def test_fetch_failure_without_a_cached_copy_raises(tmp_path, clock):
+    fetcher = _fetcher(tmp_path, [_Response(status=404)])
+    with pytest.raises(requests.HTTPError):
+        fetcher.get(URL)
+
+
+def test_least_recently_used_entries_are_evicted_past_max_bytes(tmp_path, clock):
+    fetcher = _fetcher(tmp_path, [_Response(body=b"aaaa"), _Response(body=b"bbbb"), _Response(body=b"cccc")], max_bytes=10)
+    fetcher.get(URL + "/a")
+    clock[0] += 1
+    fetcher.get(URL + "/b")
+    clock[0] += 1
+    fetcher.get(URL + "/a")  # a is now more recently used than b
+    clock[0] += 1
+    fetcher.get(URL + "/c")
+    assert fetcher.stats()["entries"] == 2
+    assert fetcher.stats()["bytes"] == 8
+    assert fetcher.get(URL + "/a").from_cache
+    assert fetcher.get(URL + "/c").from_cache
+    assert len(fetcher.requests) == 3
+
+
+def test_body_larger_than_the_cache_is_not_stored(tmp_path, clock):
+    fetcher = _fetcher(tmp_path, [_Response(body=b"x" * 20)], max_bytes=10)
+    assert fetcher.get(URL).content == b"x" * 20
+    assert fetcher.stats() == {"entries": 0, "bytes": 0, "hits": 0, "revalidated": 0, "misses": 1}
+
+
+def test_cache_index_is_reloaded_from_disk(tmp_path, clock):
+    _fetcher(tmp_path, [_Response(body=b"body")]).get(URL)
+    reloaded = _fetcher(tmp_path, [])
+    assert reloaded.stats()["entries"] == 1
+    assert reloaded.get(URL).content == b"body"
@@ -0,0 +1,103 @@
+import math
+
+import pytest
+
+from app.services.lexical_index import LexicalIndex, tokenize
+from app.services.retrieval import RRF_K, reciprocal_rank_fusion
+
+
+def _index(tmp_path, chunks):
+    index = LexicalIndex(str(tmp_path / "lexical.pkl"))
+    index.upsert(
+        list(chunks),
+        [text for text, _ in chunks.values()],
+        [{"notebook_id": notebook, "source": "doc.pdf"} for _, notebook in chunks.values()],
+    )
+    return index
+
+
+def test_tokenize_keeps_dotted_and_hyphenated_terms():
+    assert tokenize("K-Means in Python 3.2, h2o!") == ["k-means", "in", "python", "3.2", "h2o"]
+
+
+def test_bm25_score_matches_formula(tmp_path):
+    index = _index(tmp_path, {
+        "a": ("cat cat dog", "n1"),
+        "b": ("dog bird", "n1"),
+        "c": ("fish", "n1"),
+    })
+    results = dict((chunk_id, score) for chunk_id, score, _ in index.search("cat", 10))
+    assert list(results) == ["a"]
+
+    n_docs, df, tf, length, avg_length = 3, 1, 2, 3, 6 / 3
+    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+    expected = idf * tf * (index.k1 + 1) / (tf + index.k1 * (1 - index.b + index.b * length / avg_length))
+    assert results["a"] == pytest.approx(expected)
+
+
+def test_shorter_chunks_rank_higher(tmp_path):
+    index = _index(tmp_path, {
+        "short": ("entropy", "n1"),
+        "long": ("entropy heat work energy", "n1"),
+        "other": ("pressure", "n1"),
+    })
+    assert [hit[0] for hit in index.search("entropy", 3)] == ["short", "long"]
+
+
+def test_rarer_terms_weigh_more(tmp_path):
+    index = _index(tmp_path, {
+        "rare": ("apple", "n1"),
+        "common": ("banana", "n1"),
+        "x": ("banana x", "n1"),
+        "y": ("banana y", "n1"),
+    })
+    assert index.search("apple banana", 1)[0][0] == "rare"
+
+
+def test_search_filters_by_notebook_and_source(tmp_path):
+    index = _index(tmp_path, {"a": ("alpha", "n1"), "b": ("alpha", "n2")})
+    assert [hit[0] for hit in index.search("alpha", 10, notebook_id="n2")] == ["b"]
+    assert index.search("alpha", 10, source="other.pdf") == []
+
+
+def test_upsert_replaces_and_delete_removes(tmp_path):
+    index = _index(tmp_path, {"a": ("alpha beta", "n1"), "b": ("beta", "n1")})
+    index.upsert(["a"], ["gamma"], [{"notebook_id": "n1", "source": "doc.pdf"}])
+    assert index.search("alpha", 10) == []
+    assert [hit[0] for hit in index.search("gamma", 10)] == ["a"]
+
+    index.delete(["a", "b", "missing"])
+    assert index.stats() == {"chunks": 0, "terms": 0}
+
+
+def test_delete_source_only_touches_that_document(tmp_path):
+    index = _index(tmp_path, {"a": ("alpha", "n1"), "b": ("alpha", "n2")})
+    index.upsert(["c"], ["alpha"], [{"notebook_id": "n1", "source": "other.pdf"}])
+    index.delete_source("n1", "doc.pdf")
+    assert sorted(hit[0] for hit in index.search("alpha", 10)) == ["b", "c"]
+
+
+def test_save_and_reload(tmp_path):
+    index = _index(tmp_path, {"a": ("alpha beta", "n1"), "b": ("beta", "n1")})
+    index.delete(["b"])
+    index.save()
+    reloaded = LexicalIndex(index.path)
+    assert reloaded.stats() == {"chunks": 1, "terms": 2}
+    assert [hit[0] for hit in reloaded.search("beta", 10)] == ["a"]
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    fused = reciprocal_rank_fusion([["a", "b"], ["c", "b", "d"]])
+    # b is in both lists, which beats topping just one of them.
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c", "d"}
+    assert fused[-1] == "d"
+
+
+def test_rrf_scores_use_reciprocal_rank():
+    fused = reciprocal_rank_fusion([["a", "b"], ["b"]], k=0)
+    # a: 1/1, b: 1/2 + 1/1
+    assert fused == ["b", "a"]
+    assert reciprocal_rank_fusion([["x", "y"]]) == ["x", "y"]
+    assert reciprocal_rank_fusion([]) == []
+    assert RRF_K == 60
@@ -0,0 +1,249 @@
+import time
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from groq import RateLimitError
+
+from app.rag_core import LLMGateway, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Only the buckets' clock is faked; the event loop keeps the real one.
+    fake = FakeClock()
+    monkeypatch.setattr("app.rag_core.time", SimpleNamespace(monotonic=fake, time=time.time, perf_counter=time.perf_counter))
+    return fake
+
+
+def test_bucket_starts_full_and_refills_at_rate(clock):
+    bucket = TokenBucket(600)  # 10 per second
+    assert bucket.try_acquire(600)
+    assert not bucket.try_acquire(1)
+    clock.now += 0.5
+    assert bucket.try_acquire(5)
+    assert not bucket.try_acquire(1)
+
+
+def test_bucket_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(60)
+    clock.now += 3600
+    assert bucket.try_acquire(60)
+    assert not bucket.try_acquire(1)
+
+
+def test_settle_refunds_and_charges(clock):
+    bucket = TokenBucket(100)
+    assert bucket.try_acquire(80)
+    bucket.settle(80, 30)
+    assert bucket.try_acquire(70)
+    assert not bucket.try_acquire(1)
+    # A completion that ran long takes the bucket below zero.
+    bucket.settle(10, 50)
+    assert bucket._tokens == pytest.approx(-40)
+
+
+def test_settle_never_exceeds_capacity(clock):
+    bucket = TokenBucket(100)
+    bucket.settle(500, 0)
+    assert bucket._tokens == 100
+
+
+def test_zero_rate_bucket_is_unlimited():
+    bucket = TokenBucket(0)
+    assert bucket.try_acquire(10 ** 9)
+    asyncio.run(bucket.acquire(10 ** 9))
+
+
+def test_acquire_waits_for_refill(monkeypatch, clock):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr("app.rag_core.asyncio.sleep", fake_sleep)
+    bucket = TokenBucket(60)  # 1 per second
+    asyncio.run(bucket.acquire(60))
+    asyncio.run(bucket.acquire(3))
+    assert slept == [pytest.approx(3.0)]
+
+
+def test_acquire_caps_amount_at_capacity(monkeypatch, clock):
+    async def fake_sleep(seconds):
+        clock.now += seconds
+
+    monkeypatch.setattr("app.rag_core.asyncio.sleep", fake_sleep)
+    bucket = TokenBucket(10)
+    # Larger than the bucket could ever hold: waits for a full bucket instead of forever.
+    asyncio.run(bucket.acquire(10 ** 6))
+    assert bucket._tokens == pytest.approx(0)
+
+
+def test_background_acquire_leaves_interactive_headroom(monkeypatch, clock):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr("app.rag_core.asyncio.sleep", fake_sleep)
+    bucket = TokenBucket(60)  # 1 per second
+    asyncio.run(bucket.acquire_background(15, share=0.25))
+    assert bucket._tokens == pytest.approx(45)
+    assert not slept
+    # The next one would dip into the 45 tokens kept for interactive calls.
+    asyncio.run(bucket.acquire_background(5, share=0.25))
+    assert sum(slept) == pytest.approx(5.0)
+    assert bucket._tokens == pytest.approx(45)
+    assert bucket.try_acquire(45)
+
+
+def test_background_acquire_yields_to_waiting_interactive_caller(monkeypatch, clock):
+    async def run():
+        bucket = TokenBucket(6000)  # 100 per second
+        assert bucket.try_acquire(6000)
+        order = []
+
+        async def interactive():
+            await bucket.acquire(2)
+            order.append("interactive")
+
+        async def background():
+            await bucket.acquire_background(1, share=1.0)
+            order.append("background")
+
+        waiting = asyncio.create_task(interactive())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(background())
+        # Tokens come back while both wait; the interactive caller gets them first.
+        clock.now += 3
+        await asyncio.gather(waiting, queued)
+        return order
+
+    monkeypatch.setattr("app.rag_core.BACKGROUND_POLL_SECONDS", 0.01)
+    assert asyncio.run(run()) == ["interactive", "background"]
+
+
+def _rate_limit_error():
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    response = httpx.Response(429, request=request, headers={"retry-after": "0"})
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+def _gateway(create, monkeypatch):
+    # Callers use the clock fixture, so buckets don't refill while a test runs.
+    monkeypatch.setattr("app.rag_core.config.LLM_HEDGE_AFTER_SECONDS", 0)
+    monkeypatch.setattr("app.rag_core.config.LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr("app.rag_core.config.GROQ_TOKENS_PER_MINUTE", 100_000)
+    monkeypatch.setattr("app.rag_core.config.LLM_BACKOFF_MAX_SECONDS", 0)
+    gateway = LLMGateway("test-key")
+    gateway.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return gateway
+
+
+def _response(total_tokens):
+    return SimpleNamespace(usage=SimpleNamespace(total_tokens=total_tokens), choices=[])
+
+
+def test_complete_refunds_rate_limited_attempts(monkeypatch, clock):
+    calls = []
+
+    async def create(**params):
+        calls.append(params)
+        if len(calls) < 3:
+            raise _rate_limit_error()
+        return _response(120)
+
+    gateway = _gateway(create, monkeypatch)
+    messages = [{"role": "user", "content": "hello"}]
+    asyncio.run(gateway.complete(messages, max_tokens=1000))
+    assert len(calls) == 3
+    # Only the successful attempt's actual usage stays charged.
+    assert gateway.tokens.capacity - gateway.tokens._tokens == pytest.approx(120, abs=1)
+
+
+def test_stream_settles_with_estimated_usage(monkeypatch, clock):
+    async def chunks():
+        for text in ["abcd", "efgh", "ij"]:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None, x_groq=None)
+
+    async def create(**params):
+        return chunks()
+
+    gateway = _gateway(create, monkeypatch)
+    messages = [{"role": "user", "content": "hello"}]
+    prompt = gateway._prompt_tokens(messages)
+
+    async def consume():
+        return [delta async for delta in gateway.stream(messages, max_tokens=1000)]
+
+    assert asyncio.run(consume()) == ["abcd", "efgh", "ij"]
+    # 10 characters -> 3 tokens, instead of the 1000 reserved.
+    assert gateway.tokens.capacity - gateway.tokens._tokens == pytest.approx(prompt + 3, abs=1)
+
+
+def test_stream_settles_with_reported_usage(monkeypatch, clock):
+    async def chunks():
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="hi"))], usage=None, x_groq=None)
+        yield SimpleNamespace(choices=[], usage=None, x_groq=SimpleNamespace(usage=SimpleNamespace(total_tokens=42)))
+
+    async def create(**params):
+        return chunks()
+
+    gateway = _gateway(create, monkeypatch)
+
+    async def consume():
+        return [delta async for delta in gateway.stream([{"role": "user", "content": "x"}], max_tokens=1000)]
+
+    asyncio.run(consume())
+    assert gateway.tokens.capacity - gateway.tokens._tokens == pytest.approx(42, abs=1)
+
+
+def test_hedge_reservation_is_refunded(monkeypatch, clock):
+    async def create(**params):
+        await asyncio.sleep(0.05)
+        return _response(100)
+
+    gateway = _gateway(create, monkeypatch)
+    gateway.hedge_after = 0.01
+    asyncio.run(gateway.complete([{"role": "user", "content": "x"}], max_tokens=1000))
+    assert gateway.tokens.capacity - gateway.tokens._tokens == pytest.approx(100, abs=1)
+
+
+def test_cancelled_caller_cancels_the_request(monkeypatch, clock):
+    cancelled = []
+
+    async def create(**params):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    gateway = _gateway(create, monkeypatch)
+    gateway.hedge_after = 5
+
+    async def run():
+        call = asyncio.ensure_future(gateway.complete([{"role": "user", "content": "x"}], max_tokens=1000))
+        await asyncio.sleep(0.01)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        await asyncio.sleep(0)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    assert cancelled == [True]
+    assert gateway._notebook_slots == {}
+    # Only the prompt is charged for a request that may have reached the model.
+    assert gateway.tokens.capacity - gateway.tokens._tokens == pytest.approx(1, abs=1)
@@ -0,0 +1,197 @@
+import json
+import asyncio
+
+import pytest
+
+from app.rag_core import LLMBackend, RagEngine
+from app.services.answer_cache import normalize_question
+
+
+def _mcq(text, correct="a"):
+    return {
+        "questionText": text,
+        "type": "mcq",
+        "options": [{"id": "a", "text": "A"}, {"id": "b", "text": "B"}],
+        "correctOptionId": correct,
+        "explanation": "",
+    }
+
+
+class ScriptedBackend(LLMBackend):
+    """Answers each quiz batch with the next scripted list of questions, or raw text."""
+
+    name = "scripted"
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.calls = 0
+
+    async def complete(self, messages, notebook_id=None, max_tokens=1024, temperature=0.3, json_mode=False, background=False):
+        self.calls += 1
+        batch = self.batches.pop(0) if self.batches else []
+        return batch if isinstance(batch, str) else json.dumps({"questions": batch})
+
+    async def stream(self, messages, notebook_id=None, max_tokens=1024, temperature=0.3):
+        yield ""
+
+
+def _questions(engine, num_questions, **kwargs):
+    async def run():
+        return [q async for q in engine.iter_quiz_questions("topic", ["context"], "medium", num_questions, **kwargs)]
+
+    return asyncio.run(run())
+
+
+def test_excluded_questions_are_replaced(monkeypatch):
+    monkeypatch.setattr("app.rag_core.config.QUIZ_BATCH_SIZE", 5)
+    monkeypatch.setattr("app.rag_core.config.QUIZ_BATCH_RETRIES", 2)
+    backend = ScriptedBackend([
+        [_mcq("Old one?"), _mcq("New one?"), _mcq("Old two?")],
+        [_mcq("New two?"), _mcq("New three?")],
+    ])
+    served = {normalize_question("Old one?"), normalize_question("old TWO?")}
+    questions = _questions(RagEngine(backend=backend), 3, exclude=served)
+    assert [q["questionText"] for q in questions] == ["New one?", "New two?", "New three?"]
+    assert backend.calls == 2
+
+
+def test_duplicates_within_a_quiz_are_replaced(monkeypatch):
+    monkeypatch.setattr("app.rag_core.config.QUIZ_BATCH_SIZE", 5)
+    backend = ScriptedBackend([[_mcq("Same?"), _mcq("same?")], [_mcq("Other?")]])
+    questions = _questions(RagEngine(backend=backend), 2)
+    assert [q["questionText"] for q in questions] == ["Same?", "Other?"]
+
+
+def _invalid(item):
+    try:
+        RagEngine._validate_question(item)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def test_malformed_items_are_rejected():
+    assert _invalid("not an object")
+    assert _invalid({"questionText": "Q?", "type": "mcq"})
+    assert _invalid(dict(_mcq("Q?"), type="essay"))
+    assert _invalid(dict(_mcq("Q?"), options="a, b"))
+    assert _invalid(dict(_mcq("   ")))
+
+
+def test_wrong_option_count_is_rejected():
+    assert _invalid(dict(_mcq("Q?"), options=[{"id": "a", "text": "A"}]))
+    assert _invalid(dict(_mcq("Q?"), options=[{"id": "a", "text": "A"}, {"id": "a", "text": "A again"}]))
+    three = [{"id": "true", "text": "True"}, {"id": "false", "text": "False"}, {"id": "maybe", "text": "Maybe"}]
+    assert _invalid({"questionText": "Q?", "type": "tf", "options": three, "correctOptionId": "true"})
+
+
+def test_correct_option_must_be_an_option():
+    assert "not an option id" in _invalid(_mcq("Q?", correct="c"))
+
+
+def test_option_id_case_is_fixed():
+    question = RagEngine._validate_question(dict(_mcq("Q?", correct=" B "), options=[{"id": "A", "text": "A"}, {"id": "B", "text": "B"}]))
+    assert question["correctOptionId"] == "B"
+
+
+def test_true_false_is_normalised():
+    item = {
+        "questionText": "The sky is blue?",
+        "type": " TF ",
+        "options": [{"id": "True", "text": "True"}, {"id": "FALSE", "text": "False"}],
+        "correctOptionId": "True",
+    }
+    question = RagEngine._validate_question(item)
+    assert question["type"] == "tf"
+    assert [option["id"] for option in question["options"]] == ["true", "false"]
+    assert question["correctOptionId"] == "true"
+    assert question["explanation"] == ""
+
+
+def test_parse_quiz_items_accepts_wrappers_and_fences():
+    items = [_mcq("Q?")]
+    assert RagEngine._parse_quiz_items(json.dumps({"questions": items})) == items
+    assert RagEngine._parse_quiz_items("```json\n" + json.dumps(items) + "\n```") == items
+    assert RagEngine._parse_quiz_items(json.dumps({"quiz": {"questions": items}})) == items
+    assert RagEngine._parse_quiz_items(json.dumps({"items": items})) == items
+    assert RagEngine._parse_quiz_items("Here you go: " + json.dumps({"questions": items}) + " Enjoy!") == items
+    assert RagEngine._parse_quiz_items(json.dumps({"answer": "none"})) == []
+
+
+def test_invalid_items_are_dropped_one_by_one(monkeypatch):
+    monkeypatch.setattr("app.rag_core.config.QUIZ_BATCH_SIZE", 5)
+    monkeypatch.setattr("app.rag_core.config.QUIZ_BATCH_RETRIES", 0)
+    backend = ScriptedBackend([[
+        _mcq("Good one?"),
+        _mcq("Bad answer?", correct="z"),
+        {"questionText": "No options?"},
+        _mcq("Good two?"),
+    ]])
+    questions = _questions(RagEngine(backend=backend), 4)
+    assert [q["questionText"] for q in questions] == ["Good one?", "Good two?"]
+
+
+def test_unparseable_batch_is_retried(monkeypatch):
+    monkeypatch.setattr("app.rag_core.config.QUIZ_BATCH_SIZE", 5)
+    monkeypatch.setattr("app.rag_core.config.QUIZ_BATCH_RETRIES", 1)
+    backend = ScriptedBackend(["not json at all", [_mcq("Q?")]])
+    assert [q["questionText"] for q in _questions(RagEngine(backend=backend), 1)] == ["Q?"]
+    assert backend.calls == 2
+
+
+class BlockingBackend(ScriptedBackend):
+    """Answers the first batch at once and leaves every other batch waiting."""
+
+    def __init__(self):
+        super().__init__([])
+        self.cancelled = 0
+
+    async def complete(self, messages, **params):
+        self.calls += 1
+        if self.calls == 1:
+            return json.dumps({"questions": [_mcq("First?")]})
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def _leftover_tasks():
+    return [task for task in asyncio.all_tasks() if task is not asyncio.current_task() and not task.done()]
+
+
+def test_closing_the_quiz_early_cancels_its_batches(monkeypatch):
+    monkeypatch.setattr("app.rag_core.config.QUIZ_BATCH_SIZE", 1)
+    backend = BlockingBackend()
+
+    async def run():
+        questions = RagEngine(backend=backend).iter_quiz_questions("topic", ["context"], "medium", 3)
+        assert (await questions.__anext__())["questionText"] == "First?"
+        await questions.aclose()
+        await asyncio.sleep(0)
+        return _leftover_tasks()
+
+    assert asyncio.run(run()) == []
+    assert backend.cancelled == 2
+
+
+def test_cancelled_consumer_cancels_the_batches_and_the_queue_getter(monkeypatch):
+    monkeypatch.setattr("app.rag_core.config.QUIZ_BATCH_SIZE", 1)
+    backend = BlockingBackend()
+    backend.calls = 1  # every batch blocks
+
+    async def run():
+        async def consume():
+            return [q async for q in RagEngine(backend=backend).iter_quiz_questions("topic", ["context"], "medium", 2)]
+
+        consumer = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        consumer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await consumer
+        await asyncio.sleep(0)
+        return _leftover_tasks()
+
+    assert asyncio.run(run()) == []
+    assert backend.cancelled == 2
@@ -0,0 +1,103 @@
+import time
+import asyncio
+import threading
+
+from app.services.reranker import Reranker
+
+
+class FakeCrossEncoder:
+    """Scores a pair by the chunk's length; optionally slow, records every batch."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def __call__(self, pairs):
+        self.batches.append(pairs)
+        time.sleep(self.delay)
+        return [float(len(document)) for _, document in pairs]
+
+
+def test_rerank_orders_by_score():
+    reranker = Reranker(FakeCrossEncoder(), timeout_ms=0)
+    order = asyncio.run(reranker.rerank("q", ["a", "b", "c"], ["xx", "xxxx", "x"]))
+    assert order == [1, 0, 2]
+
+
+def test_scores_are_cached_per_question_and_chunk():
+    model = FakeCrossEncoder()
+    reranker = Reranker(model, timeout_ms=0)
+    reranker.score("What is X?", ["a", "b"], ["one", "three"])
+    # Same question modulo case and whitespace: only the new chunk is scored.
+    reranker.score("what is  x?", ["a", "b", "c"], ["one", "three", "fifteen"])
+    assert model.batches[1] == [("what is  x?", "fifteen")]
+    assert reranker.stats()["hits"] == 2
+    assert reranker.stats()["misses"] == 3
+
+
+def test_changed_chunk_text_is_rescored():
+    model = FakeCrossEncoder()
+    reranker = Reranker(model, timeout_ms=0)
+    reranker.score("q", ["a"], ["old"])
+    assert reranker.score("q", ["a"], ["much newer"]) == [10.0]
+    assert len(model.batches) == 2
+
+
+def test_cache_is_bounded():
+    reranker = Reranker(FakeCrossEncoder(), max_entries=2, timeout_ms=0)
+    reranker.score("q", ["a", "b", "c"], ["1", "2", "3"])
+    assert reranker.stats()["entries"] == 2
+
+
+def test_timeout_returns_none_and_still_fills_cache():
+    model = FakeCrossEncoder(delay=0.2)
+    reranker = Reranker(model, timeout_ms=20)
+    assert asyncio.run(reranker.rerank("q", ["a"], ["text"])) is None
+    assert reranker.stats()["timeouts"] == 1
+    time.sleep(0.3)
+    assert reranker.stats()["entries"] == 1
+    assert asyncio.run(reranker.rerank("q", ["a"], ["text"])) == [0]
+    reranker.shutdown()
+
+
+def test_expired_call_skips_scoring():
+    model = FakeCrossEncoder()
+    reranker = Reranker(model)
+    assert reranker.score("q", ["a"], ["text"], deadline=time.monotonic() - 1) is None
+    assert model.batches == []
+    assert reranker.stats()["skipped"] == 1
+    # Cached scores are still served past the deadline.
+    reranker.score("q", ["a"], ["text"])
+    assert reranker.score("q", ["a"], ["text"], deadline=time.monotonic() - 1) == [4.0]
+
+
+def test_calls_queued_behind_a_slow_pass_are_skipped():
+    model = FakeCrossEncoder(delay=0.2)
+    reranker = Reranker(model, timeout_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(reranker.rerank(f"q{i}", ["a"], ["text"]) for i in range(3)))
+
+    assert asyncio.run(run()) == [None, None, None]
+    time.sleep(0.3)
+    # Only the pass that had started ran; the queued ones never reached the model.
+    assert len(model.batches) == 1
+    assert reranker.stats()["timeouts"] == 3
+    reranker.shutdown()
+
+
+def test_forward_passes_run_on_one_dedicated_thread():
+    threads = set()
+
+    def score_fn(pairs):
+        threads.add(threading.current_thread().name)
+        return [0.0] * len(pairs)
+
+    reranker = Reranker(score_fn, timeout_ms=0)
+
+    async def run():
+        await asyncio.gather(*(reranker.rerank(f"q{i}", ["a"], ["x"]) for i in range(4)))
+
+    asyncio.run(run())
+    assert len(threads) == 1 and next(iter(threads)).startswith("rerank")
+    reranker.shutdown()
@@ -0,0 +1,34 @@
+from app.services.content_scraper import transcript_windows
+
+
+def _segment(text, start, duration=2.0):
+    return {"text": text, "start": start, "duration": duration}
+
+
+def test_windows_close_at_the_first_boundary_past_the_length():
+    segments = [_segment("one", 0.0), _segment("two", 2.0), _segment("three", 4.0), _segment("four", 6.0, 3.0)]
+    windows = transcript_windows(segments, 4.0)
+    assert [(w["text"], w["start_seconds"], w["end_seconds"]) for w in windows] == [
+        ("one two", 0.0, 4.0),
+        ("three four", 4.0, 9.0),
+    ]
+    assert all(w["heading"] == "" and w["level"] == 0 for w in windows)
+
+
+def test_window_starts_at_its_first_segment_after_a_gap():
+    segments = [_segment("intro", 0.0), _segment("later", 30.0), _segment("still", 31.0)]
+    windows = transcript_windows(segments, 10.0)
+    assert [(w["text"], w["start_seconds"], w["end_seconds"]) for w in windows] == [
+        ("intro", 0.0, 2.0),
+        ("later still", 30.0, 33.0),
+    ]
+
+
+def test_blank_segments_are_skipped_and_newlines_flattened():
+    segments = [_segment("  ", 0.0), _segment("line\nbreak", 1.0), _segment("\n", 2.0)]
+    windows = transcript_windows(segments, 60.0)
+    assert [(w["text"], w["start_seconds"], w["end_seconds"]) for w in windows] == [("line break", 1.0, 3.0)]
+
+
+def test_no_segments_gives_no_windows():
+    assert transcript_windows([], 60.0) == []
@@ -172,14 +172,21 @@ export function ChatPanel({ notebookId }: ChatPanelProps) {
 
       // Filter context by selected document if available
       const contextFilter = selectedDoc ? selectedDoc.name : undefined
-      const data = await api.ask(query, contextFilter)
+      const data = await api.ask(query, contextFilter, notebookId)
+
+      // Cite each retrieved page of an uploaded document once, so clicking jumps the viewer there
+      const sources: Source[] = []
+      for (const chunk of data.sources || []) {
+        const doc = notebookDocs.find((d) => d.name === chunk.source)
+        if (!doc || !chunk.page || sources.some((s) => s.documentId === doc.documentId && s.page === chunk.page)) continue
+        sources.push({ documentId: doc.documentId, documentName: doc.name, page: chunk.page, section: chunk.section || undefined })
+      }
 
       const aiMessage: ChatMessage = {
         id: `msg${Date.now() + 1}`,
         role: "assistant",
         content: data.answer,
-        // For now, we don't have structured sources from backend, just text context
-        sources: [],
+        sources,
         timestamp: new Date(),
       }
 
@@ -308,6 +315,7 @@ export function ChatPanel({ notebookId }: ChatPanelProps) {
                               variant="outline"
                               className="cursor-pointer hover:bg-primary/20 text-xs"
                               onClick={() => handleSourceClick(source)}
+                              title={source.section}
                             >
                               <ExternalLink className="h-3 w-3 mr-1" />
                               {source.documentName} — p.{source.page}
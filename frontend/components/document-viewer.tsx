@@ -6,6 +6,7 @@ import { Button } from "@/components/ui/button"
 import { Input } from "@/components/ui/input"
 import { cn } from "@/lib/utils"
 import { useAppStore } from "@/lib/store"
+import { api, TEXT_PAGE_CHARS } from "@/lib/api"
 
 interface DocumentViewerProps {
   notebookId: string
@@ -21,6 +22,7 @@ export function DocumentViewer({ notebookId }: DocumentViewerProps) {
   const [searchQuery, setSearchQuery] = useState("")
   const [showSearch, setShowSearch] = useState(false)
   const [viewMode, setViewMode] = useState<"original" | "text">("original")
+  const [pageText, setPageText] = useState<string | null>(null)
   const contentRef = useRef<HTMLDivElement>(null)
 
   /* 
@@ -58,6 +60,21 @@ export function DocumentViewer({ notebookId }: DocumentViewerProps) {
 
   const totalPages = selectedDoc?.pages || 1
 
+  // Fetch only the page on screen: PDFs by page, other documents by character range.
+  useEffect(() => {
+    const textId = selectedDoc?.textId
+    if (viewMode !== "text" || !textId) return
+    let cancelled = false
+    setPageText(null)
+    const params = selectedDoc?.fileType === "pdf"
+      ? { page: currentPage }
+      : { start: (currentPage - 1) * TEXT_PAGE_CHARS, end: currentPage * TEXT_PAGE_CHARS }
+    api.getDocumentText(textId, params)
+      .then((part) => { if (!cancelled) setPageText(part.text) })
+      .catch(() => { if (!cancelled) setPageText("Could not load this page.") })
+    return () => { cancelled = true }
+  }, [selectedDoc?.textId, selectedDoc?.fileType, currentPage, viewMode])
+
   const handlePrevPage = () => setCurrentPage((p) => Math.max(1, p - 1))
   const handleNextPage = () => setCurrentPage((p) => Math.min(totalPages, p + 1))
 
@@ -67,7 +84,13 @@ export function DocumentViewer({ notebookId }: DocumentViewerProps) {
   const clearHighlight = () => setHighlight(null, null)
 
   const generatePageContent = (pageNum: number) => {
-    // 1. If we have real extracted text from the backend, show it.
+    // 1. Text served by the backend for the current page.
+    if (selectedDoc?.textId) {
+      if (pageText === null) return "Loading page..."
+      return pageText || (selectedDoc.fileType === "pdf" ? "No text on this page." : "End of document.")
+    }
+
+    // 2. Documents added before the text was served per page kept it all in the store.
     if (selectedDoc?.content) {
       const charsPerPage = 1500;
       const start = (pageNum - 1) * charsPerPage;
@@ -76,7 +99,7 @@ export function DocumentViewer({ notebookId }: DocumentViewerProps) {
       return pageText || "End of document.";
     }
 
-    // 2. Demo Fallback
+    // 3. Demo Fallback
     const loremParagraphs = [
       "## Core Fundamentals\n\nMachine learning is a subset of artificial intelligence...",
       "## Supervised Learning\n\nSupervised learning uses labeled datasets...",
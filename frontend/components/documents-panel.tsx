@@ -86,9 +86,9 @@ export function DocumentsPanel({ notebookId }: DocumentsPanelProps) {
           documentId: docId,
           name: fileName,
           fileType,
-          pages: response.chunks || 1,
+          pages: response.pages || 1,
           status: "indexed",
-          content: response.text || "", // Store the REAL extracted text
+          textId: response.document_id || undefined, // Text is fetched page by page by the viewer
           url: response.url || "" // Store the URL (local or otherwise)
         }
 
@@ -155,7 +155,7 @@ export function DocumentsPanel({ notebookId }: DocumentsPanelProps) {
     const toastId = toast.loading("Analyzing content (scraping + AI summary might take ~10s)...")
 
     try {
-      const { api } = await import("@/lib/api")
+      const { api, TEXT_PAGE_CHARS } = await import("@/lib/api")
       const name = urlForm.name.trim() || new URL(url).hostname
 
       const response = await api.uploadUrl(url, name, notebookId)
@@ -165,10 +165,10 @@ export function DocumentsPanel({ notebookId }: DocumentsPanelProps) {
         documentId: docId,
         name: response.filename || name,
         fileType: "url",
-        pages: 1,
+        pages: Math.max(1, Math.ceil((response.characters || 0) / TEXT_PAGE_CHARS)),
         status: "indexed",
         url: url,
-        content: response.text || "" // Store scraped text
+        textId: response.document_id || undefined // Scraped text is fetched page by page by the viewer
       }
 
       addDocument(notebookId, newDoc)
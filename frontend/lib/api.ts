@@ -8,6 +8,22 @@ export interface ApiResponse<T = any> {
     message?: string;
 }
 
+const JOB_POLL_INTERVAL_MS = 1000;
+// Characters shown per viewer page for documents without real pages (web pages, transcripts).
+export const TEXT_PAGE_CHARS = 1500;
+
+async function waitForJob(jobId: string) {
+    // Uploads are ingested in the background; poll until the job settles.
+    while (true) {
+        const res = await fetch(`${API_URL}/jobs/${jobId}`);
+        if (!res.ok) throw new Error(`Job status failed: ${res.statusText}`);
+        const job = await res.json();
+        if (job.status === "done") return job.result;
+        if (job.status === "error") throw new Error(job.error || "Ingestion failed");
+        await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+}
+
 export const api = {
     async uploadPdf(file: File, notebookId?: string) {
         try {
@@ -21,7 +37,8 @@ export const api = {
             });
 
             if (!res.ok) throw new Error(`Upload failed: ${res.statusText}`);
-            return await res.json();
+            const { job_id } = await res.json();
+            return await waitForJob(job_id);
         } catch (error) {
             console.error("API Error (uploadPdf):", error);
             throw error;
@@ -37,18 +54,20 @@ export const api = {
             });
 
             if (!res.ok) throw new Error(`URL upload failed: ${res.statusText}`);
-            return await res.json();
+            const { job_id } = await res.json();
+            return await waitForJob(job_id);
         } catch (error) {
             console.error("API Error (uploadUrl):", error);
             throw error;
         }
     },
 
-    async ask(question: string, filename?: string) {
+    async ask(question: string, filename?: string, notebookId?: string) {
         try {
             const formData = new FormData();
             formData.append("question", question);
             if (filename) formData.append("filename", filename);
+            if (notebookId) formData.append("notebook_id", notebookId);
 
             const res = await fetch(`${API_URL}/ask`, {
                 method: "POST",
@@ -93,5 +112,21 @@ export const api = {
             console.error("API Error (generateQuiz):", error);
             throw error;
         }
+    },
+
+    async getDocumentText(textId: string, params: { page?: number; start?: number; end?: number }) {
+        try {
+            const query = new URLSearchParams();
+            for (const [key, value] of Object.entries(params)) {
+                if (value !== undefined) query.set(key, String(value));
+            }
+            // The browser cache revalidates with the response's ETag, so revisited pages cost a 304.
+            const res = await fetch(`${API_URL}/documents/${textId}/text?${query}`);
+            if (!res.ok) throw new Error(`Document text failed: ${res.statusText}`);
+            return await res.json();
+        } catch (error) {
+            console.error("API Error (getDocumentText):", error);
+            throw error;
+        }
     }
 };
@@ -29,6 +29,7 @@ export interface Document {
   pages: number
   status: "processing" | "indexed"
   content?: string
+  textId?: string // Backend document_id its extracted text is served by
   url?: string // Added url field for web links
 }
 
@@ -36,6 +37,7 @@ export interface Source {
   documentId: string
   documentName: string
   page: number
+  section?: string
   snippetId?: string
   snippetText?: string
 }